@@ -1,26 +1,23 @@
 # agent.py
 import os
 import sys
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING
 from dotenv import load_dotenv
 
-# --- Strands SDK ---
-from strands import Agent, tool
-from strands.models.litellm import LiteLLMModel
-from strands.handlers.callback_handler import PrintingCallbackHandler  # streams tokens
-from strands_tools import calculator, current_time
+# Shared fetch-and-extract library (../webfetch): pooled HTTP, TTL cache, multi-URL fetch
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from webfetch.adapters import strands_tool
 
-# --- LiteLLM (force proxy routing) ---
-import litellm
-
-# --- NEW (for Web Fetch & Summarize) ---
-import requests
-from bs4 import BeautifulSoup
+# Heavy stacks (Strands SDK, LiteLLM; requests/BeautifulSoup inside webfetch) are imported
+# on first use, so `python agent.py` shows the prompt right away (see FAST_STARTUP below).
+if TYPE_CHECKING:
+    from strands import Agent
 
 load_dotenv()
 
-# Route ALL traffic through your LiteLLM proxy
-litellm.use_litellm_proxy = True
-
 # Make proxy visible to OpenAI-compatible clients
 os.environ.setdefault("OPENAI_API_BASE", os.getenv("LITELLM_PROXY_API_BASE", ""))
 os.environ.setdefault("OPENAI_API_KEY", os.getenv("LITELLM_PROXY_API_KEY", ""))
@@ -35,66 +32,67 @@ SYSTEM_PROMPT = os.getenv(
     "You are a helpful assistant. Prefer concise answers unless asked otherwise."
 )
 
-@tool
+# Build the agent in the background while the user types the first message.
+# FAST_STARTUP=0 builds it before the prompt instead (config errors surface immediately).
+FAST_STARTUP = os.getenv("FAST_STARTUP", "1") == "1"
+
+# Tools are plain functions here; create_agent() wraps them with Strands' @tool.
 def shout(text: str) -> str:
     """Return the text in uppercase (demo tool)."""
     return text.upper()
 
-# --- NEW TOOL: Web Fetch & Summarize ---
-@tool
-def http_fetch_and_clean(url: str, timeout_sec: int = 10, max_chars: int = 6000) -> str:
-    """
-    Fetch a web page and return cleaned text (trimmed). Use with a follow-up
-    LLM prompt like 'summarize the fetched content' or 'extract steps'.
-    """
-    headers = {"User-Agent": "strands-agent/1.0 (+lite-llm-proxy)"}
-    r = requests.get(url, headers=headers, timeout=timeout_sec)
-    r.raise_for_status()
-    soup = BeautifulSoup(r.text, "html.parser")
-
-    # Remove scripts/styles/nav-like chrome
-    for tag in soup(["script", "style", "noscript", "header", "footer", "nav", "aside"]):
-        tag.extract()
-
-    text = " ".join(soup.get_text(separator=" ").split())
-    if len(text) > max_chars:
-        text = text[:max_chars] + " ...[truncated]"
-    return text
-
-class CleanPrintingHandler(PrintingCallbackHandler):
-    """
-    Adds a neat prefix before streaming starts and *always* emits a newline
-    after the final token (or tool output). This prevents the next 'you >'
-    prompt from sticking to the last character of the assistant message.
-    """
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self._opened = False
-
-    def on_message_start(self, *args, **kwargs):
-        if not self._opened:
-            # Prefix once per assistant message
-            print("assistant > ", end="", flush=True)
-            self._opened = True
-        return super().on_message_start(*args, **kwargs)
-
-    def on_message_end(self, *args, **kwargs):
-        out = super().on_message_end(*args, **kwargs)
-        # Ensure final newline
-        if self._opened:
-            print("", flush=True)
+@functools.lru_cache(maxsize=None)
+def _clean_printing_handler_cls():
+    """Defined lazily because the base class lives in the (heavy) Strands SDK."""
+    from strands.handlers.callback_handler import PrintingCallbackHandler  # streams tokens
+
+    class CleanPrintingHandler(PrintingCallbackHandler):
+        """
+        Adds a neat prefix before streaming starts and *always* emits a newline
+        after the final token (or tool output). This prevents the next 'you >'
+        prompt from sticking to the last character of the assistant message.
+        """
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
             self._opened = False
-        return out
 
-    # Some tool executions may be the last emitted event; ensure newline too
-    def on_tool_end(self, *args, **kwargs):
-        out = super().on_tool_end(*args, **kwargs)
-        if self._opened:
-            print("", flush=True)
-            self._opened = False
-        return out
+        def on_message_start(self, *args, **kwargs):
+            if not self._opened:
+                # Prefix once per assistant message
+                print("assistant > ", end="", flush=True)
+                self._opened = True
+            return super().on_message_start(*args, **kwargs)
+
+        def on_message_end(self, *args, **kwargs):
+            out = super().on_message_end(*args, **kwargs)
+            # Ensure final newline
+            if self._opened:
+                print("", flush=True)
+                self._opened = False
+            return out
+
+        # Some tool executions may be the last emitted event; ensure newline too
+        def on_tool_end(self, *args, **kwargs):
+            out = super().on_tool_end(*args, **kwargs)
+            if self._opened:
+                print("", flush=True)
+                self._opened = False
+            return out
+
+    return CleanPrintingHandler
+
+def create_agent() -> "Agent":
+    # --- Strands SDK ---
+    from strands import Agent, tool
+    from strands.models.litellm import LiteLLMModel
+    from strands_tools import calculator, current_time
+
+    # --- LiteLLM (force proxy routing) ---
+    import litellm
+
+    # Route ALL traffic through your LiteLLM proxy
+    litellm.use_litellm_proxy = True
 
-def create_agent() -> Agent:
     model = LiteLLMModel(
         model_id=MODEL_ID,
         params={"temperature": 0.3},
@@ -105,13 +103,16 @@ def create_agent() -> Agent:
     )
     return Agent(
         model=model,
-        tools=[calculator, current_time, shout, http_fetch_and_clean],  # <-- added tool
+        tools=[calculator, current_time, tool(shout), strands_tool(default_timeout_sec=10, default_max_chars=6000)],
         system_prompt=SYSTEM_PROMPT,
-        callback_handler=CleanPrintingHandler(),  # clean streaming UX
+        callback_handler=_clean_printing_handler_cls()(),  # clean streaming UX
     )
 
 def repl() -> None:
-    agent = create_agent()
+    builder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="agent-build")
+    pending_agent = builder.submit(create_agent)
+    if not FAST_STARTUP:
+        pending_agent.result()
     print(f"\nStrands REPL ready (model: {MODEL_ID})")
     print("Type your message. Commands: /reset  /exit\n")
 
@@ -128,11 +129,12 @@ def repl() -> None:
             print("bye!")
             break
         if user in {"/reset", "/r"}:
-            agent = create_agent()
+            pending_agent = builder.submit(create_agent)
             print("↺ session reset.")
             continue
 
         # Invoke agent: the handler streams output. Do NOT print the result.
+        agent = pending_agent.result()  # waits only if the background build is still running
         _ = agent(user)
 
         # Hard-stop safeguard to ensure newline even on timing races.
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark: time until the first "[user]:" prompt is on screen for
+
+  - cli        google_adk_trial/run_adk.py        (wrapper -> `python -m google.adk.cli run .` under a PTY)
+  - inprocess  google_adk_trial/run_inprocess.py  (imports root_agent, drives ADK's Runner directly)
+
+Each launcher runs under its own PTY (like a real terminal), is timed from fork to
+prompt, then killed. No model call is made, so no proxy is needed, but the ADK
+environment (requirements.txt + .env) must be installed.
+
+    python benchmarks/adk_startup.py --runs 5
+"""
+import argparse
+import os
+import pty
+import select
+import signal
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ADK_DIR = Path(__file__).resolve().parent.parent / "google_adk_trial"
+PROMPT = b"[user]:"
+
+LAUNCHERS = {
+    "cli": [sys.executable, "run_adk.py"],
+    "inprocess": [sys.executable, "run_inprocess.py"],
+}
+
+
+def time_to_prompt(argv, timeout: float) -> float:
+    """Seconds from fork until PROMPT appears on the child's terminal."""
+    started = time.perf_counter()
+    pid, fd = pty.fork()
+    if pid == pty.CHILD:
+        os.chdir(ADK_DIR)
+        os.execvp(argv[0], argv)
+
+    seen = b""
+    try:
+        while True:
+            left = timeout - (time.perf_counter() - started)
+            if left <= 0:
+                raise TimeoutError(f"no prompt after {timeout:.0f}s: {seen[-300:]!r}")
+            ready, _, _ = select.select([fd], [], [], left)
+            if not ready:
+                continue
+            try:
+                chunk = os.read(fd, 65536)
+            except OSError:
+                chunk = b""
+            if not chunk:
+                raise RuntimeError(f"{argv[1]} exited before prompting: {seen[-300:]!r}")
+            seen = (seen + chunk)[-4096:]
+            if PROMPT in seen:
+                return time.perf_counter() - started
+    finally:
+        # Kill the whole session (run_adk.py has its own child)
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        os.waitpid(pid, 0)
+        os.close(fd)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--timeout", type=float, default=120.0)
+    args = ap.parse_args()
+
+    results = {}
+    for name, argv in LAUNCHERS.items():
+        time_to_prompt(argv, args.timeout)  # warm the OS page cache / .pyc files
+        samples = [time_to_prompt(argv, args.timeout) for _ in range(args.runs)]
+        results[name] = samples
+        print(f"{name:<10} median {statistics.median(samples):6.2f}s  "
+              f"min {min(samples):6.2f}s  max {max(samples):6.2f}s  (n={len(samples)})")
+
+    saved = statistics.median(results["cli"]) - statistics.median(results["inprocess"])
+    pct = 100.0 * saved / statistics.median(results["cli"])
+    print(f"\nin-process startup saves {saved:.2f}s per launch ({pct:.0f}%) and one interpreter process")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Benchmark the shared webfetch extractor (decode + parse + two-pass extraction).
+
+    python benchmarks/bench_extract.py                      # synthetic pages (small/medium/large)
+    python benchmarks/bench_extract.py page1.html page2.html --runs 20
+    python benchmarks/bench_extract.py --parser html.parser --parser lxml
+    python benchmarks/bench_extract.py --loop-lag           # event-loop stall: inline vs parse pool
+    python benchmarks/bench_extract.py --host-profile       # full parse vs learned per-host profile
+
+Reports ms/page and MB/s per input and parser, so a parser or extraction change
+can be measured once and benefits all five stacks.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from webfetch import extract  # noqa: E402
+from webfetch.parsepool import ParseExecutor  # noqa: E402
+from webfetch.profiles import PROFILE_MIN_PAGES, HostProfiles  # noqa: E402
+
+
+def synthetic_page(paragraphs: int) -> bytes:
+    nav = "".join(f'<li><a href="/s{i}">Section {i}</a></li>' for i in range(40))
+    body = "".join(
+        f"<h2>Heading {i}</h2><p>Paragraph {i}: "
+        + "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor. " * 6
+        + f"</p><ul><li>point {i}.a</li><li>point {i}.b</li></ul>"
+        for i in range(paragraphs)
+    )
+    html = (
+        "<!doctype html><html><head><meta charset='utf-8'><title>bench</title>"
+        "<style>body{font:14px sans-serif}</style><script>var x = 1;</script></head>"
+        f"<body><header><nav><ul>{nav}</ul></nav></header><main><article>{body}</article></main>"
+        "<footer><p>footer text</p></footer><div class='cookie-banner'>cookies</div></body></html>"
+    )
+    return html.encode("utf-8")
+
+
+def bench(content: bytes, parser: str, runs: int) -> float:
+    extract.HTML_PARSER = parser
+    extract.extract_text(content)  # warm-up
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        extract.extract_text(content)
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples)
+
+
+async def _loop_lag(executor: ParseExecutor, content: bytes, parallel: int):
+    """Parse `parallel` copies on threads (as the fetch path does) while timing a 5 ms ticker."""
+    lags = []
+
+    async def ticker() -> None:
+        while True:
+            t0 = time.perf_counter()
+            await asyncio.sleep(0.005)
+            lags.append(time.perf_counter() - t0 - 0.005)
+
+    tick = asyncio.create_task(ticker())
+    t0 = time.perf_counter()
+    await asyncio.gather(*(asyncio.to_thread(executor.parse, content) for _ in range(parallel)))
+    elapsed = time.perf_counter() - t0
+    tick.cancel()
+    return elapsed, max(lags or [0.0])
+
+
+def bench_loop_lag(inputs, parallel: int) -> None:
+    print(f"{'input':<24} {'KB':>8} {'mode':<8} {'wall s':>7} {'max lag ms':>11}")
+    for workers, mode in ((0, "inline"), (max(2, os.cpu_count() or 1), "pool")):
+        executor = ParseExecutor(workers=workers, initial_threshold=0)  # pool mode: offload everything
+        executor.warm()
+        for name, content in inputs:
+            elapsed, lag = asyncio.run(_loop_lag(executor, content, parallel))
+            print(f"{name:<24} {len(content) / 1024:8.0f} {mode:<8} {elapsed:7.2f} {lag * 1000:11.0f}")
+        executor.shutdown()
+
+
+def bench_host_profile(inputs, runs: int) -> None:
+    """Same page under several URLs of one host: generic extraction vs after the host profile is learned."""
+    print(f"{'input':<24} {'KB':>8} {'mode':<9} {'ms/page':>9} {'chars':>8}")
+    for name, content in inputs:
+        profiles = HostProfiles(enabled=True)
+        for i in range(PROFILE_MIN_PAGES):  # learning phase
+            profiles.observe(f"https://bench.local/{name}/{i}", extract.extract_page(content)[1])
+        hints = profiles.hints(f"https://bench.local/{name}/x")
+        for mode, page_hints in (("generic", None), ("profiled", hints)):
+            samples, text = [], ""
+            for _ in range(runs):
+                t0 = time.perf_counter()
+                text = extract.extract_page(content, None, "", page_hints)[0]
+                samples.append(time.perf_counter() - t0)
+            print(f"{name:<24} {len(content) / 1024:8.0f} {mode:<9} {statistics.median(samples) * 1000:9.1f} "
+                  f"{len(text):8d}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("files", nargs="*", help="HTML files to parse (default: synthetic pages)")
+    ap.add_argument("--runs", type=int, default=10)
+    ap.add_argument("--parser", action="append", help="BeautifulSoup parser(s) to compare")
+    ap.add_argument("--loop-lag", action="store_true",
+                    help="measure event-loop stalls while pages parse inline vs in the parse pool")
+    ap.add_argument("--parallel", type=int, default=4, help="concurrent parses for --loop-lag")
+    ap.add_argument("--host-profile", action="store_true",
+                    help="compare generic extraction with a learned per-host profile (selector + boilerplate)")
+    args = ap.parse_args()
+
+    if args.files:
+        inputs = [(Path(f).name, Path(f).read_bytes()) for f in args.files]
+    else:
+        inputs = [(f"synthetic-{n}p", synthetic_page(n)) for n in (20, 200, 2000)]
+
+    if args.loop_lag:
+        bench_loop_lag(inputs, args.parallel)
+        return
+    if args.host_profile:
+        bench_host_profile(inputs, args.runs)
+        return
+
+    parsers = args.parser or [extract.HTML_PARSER]
+    print(f"{'input':<24} {'KB':>8} {'parser':<12} {'ms/page':>9} {'MB/s':>7}")
+    for name, content in inputs:
+        for parser in parsers:
+            sec = bench(content, parser, args.runs)
+            print(f"{name:<24} {len(content) / 1024:8.0f} {parser:<12} {sec * 1000:9.1f} "
+                  f"{len(content) / sec / 1e6:7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Crawl the static docs-site fixture (benchmarks/fixtures/docs_site) over a local
+HTTP server and check what webfetch.crawl does with it:
+
+  - the frontier: dedupes #fragment / relative / absolute links, stays on the
+    origin, skips the PDF, the external forum and robots.txt-disallowed /private/;
+  - the bounds: max_depth, max_pages, path_prefix;
+  - the merge: the question's answer (the proxy setting, split over two pages)
+    comes first within the budget;
+  - sharing: crawled pages serve later fetches of the same URL however it is
+    written, and a prefetch already in flight is joined, not downloaded again;
+  - wall time with 1 vs CRAWL_CONCURRENCY downloads in flight (--page-ms latency).
+
+    python benchmarks/crawl_site.py --page-ms 50
+
+Exits 1 when a check fails.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.environ.setdefault("FETCH_HOST_RPS", "0")  # measure the crawl, not the politeness pacing
+os.environ.setdefault("FETCH_HOST_CONCURRENCY", "16")
+os.environ.setdefault("PARSE_POOL_WORKERS", "0")
+
+from webfetch import crawl as crawl_mod  # noqa: E402
+from webfetch import cached_document, page_cache, prefetch  # noqa: E402
+
+FIXTURE = Path(__file__).resolve().parent / "fixtures" / "docs_site"
+QUERY = "How do I make checks go through our corporate proxy?"
+
+
+def serve(page_ms: float, hits: dict) -> ThreadingHTTPServer:
+    class Handler(SimpleHTTPRequestHandler):
+        def do_GET(self):
+            hits[self.path] = hits.get(self.path, 0) + 1
+            if page_ms and not self.path.startswith("/robots.txt"):
+                time.sleep(page_ms / 1000)
+            super().do_GET()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(Handler, directory=str(FIXTURE)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def paths(pages, base):
+    return [p.url[len(base):] for p in pages if not p.error]
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--page-ms", type=float, default=50, help="latency the fixture server adds to every page")
+    ap.add_argument("--runs", type=int, default=3)
+    args = ap.parse_args()
+
+    hits: dict = {}
+    server = serve(args.page_ms, hits)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    failures = 0
+
+    def check(name: str, ok: bool, detail="") -> None:
+        nonlocal failures
+        failures += not ok
+        print(f"  [{'ok' if ok else 'FAIL'}] {name}" + (f": {detail}" if detail and not ok else ""))
+
+    print("frontier")
+    pages = crawl_mod.crawl(base + "/index.html", max_depth=3, max_pages=30)
+    got = paths(pages, base)
+    check("every public page once", sorted(got) == sorted([
+        "/index.html", "/guide/install.html", "/guide/configuration.html", "/guide/troubleshooting.html",
+        "/api/", "/api/index.html", "/api/endpoints.html", "/guide/advanced/tuning.html",
+        "/guide/advanced/internals.html"]), got)
+    check("breadth-first order", got[0] == "/index.html" and got.index("/guide/advanced/internals.html") == len(got) - 1, got)
+    check("robots.txt honoured", any(p.error == "disallowed by robots.txt" for p in pages)
+          and "/private/roadmap.html" not in got)
+    check("no pdf / external / javascript links", all(p.url.startswith(base) and not p.url.endswith(".pdf")
+                                                        for p in pages))
+
+    print("bounds")
+    got = paths(crawl_mod.crawl(base + "/index.html", max_depth=1), base)
+    check("max_depth=1 stops at direct links", "/guide/advanced/tuning.html" not in got and len(got) == 5, got)
+    got = paths(crawl_mod.crawl(base + "/index.html", max_depth=3, max_pages=3), base)
+    check("max_pages=3", len(got) == 3, got)
+    got = paths(crawl_mod.crawl(base + "/guide/install.html", max_depth=3, path_prefix="/guide/"), base)
+    check("path_prefix=/guide/", got and all(p.startswith("/guide/") for p in got) and len(got) == 5, got)
+
+    print("merge")
+    out = crawl_mod.crawl_and_extract(base + "/index.html", QUERY, max_depth=2, max_chars=1500)
+    check("within budget", len(out) <= 1500, len(out))
+    check("best passage first", out.split("\n", 1)[0].endswith("/guide/configuration.html") and "proxy.url" in out,
+          out[:300])
+    check("second page with the answer kept", "/guide/troubleshooting.html" in out, out)
+    check("nothing from /private/", "CONFIDENTIAL" not in crawl_mod.crawl_and_extract(base + "/", max_depth=3))
+    check("start page failure is an ERROR", crawl_mod.crawl_and_extract(base + "/missing.html").startswith("ERROR:"))
+
+    print("sharing")
+    page_cache.clear()
+    crawl_mod.crawl(base, max_depth=1)  # no path: queued as base + "/"
+    check("crawled page serves a later fetch", cached_document(base) is not None
+          and cached_document(base + "/#top") is not None
+          and cached_document(base.replace("http:", "HTTP:") + "/guide/install.html") is not None)
+    page_cache.clear()
+    hits.clear()
+    pending = prefetch(base + "/index.html")
+    crawl_mod.crawl(base + "/index.html", max_depth=0)
+    pending.result()
+    check("in-flight prefetch joined", hits.get("/index.html") == 1, hits)
+
+    print(f"wall time, depth 3 (page latency {args.page_ms:.0f} ms, best of {args.runs})")
+    results = {}
+    for concurrency in (1, crawl_mod.CRAWL_CONCURRENCY):
+        crawl_mod.CRAWL_CONCURRENCY = concurrency
+        best = float("inf")
+        for _ in range(args.runs):
+            page_cache.clear()
+            t0 = time.perf_counter()
+            crawl_mod.crawl(base + "/index.html", max_depth=3, max_pages=30)
+            best = min(best, time.perf_counter() - t0)
+        results[concurrency] = best
+        print(f"  concurrency {concurrency:>2}: {best * 1000:7.1f} ms")
+    one, many = results[1], results[max(results)]
+    print(f"  speedup x{one / many:.1f}")
+
+    server.shutdown()
+    print("all checks passed" if not failures else f"{failures} check(s) failed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for the LiteLLM proxy and for web pages, so server benchmarks
+run offline and deterministically.
+
+    python benchmarks/fakes.py --proxy-port 4010 --page-port 4011
+
+Fake proxy (OpenAI-compatible, POST /chat/completions or /v1/chat/completions):
+  - when tools are offered, the last user message has a URL and no tool result is
+    present yet, it calls the fetch tool (fetch_and_summarize, else the first tool
+    with "fetch" in its name) with that URL, streamed or not
+  - non-stream: otherwise a short answer after --ttft-ms
+  - stream: --ttft-ms, then --tokens chunks every --token-ms, then a usage chunk
+    (when stream_options.include_usage is set) and [DONE]
+GET /fake/stats: requests, completions and the time spent serving them, pages and
+their time, and the tool dispatch delays seen (tool call answered -> the page
+request it asked for arrived; meaningful while clients run one turn at a time).
+Page server: GET /page/<name>?paragraphs=N -> synthetic article HTML (same
+generator as bench_extract.py; <name> only makes URLs distinct to defeat caches).
+
+TLS stand-in for the proxy (connection warm-up / keep-alive tests):
+    python benchmarks/fakes.py --tls /tmp/fake-tls --handshake-ms 80 --keepalive-sec 5
+serves https://localhost:<proxy-port> with a self-signed cert (<dir>/cert.pem,
+generated with openssl on first use: trust it via SSL_CERT_FILE), makes every
+TLS handshake cost --handshake-ms (a stand-in for the network round trips of a
+remote proxy; it blocks the fake's loop, which is fine for sequential probes),
+closes connections idle for --keepalive-sec (uvicorn's default is 5), and counts
+handshakes at GET /fake/stats.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import ssl
+import subprocess
+import time
+import uuid
+
+from aiohttp import web
+
+from bench_extract import synthetic_page
+
+URL_RE = re.compile(r"https?://\S+")
+
+
+def _completion(model: str, message: dict, usage: dict) -> dict:
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": message, "finish_reason":
+                     "tool_calls" if message.get("tool_calls") else "stop"}],
+        "usage": usage,
+    }
+
+
+def _chunk(model: str, delta: dict, finish=None) -> dict:
+    return {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+            "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": finish}]}
+
+
+FAKE_STATS = {"handshakes": 0, "requests": 0, "completions": 0, "completion_ms": 0.0, "tool_calls": 0,
+              "pages": 0, "page_ms": 0.0, "dispatch_ms": []}
+_last_tool_call = [0.0]  # perf_counter when the latest tool call was sent
+
+
+def _fetch_tool(tools: list) -> str:
+    names = [(t.get("function") or {}).get("name") or t.get("name", "") for t in tools]
+    return next((n for n in names if n == "fetch_and_summarize"), None) or \
+        next((n for n in names if "fetch" in n), names[0])
+
+
+def _timed(kind: str):
+    @web.middleware
+    async def middleware(request: web.Request, handler):
+        if kind == "completion":
+            FAKE_STATS["requests"] += 1  # everything the proxy sees, warm-up pings included
+            if not request.path.endswith("/chat/completions"):
+                return await handler(request)
+        t0 = time.perf_counter()
+        try:
+            return await handler(request)
+        finally:
+            FAKE_STATS[kind + "s"] += 1
+            FAKE_STATS[kind + "_ms"] += (time.perf_counter() - t0) * 1000
+    return middleware
+
+
+def tls_context(cert_dir: str, handshake_ms: float) -> ssl.SSLContext:
+    """Server context for localhost with a self-signed cert kept in cert_dir."""
+    cert, key = os.path.join(cert_dir, "cert.pem"), os.path.join(cert_dir, "key.pem")
+    if not os.path.exists(cert):
+        os.makedirs(cert_dir, exist_ok=True)
+        subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "7",
+                        "-keyout", key, "-out", cert, "-subj", "/CN=localhost",
+                        "-addext", "subjectAltName=DNS:localhost,IP:127.0.0.1"],
+                       check=True, capture_output=True)
+    ctx = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    ctx.load_cert_chain(cert, key)
+
+    def on_hello(_sock, _server_name, _ctx):
+        # runs once per full handshake (clients send SNI for "localhost", not for bare IPs)
+        FAKE_STATS["handshakes"] += 1
+        if handshake_ms:
+            time.sleep(handshake_ms / 1000)
+
+    ctx.sni_callback = on_hello
+    return ctx
+
+
+def make_proxy(args: argparse.Namespace) -> web.Application:
+    words = [f"word{i}" for i in range(args.tokens)]
+
+    async def completions(request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        model = body.get("model", "fake")
+        messages = body.get("messages", [])
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in messages) // 4
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(words),
+                 "total_tokens": prompt_tokens + len(words)}
+
+        last_user = next((m for m in reversed(messages) if m.get("role") == "user"), {})
+        url = URL_RE.search(str(last_user.get("content", "")))
+        has_tool_result = any(m.get("role") == "tool" for m in messages)
+        call = None
+        if body.get("tools") and url and not has_tool_result:
+            call = {"id": f"call_{uuid.uuid4().hex[:8]}", "type": "function",
+                    "function": {"name": _fetch_tool(body["tools"]), "arguments": json.dumps({"url": url.group(0)})}}
+            FAKE_STATS["tool_calls"] += 1
+
+        if not body.get("stream"):
+            await asyncio.sleep(args.ttft_ms / 1000)
+            if call:
+                _last_tool_call[0] = time.perf_counter()
+                return web.json_response(_completion(model, {"role": "assistant", "content": None,
+                                                             "tool_calls": [call]}, usage))
+            return web.json_response(_completion(model, {"role": "assistant", "content": " ".join(words)}, usage))
+
+        resp = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await resp.prepare(request)
+        await asyncio.sleep(args.ttft_ms / 1000)
+        if call:
+            delta = {"role": "assistant", "tool_calls": [{"index": 0, **call}]}
+            await resp.write(f"data: {json.dumps(_chunk(model, delta))}\n\n".encode())
+            await resp.write(f"data: {json.dumps(_chunk(model, {}, 'tool_calls'))}\n\n".encode())
+            await resp.write(b"data: [DONE]\n\n")
+            _last_tool_call[0] = time.perf_counter()
+            return resp
+        for word in words:
+            await resp.write(f"data: {json.dumps(_chunk(model, {'content': word + ' '}))}\n\n".encode())
+            await asyncio.sleep(args.token_ms / 1000)
+        await resp.write(f"data: {json.dumps(_chunk(model, {}, 'stop'))}\n\n".encode())
+        if (body.get("stream_options") or {}).get("include_usage"):
+            tail = {**_chunk(model, {}), "choices": [], "usage": usage}
+            await resp.write(f"data: {json.dumps(tail)}\n\n".encode())
+        await resp.write(b"data: [DONE]\n\n")
+        return resp
+
+    async def models(_request: web.Request) -> web.Response:
+        return web.json_response({"object": "list", "data": [{"id": "fake", "object": "model"}]})
+
+    async def fake_stats(_request: web.Request) -> web.Response:
+        return web.json_response(FAKE_STATS)
+
+    app = web.Application(client_max_size=64 * 1024 * 1024, middlewares=[_timed("completion")])
+    for prefix in ("", "/v1"):
+        app.router.add_post(f"{prefix}/chat/completions", completions)
+        app.router.add_get(f"{prefix}/models", models)
+    app.router.add_get("/fake/stats", fake_stats)
+    return app
+
+
+def make_page_server(args: argparse.Namespace) -> web.Application:
+    cache: dict = {}
+
+    async def page(request: web.Request) -> web.Response:
+        if _last_tool_call[0]:
+            FAKE_STATS["dispatch_ms"].append(round((time.perf_counter() - _last_tool_call[0]) * 1000, 2))
+            _last_tool_call[0] = 0.0
+        n = int(request.query.get("paragraphs", args.paragraphs))
+        if n not in cache:
+            cache[n] = synthetic_page(n)
+        await asyncio.sleep(args.page_ms / 1000)
+        return web.Response(body=cache[n], content_type="text/html", charset="utf-8")
+
+    app = web.Application(middlewares=[_timed("page")])
+    app.router.add_get("/page/{name}", page)
+    return app
+
+
+async def serve(args: argparse.Namespace) -> None:
+    runners = []
+    proxy_tls = tls_context(args.tls, args.handshake_ms) if args.tls else None
+    for app, port, tls in ((make_proxy(args), args.proxy_port, proxy_tls),
+                           (make_page_server(args), args.page_port, None)):
+        runner = web.AppRunner(app, access_log=None, keepalive_timeout=args.keepalive_sec)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", port, ssl_context=tls).start()
+        runners.append(runner)
+    proxy = f"https://localhost:{args.proxy_port}" if proxy_tls else f"http://127.0.0.1:{args.proxy_port}"
+    print(f"fake proxy {proxy}  pages http://127.0.0.1:{args.page_port}/page/<name>", flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        for runner in runners:
+            await runner.cleanup()
+
+
+def add_arguments(ap: argparse.ArgumentParser) -> None:
+    ap.add_argument("--proxy-port", type=int, default=4010)
+    ap.add_argument("--page-port", type=int, default=4011)
+    ap.add_argument("--ttft-ms", type=float, default=50, help="delay before the first token / non-stream answer")
+    ap.add_argument("--tokens", type=int, default=40, help="completion length")
+    ap.add_argument("--token-ms", type=float, default=5, help="gap between streamed tokens")
+    ap.add_argument("--paragraphs", type=int, default=200, help="default synthetic page size")
+    ap.add_argument("--page-ms", type=float, default=20, help="page server latency")
+    ap.add_argument("--tls", metavar="DIR", default="", help="serve the proxy over TLS with a self-signed cert in DIR")
+    ap.add_argument("--handshake-ms", type=float, default=0, help="extra cost of every TLS handshake (with --tls)")
+    ap.add_argument("--keepalive-sec", type=float, default=75, help="close connections idle this long (aiohttp: 75)")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(ap)
+    try:
+        asyncio.run(serve(ap.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
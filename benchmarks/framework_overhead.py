@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+What each agent stack adds on top of the model: every stack is driven headlessly
+with the same scripted conversation against the fake proxy + page server
+(benchmarks/fakes.py), one stack per fresh interpreter, one turn at a time.
+
+  startup       import the stack's entry module + build its agent (no LLM call)
+  first turn    the warm-up session's first turn (lazy imports, client setup)
+  overhead      turn wall time minus the time the fakes spent serving it
+                (completions + pages), p50 over the measured sessions
+  cpu           process CPU per turn (all threads), p50
+  dispatch      tool call answered by the proxy -> page request at the page
+                server: the framework's parse + dispatch + the tool's own setup
+  MB/session    RSS growth per extra live session (history, framework state)
+  calls         completions per scripted session (framework round trips)
+
+Every stack runs the same three turns per session (greeting, summarize a page
+via its fetch tool, follow-up question); page URLs differ per session so the
+shared page cache doesn't hide the fetch. Stacks whose SDK isn't installed show
+up as "not installed". The M365 engine runs without its URL prefetch, so its
+tool call isn't answered from a download that started before it.
+
+    python benchmarks/framework_overhead.py --sessions 6 --ttft-ms 50
+    python benchmarks/framework_overhead.py --stacks m365 langgraph --json
+"""
+import argparse
+import asyncio
+import contextlib
+import gc
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+import uuid
+from pathlib import Path
+
+_T0 = time.perf_counter()  # child mode: startup is measured from here
+
+HERE = Path(__file__).resolve().parent
+ROOT = HERE.parent
+
+# name -> directory the stack normally runs from
+STACKS = {
+    "strands": "aws_strands_trial",
+    "langgraph": "langgraph_agent_trial",
+    "agents_sdk": "openai-agent-sdk-trial",
+    "adk": "google_adk_trial",
+    "m365": "ms_365_agent_trial",
+}
+
+PROMPTS = [
+    "Hello! In one sentence, what can you help me with?",
+    "Summarize {pages}/page/{session}?paragraphs=40",
+    "Which region had the highest figure on that page?",
+]
+
+MODEL_ID = "fake-tools-model"
+
+
+def _env(proxy: str) -> dict:
+    return {
+        **os.environ,
+        "USE_LITELLM": "1",
+        "LITELLM_PROXY_URL": proxy + "/v1",
+        "LITELLM_PROXY_API_BASE": proxy,
+        "LITELLM_PROXY_API_KEY": "sk-bench",
+        "OPENAI_API_KEY": "sk-bench",
+        "LITELLM_MODEL_ID": MODEL_ID,
+        "OPENAI_AGENT_SDK_ACTIVE_MODEL": "BENCH",
+        "OPENAI_AGENT_SDK_MODEL_ALIAS_BENCH": MODEL_ID,
+        "OPENAI_AGENT_SDK_ROUTER_ALIASES": "",
+        "USAGE_LOG_PATH": "",
+        "RECORD_DIR": "",
+        "PARSE_POOL_WORKERS": "0",  # no parse processes in anyone's RSS
+        "FETCH_HOST_RPS": "0",
+        "PROXY_PING_SEC": "0",  # warm once, no pings in the middle of a measured turn
+    }
+
+
+# ---------------------------------------------------------------------------
+# Drivers (child side): new_session() -> handle, turn(handle, text) runs one turn
+# the way the stack's own REPL does, output discarded.
+# ---------------------------------------------------------------------------
+class StrandsDriver:
+    def __init__(self):
+        import agent as mod
+        self.mod = mod
+        self.mod.create_agent()  # the build is part of startup; sessions build their own
+
+    def new_session(self):
+        return self.mod.create_agent()  # a Strands Agent is the conversation
+
+    def turn(self, session, text):
+        session(text)
+
+
+class LangGraphDriver:
+    def __init__(self):
+        import main as mod
+        self.mod = mod
+        self.agent = mod.build_agent()
+
+    def new_session(self):
+        return uuid.uuid4().hex[:8]  # thread_id in the in-memory checkpointer
+
+    def turn(self, session, text):
+        from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
+        from langchain_core.messages import HumanMessage
+
+        cfg = {"configurable": {"thread_id": session},
+               "callbacks": [StreamingStdOutCallbackHandler(), self.mod._tool_log_handler_cls()()]}
+        self.agent.invoke({"messages": [HumanMessage(content=text)]}, config=cfg)
+
+
+class AgentsSdkDriver:
+    def __init__(self):
+        import run_agent as mod
+        from agents import Agent, OpenAIChatCompletionsModel
+
+        self.loop = asyncio.new_event_loop()
+        self.agent = Agent(name="ProxyAgent", instructions="You are a helpful assistant.",
+                           model=OpenAIChatCompletionsModel(model=mod.MODEL_ID, openai_client=mod.client),
+                           tools=[mod.fetch_and_summarize])
+
+    def new_session(self):
+        from agents import SQLiteSession
+        return SQLiteSession(uuid.uuid4().hex[:8])
+
+    def turn(self, session, text):
+        from agents import Runner
+
+        async def run():
+            result = Runner.run_streamed(self.agent, input=text, session=session)
+            async for _event in result.stream_events():
+                pass
+        self.loop.run_until_complete(run())
+
+
+class AdkDriver:
+    def __init__(self):
+        import run_inprocess as mod  # imports agent.root_agent, which builds it
+        from google.adk.runners import Runner
+        from google.adk.sessions import InMemorySessionService
+
+        self.mod = mod
+        self.loop = asyncio.new_event_loop()
+        self.service = InMemorySessionService()
+        self.runner = Runner(agent=mod.root_agent, app_name=mod.APP_NAME, session_service=self.service)
+
+    def new_session(self):
+        return self.loop.run_until_complete(self.mod._new_session(self.service))
+
+    def turn(self, session, text):
+        self.loop.run_until_complete(self.mod.run_turn(self.runner, session, text))
+
+
+class M365Driver:
+    def __init__(self):
+        from core import engine
+        self.engine = engine
+        self.loop = asyncio.new_event_loop()
+
+    def new_session(self):
+        return "bench-" + uuid.uuid4().hex[:8]
+
+    def turn(self, session, text):
+        async def discard(_event, _data):
+            pass
+        messages = self.engine.build_messages(session, text)
+        reply = self.loop.run_until_complete(self.engine.handle_engine_turn_streaming(discard, messages, session))
+        self.engine.append_history(session, "user", text)
+        self.engine.append_history(session, "assistant", reply)
+
+
+DRIVERS = {"strands": StrandsDriver, "langgraph": LangGraphDriver, "agents_sdk": AgentsSdkDriver,
+           "adk": AdkDriver, "m365": M365Driver}
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        import resource  # peak, not current: only an upper bound off Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _fake_stats(proxy: str) -> dict:
+    with urllib.request.urlopen(proxy + "/fake/stats", timeout=10) as r:
+        return json.loads(r.read())
+
+
+def run_child(stack: str, proxy: str, pages: str, sessions: int) -> dict:
+    sys.path.insert(0, os.getcwd())  # the stack's own directory (the script's dir is sys.path[0])
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        driver = DRIVERS[stack]()
+        startup_ms = (time.perf_counter() - _T0) * 1000
+
+        turns, live, rss, calls = [], [], [], []
+        for n in range(sessions + 1):  # session 0 warms up and isn't measured
+            session = driver.new_session()
+            live.append(session)  # keep every session alive: memory per session is what they retain
+            before_session = _fake_stats(proxy)
+            for text in PROMPTS:
+                before = _fake_stats(proxy)
+                t0, c0 = time.perf_counter(), time.process_time()
+                driver.turn(session, text.format(pages=pages, session=f"{stack}-{n}"))
+                wall, cpu = (time.perf_counter() - t0) * 1000, (time.process_time() - c0) * 1000
+                after = _fake_stats(proxy)
+                upstream = (after["completion_ms"] - before["completion_ms"]) + (after["page_ms"] - before["page_ms"])
+                turns.append({"session": n, "wall_ms": wall, "cpu_ms": cpu, "overhead_ms": wall - upstream,
+                              "dispatch_ms": after["dispatch_ms"][len(before["dispatch_ms"]):]})
+            calls.append(after["completions"] - before_session["completions"])
+            gc.collect()
+            rss.append(_rss_mb())
+
+    measured = [t for t in turns if t["session"] > 0] or turns
+    dispatch = [d for t in measured for d in t["dispatch_ms"]]
+    return {
+        "stack": stack,
+        "startup_ms": startup_ms,
+        "first_turn_ms": turns[0]["wall_ms"],
+        "overhead_ms": statistics.median(t["overhead_ms"] for t in measured),
+        "overhead_p95_ms": sorted(t["overhead_ms"] for t in measured)[int(0.95 * (len(measured) - 1))],
+        "cpu_ms": statistics.median(t["cpu_ms"] for t in measured),
+        "dispatch_ms": statistics.median(dispatch) if dispatch else None,
+        "mb_per_session": (rss[-1] - rss[0]) / max(1, len(rss) - 1),
+        "rss_mb": rss[-1],
+        "calls": statistics.median(calls[1:] or calls),
+        "turns": len(measured),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Parent side
+# ---------------------------------------------------------------------------
+def wait_http(url: str, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return
+        except Exception:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
+
+
+def run_stack(stack: str, proxy: str, pages: str, sessions: int, timeout: float) -> dict:
+    cmd = [sys.executable, str(Path(__file__).resolve()), "--child", stack, "--proxy", proxy, "--pages", pages,
+           "--sessions", str(sessions)]
+    try:
+        proc = subprocess.run(cmd, cwd=ROOT / STACKS[stack], env=_env(proxy), capture_output=True, text=True,
+                              timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {"stack": stack, "error": f"timed out after {timeout:.0f}s"}
+    result = next((line[len("RESULT "):] for line in proc.stdout.splitlines() if line.startswith("RESULT ")), None)
+    if proc.returncode == 3:
+        return {"stack": stack, "error": "not installed (" + proc.stderr.strip().splitlines()[-1] + ")"}
+    if result is None:
+        last = (proc.stderr.strip().splitlines() or ["no output"])[-1]
+        return {"stack": stack, "error": f"failed: {last}"}
+    return json.loads(result)
+
+
+def _ms(value) -> str:
+    return "-" if value is None else f"{value:.1f}"
+
+
+def print_table(results: list) -> None:
+    print(f"{'stack':<11} {'startup ms':>10} {'1st turn':>9} {'overhead':>9} {'p95':>7} {'cpu ms':>7} "
+          f"{'dispatch':>9} {'MB/sess':>8} {'calls':>6}")
+    for r in results:
+        if "error" in r:
+            print(f"{r['stack']:<11} {r['error']}")
+            continue
+        print(f"{r['stack']:<11} {r['startup_ms']:>10.0f} {r['first_turn_ms']:>9.0f} {r['overhead_ms']:>9.1f} "
+              f"{r['overhead_p95_ms']:>7.1f} {r['cpu_ms']:>7.1f} {_ms(r['dispatch_ms']):>9} "
+              f"{r['mb_per_session']:>8.2f} {r['calls']:>6g}")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--stacks", nargs="+", choices=list(STACKS), default=list(STACKS))
+    ap.add_argument("--sessions", type=int, default=5, help="measured sessions per stack (plus one warm-up)")
+    ap.add_argument("--ttft-ms", type=float, default=50, help="fake proxy latency per completion")
+    ap.add_argument("--page-ms", type=float, default=10, help="page server latency")
+    ap.add_argument("--proxy-port", type=int, default=4060)
+    ap.add_argument("--timeout", type=float, default=300, help="per stack")
+    ap.add_argument("--json", action="store_true", help="print the results as JSON instead of a table")
+    ap.add_argument("--child", choices=list(STACKS), help=argparse.SUPPRESS)
+    ap.add_argument("--proxy", help=argparse.SUPPRESS)
+    ap.add_argument("--pages", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        try:
+            result = run_child(args.child, args.proxy, args.pages, args.sessions)
+        except ModuleNotFoundError as e:
+            print(e, file=sys.stderr)
+            return 3
+        print("RESULT " + json.dumps(result), flush=True)
+        return 0
+
+    proxy, pages = f"http://127.0.0.1:{args.proxy_port}", f"http://127.0.0.1:{args.proxy_port + 1}"
+    fakes = subprocess.Popen([sys.executable, "fakes.py", "--proxy-port", str(args.proxy_port),
+                              "--page-port", str(args.proxy_port + 1), "--ttft-ms", str(args.ttft_ms),
+                              "--tokens", "20", "--token-ms", "2", "--page-ms", str(args.page_ms)],
+                             cwd=HERE, stdout=subprocess.DEVNULL)
+    try:
+        wait_http(proxy + "/fake/stats")
+        results = []
+        for stack in args.stacks:
+            results.append(run_stack(stack, proxy, pages, args.sessions, args.timeout))
+            if not args.json:
+                print(f"  {stack}: {'ok' if 'error' not in results[-1] else results[-1]['error']}", flush=True)
+    finally:
+        fakes.terminate()
+        fakes.wait(timeout=10)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"\nfake proxy: {args.ttft_ms:.0f} ms to first token, 20 tokens; pages: {args.page_ms:.0f} ms; "
+              f"{args.sessions} sessions x {len(PROMPTS)} turns per stack (times in ms, p50 unless noted)")
+        print_table(results)
+    return 0 if any("error" not in r for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Routing checks for the Agents SDK trial's LatencyRouterModel
+(openai-agent-sdk-trial/model_router.py), driven through the SDK's Runner against
+an in-process fake proxy whose behaviour per model id the script switches:
+
+  failover 429         best alias rate-limited (Retry-After): served by the next, the
+                       limited one parked; later requests don't touch it
+  failover 5xx         best alias answers 500 (non-streamed and streamed runs)
+  failover connection  best alias drops the connection without an answer
+  broken, cooled down  an alias that never succeeded stays behind the healthy one
+                       after its failure cooldown ends (its errors count as latency)
+  cooldown expiry      a rate-limited alias gets traffic back once Retry-After passes
+  latency preference   after both aliases are measured, the faster one gets the traffic
+  bad request          a 400 is raised to the caller and leaves the alias's stats alone
+  broken mid-stream    a stream cut after its first chunk is booked once, as a failure
+
+Exploration is off (ROUTER_EXPLORE_PROB=0) so every request goes to the ranked best.
+Exits 1 when a check fails, 3 when the Agents SDK isn't installed.
+
+    python benchmarks/model_router_check.py
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+from aiohttp import web
+
+from fakes import _chunk, _completion
+
+HERE = Path(__file__).resolve().parent
+SDK_DIR = HERE.parent / "openai-agent-sdk-trial"
+
+os.environ.update(ROUTER_EXPLORE_PROB="0", ROUTER_FAILURE_COOLDOWN_SEC="0.5")
+
+
+class FakeModels:
+    """model id -> (latency_ms, failure): failure is "", "400", "429", "500", "drop" or "midstream"."""
+
+    def __init__(self) -> None:
+        self.behaviour = {}
+        self.hits: Counter = Counter()
+
+    def set(self, model: str, latency_ms: float = 10, failure: str = "") -> None:
+        self.behaviour[model] = (latency_ms, failure)
+
+    def app(self) -> web.Application:
+        async def completions(request: web.Request) -> web.StreamResponse:
+            body = await request.json()
+            model = body.get("model", "")
+            self.hits[model] += 1
+            latency_ms, failure = self.behaviour.get(model, (10, ""))
+            await asyncio.sleep(latency_ms / 1000)
+            if failure == "429":
+                return web.json_response({"error": {"message": "rate limited"}}, status=429,
+                                         headers={"Retry-After": "1"})
+            if failure == "400":
+                return web.json_response({"error": {"message": "bad request"}}, status=400)
+            if failure == "500":
+                return web.json_response({"error": {"message": "upstream failed"}}, status=500)
+            if failure == "drop":
+                request.transport.close()
+                return web.Response()
+            usage = {"prompt_tokens": 5, "completion_tokens": 2, "total_tokens": 7}
+            if not body.get("stream"):
+                return web.json_response(_completion(model, {"role": "assistant", "content": f"hi from {model}"},
+                                                     usage))
+            resp = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+            await resp.prepare(request)
+            for delta in ({"role": "assistant", "content": "hi "}, {"content": f"from {model}"}):
+                await resp.write(f"data: {json.dumps(_chunk(model, delta))}\n\n".encode())
+                if failure == "midstream":
+                    await asyncio.sleep(0.02)
+                    request.transport.close()
+                    return resp
+            await resp.write(f"data: {json.dumps(_chunk(model, {}, 'stop'))}\n\n".encode())
+            await resp.write(b"data: [DONE]\n\n")
+            return resp
+
+        app = web.Application()
+        for prefix in ("", "/v1"):
+            app.router.add_post(f"{prefix}/chat/completions", completions)
+        return app
+
+
+async def run_checks(port: int) -> int:
+    try:
+        import openai
+        from agents import Agent, Runner, set_tracing_disabled
+    except ImportError as e:
+        print(f"Agents SDK not installed ({e})")
+        return 3
+    sys.path.insert(0, str(SDK_DIR))
+    from model_router import LatencyRouterModel
+
+    set_tracing_disabled(True)
+    fake = FakeModels()
+    runner = web.AppRunner(fake.app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    client = openai.AsyncOpenAI(base_url=f"http://127.0.0.1:{port}", api_key="sk-check")
+    failures = 0
+
+    def router(*models: str) -> LatencyRouterModel:
+        fake.hits.clear()
+        return LatencyRouterModel([(m.upper(), m) for m in models], openai_client=client)
+
+    async def ask(model: LatencyRouterModel, stream: bool = False) -> str:
+        agent = Agent(name="RouterCheck", instructions="Be brief.", model=model)
+        if not stream:
+            return (await Runner.run(agent, "hello")).final_output
+        result = Runner.run_streamed(agent, "hello")
+        async for _event in result.stream_events():
+            pass
+        return result.final_output
+
+    def row(model: LatencyRouterModel, alias: str) -> dict:
+        return next(r for r in model.stats() if r["alias"] == alias)
+
+    def check(name: str, ok: bool, detail: str) -> None:
+        nonlocal failures
+        failures += not ok
+        print(f"  {name:<28} {'ok  ' if ok else 'FAIL'}  {detail}")
+
+    try:
+        # failover: the first alias (unmeasured, tried first) fails, the second answers;
+        # the failed one is parked, so the follow-up requests never reach it
+        for failure, stream in (("429", False), ("500", False), ("500", True), ("drop", False)):
+            fake.set("alpha", 10, failure)
+            fake.set("beta", 10)
+            r = router("alpha", "beta")
+            answers = [await ask(r, stream) for _ in range(4)]
+            a = row(r, "ALPHA")
+            ok = all(x == "hi from beta" for x in answers) and fake.hits["alpha"] == 1 and a["failovers"] == 1
+            label = {"429": "failover 429", "500": "failover 5xx", "drop": "failover connection"}[failure]
+            check(label + (" (streamed)" if stream else ""), ok,
+                  f"alpha hits {fake.hits['alpha']}, beta hits {fake.hits['beta']}, alpha: {a['last_error']}")
+
+        # an alias that never worked must not win again just because its cooldown ended
+        fake.set("alpha", 10, "500")
+        fake.set("beta", 10)
+        r = router("alpha", "beta")
+        await ask(r)
+        await asyncio.sleep(0.6)  # past ROUTER_FAILURE_COOLDOWN_SEC
+        for _ in range(4):
+            await ask(r)
+        check("broken, cooled down", fake.hits["alpha"] == 1,
+              f"alpha hits {fake.hits['alpha']} (score {row(r, 'ALPHA')['score']:.2f} s), beta hits {fake.hits['beta']}")
+
+        # cooldown expiry: fast alpha is rate-limited for Retry-After (1 s), then healthy again
+        fake.set("alpha", 10)
+        fake.set("beta", 120)
+        r = router("alpha", "beta")
+        await ask(r)
+        await ask(r)  # beta measured too (alpha was unmeasured-first, beta next)
+        fake.set("alpha", 10, "429")
+        during = [await ask(r) for _ in range(3)]
+        fake.set("alpha", 10)
+        await asyncio.sleep(1.1)
+        after = await ask(r)
+        check("cooldown expiry", during == ["hi from beta"] * 3 and after == "hi from alpha",
+              f"while parked: {sorted(set(during))}, after Retry-After: {after!r}")
+
+        # latency preference: once both are measured, the faster alias takes the traffic
+        fake.set("alpha", 150)
+        fake.set("beta", 15)
+        r = router("alpha", "beta")
+        for _ in range(2):
+            await ask(r)  # one sample each
+        before = Counter(fake.hits)
+        t0 = time.perf_counter()
+        for _ in range(8):
+            await ask(r)
+        served = Counter(fake.hits) - before
+        check("latency preference", served["beta"] == 8 and served["alpha"] == 0,
+              f"last 8 requests: beta {served['beta']}, alpha {served['alpha']} "
+              f"({(time.perf_counter() - t0) / 8 * 1000:.0f} ms avg)")
+        print()
+        print(r.format_stats())
+        print()
+
+        # a malformed request is the caller's fault: raised, alias stats untouched
+        fake.set("alpha", 10)
+        r = router("alpha")
+        await ask(r)
+        fake.set("alpha", 10, "400")
+        try:
+            await ask(r)
+            raised = ""
+        except openai.BadRequestError as e:
+            raised = type(e).__name__
+        a = row(r, "ALPHA")
+        check("bad request", raised and a["failures"] == 0 and a["ewma_error"] == 0.0 and not a["cooling_down_sec"],
+              f"raised {raised or 'nothing'}, failures {a['failures']}, ewma_error {a['ewma_error']:.2f}")
+
+        # cut mid-stream: too late to fail over, one failure and no success
+        fake.set("alpha", 10, "midstream")
+        r = router("alpha")
+        try:
+            await ask(r, stream=True)
+            raised = ""
+        except openai.APIConnectionError as e:
+            raised = type(e).__name__
+        a = row(r, "ALPHA")
+        check("broken mid-stream", raised and a["failures"] == 1 and a["successes"] == 0 and a["failovers"] == 0,
+              f"raised {raised or 'nothing'}, successes {a['successes']}, failures {a['failures']}")
+    finally:
+        await client.close()
+        await runner.cleanup()
+    print("all checks passed" if not failures else f"{failures} check(s) failed")
+    return 1 if failures else 0
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--port", type=int, default=4050, help="fake proxy port")
+    args = ap.parse_args()
+    return asyncio.run(run_checks(args.port))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+First-request latency to the LiteLLM proxy with and without warm connections
+(M365 core.lite_llm_model + webfetch.keepalive), against the fake proxy served
+over TLS (benchmarks/fakes.py --tls) with a --handshake-ms cost per handshake
+and a --keepalive-sec idle timeout on the server side.
+
+  cold          fresh client, no warmer: the first chat() pays connect + TLS
+  warmed        fresh client, warmer started: the first chat() reuses a connection
+  idle, no ping warmed, then idle past the proxy's keep-alive: the proxy dropped it
+  idle, pinged  same idle period with PROXY_PING_SEC pings: still warm
+
+For each: the first completion's latency, the handshakes the proxy saw during it
+and a second completion for reference. Exits 1 when a warm case still shakes hands.
+In the pinged case the probe goes out right after a ping round: one that lands
+during a round (a few ms every PROXY_PING_SEC) takes a new connection.
+
+    python benchmarks/proxy_warmup.py --handshake-ms 80 --keepalive-sec 2
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+M365_DIR = HERE.parent / "ms_365_agent_trial"
+
+
+def wait_tls(url: str, cafile: str, timeout: float = 15.0) -> None:
+    import ssl
+
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            urllib.request.urlopen(url, timeout=1, context=ssl.create_default_context(cafile=cafile)).read()
+            return
+        except Exception:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--handshake-ms", type=float, default=80, help="cost the fake proxy adds to every TLS handshake")
+    ap.add_argument("--keepalive-sec", type=float, default=2, help="fake proxy's idle connection timeout")
+    ap.add_argument("--ttft-ms", type=float, default=20, help="fake proxy latency per completion")
+    ap.add_argument("--connections", type=int, default=2, help="PROXY_WARM_CONNECTIONS")
+    ap.add_argument("--proxy-port", type=int, default=4030)
+    args = ap.parse_args()
+
+    cert_dir = tempfile.mkdtemp(prefix="fake-tls-")
+    fakes = subprocess.Popen([sys.executable, "fakes.py", "--proxy-port", str(args.proxy_port),
+                              "--page-port", str(args.proxy_port + 1), "--ttft-ms", str(args.ttft_ms),
+                              "--tls", cert_dir, "--handshake-ms", str(args.handshake_ms),
+                              "--keepalive-sec", str(args.keepalive_sec)], cwd=HERE)
+    base = f"https://localhost:{args.proxy_port}"
+    failures = 0
+    try:
+        wait_tls(base + "/fake/stats", os.path.join(cert_dir, "cert.pem"))
+        os.environ.update(LITELLM_PROXY_URL=base + "/v1", LITELLM_PROXY_API_KEY="x", USAGE_LOG_PATH="",
+                          RECORD_DIR="", SSL_CERT_FILE=os.path.join(cert_dir, "cert.pem"),
+                          PROXY_WARM_CONNECTIONS=str(args.connections))
+        os.chdir(M365_DIR)
+        sys.path.insert(0, str(M365_DIR))
+        from core import lite_llm_model as llm
+
+        llm.get_client()  # the SDK import isn't what's measured
+
+        def handshakes() -> int:
+            # through the client under test would itself open a connection: use a throwaway one
+            import ssl
+            ctx = ssl.create_default_context(cafile=os.environ["SSL_CERT_FILE"])
+            with urllib.request.urlopen(base + "/fake/stats", context=ctx) as r:
+                return json.loads(r.read())["handshakes"]
+
+        def fresh(interval_sec=None):
+            llm.get_client.cache_clear()
+            llm.connection_warmer.cache_clear()
+            if interval_sec is None:
+                return None
+            warmer = llm.connection_warmer()
+            warmer.interval_sec = interval_sec
+            warmer.start()
+            deadline = time.monotonic() + 10
+            while not warmer.stats()["rounds"] and time.monotonic() < deadline:
+                time.sleep(0.01)
+            return warmer
+
+        def timed_chat() -> tuple:
+            before = handshakes()
+            t0 = time.perf_counter()
+            llm.chat([{"role": "user", "content": "ping"}], tool_choice=None)
+            return (time.perf_counter() - t0) * 1000, handshakes() - before - 1  # minus the first probe's own
+
+        print(f"fake proxy {base} (handshake {args.handshake_ms:.0f} ms, idle timeout {args.keepalive_sec:g} s, "
+              f"completion {args.ttft_ms:.0f} ms), {args.connections} warm connections")
+        print(f"  {'case':<15} {'first ms':>9} {'handshakes':>10} {'second ms':>10}  pool")
+        idle = args.keepalive_sec + 1.0
+        cases = [("cold", None, 0.0, True), ("warmed", 0.0, 0.0, False),
+                 ("idle, no ping", 0.0, idle, True), ("idle, pinged", min(1.0, args.keepalive_sec / 2), idle, False)]
+        for name, interval, sleep_sec, expect_handshake in cases:
+            warmer = fresh(interval)
+            time.sleep(sleep_sec)
+            if interval:
+                rounds = warmer.stats()["rounds"]
+                while warmer.stats()["rounds"] == rounds:
+                    time.sleep(0.002)
+            first_ms, shakes = timed_chat()
+            second_ms, _ = timed_chat()
+            pool = warmer.stats()["pool"] if warmer else {}
+            if warmer:
+                warmer.stop()
+            ok = (shakes > 0) == expect_handshake
+            failures += not ok
+            print(f"  {name:<15} {first_ms:>9.1f} {shakes:>10} {second_ms:>10.1f}  {pool}"
+                  + ("" if ok else "   <- FAIL"))
+    finally:
+        fakes.terminate()
+        fakes.wait(timeout=10)
+    print("all checks passed" if not failures else f"{failures} check(s) failed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Replay recorded M365 traffic (RECORD_DIR, see ms_365_agent_trial/core/recorder.py) offline.
+
+    python benchmarks/replay.py recordings/rec-*.jsonl.gz                 # starts app.py against the replay
+    python benchmarks/replay.py recordings/*.jsonl.gz --workers 4 --pace recorded --speed 2
+    python benchmarks/replay.py rec.jsonl.gz --serve-only                # just the fake proxy + page server
+
+A fake proxy answers every chat completion with the recorded response. Streams
+are re-sent chunk by chunk at their recorded offsets. A page server serves every
+recorded page body with its recorded latency. URLs in the recording (user text,
+tool calls) are rewritten to point at the page server, so nothing leaves the machine.
+Then the recorded user turns are replayed against the app (same session ids, same
+endpoints), and per-turn latency and time to first token are reported.
+
+Requests are matched to recordings exactly (same messages and tools) where possible.
+An engine change that alters prompts falls back to the recording with the same last
+user message and tool round, then to any recording of the same kind. The match
+counts are printed, so a replay that drifted from the recording is easy to see.
+--speed scales every recorded delay (2 = twice as fast upstream).
+"""
+import argparse
+import asyncio
+import base64
+import glob
+import gzip
+import hashlib
+import itertools
+import json
+import os
+import re
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import aiohttp
+from aiohttp import web
+
+M365 = Path(__file__).resolve().parent.parent / "ms_365_agent_trial"
+
+
+# --- recording
+
+def load_events(paths: List[str]) -> List[Dict[str, Any]]:
+    events = []
+    for path in paths:
+        with gzip.open(path, "rt", encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    events.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break  # torn last line of a recording that was still being written
+    events.sort(key=lambda e: e.get("ts", 0))
+    return events
+
+
+def _without_none(obj: Any) -> Any:
+    if isinstance(obj, dict):
+        return {k: _without_none(v) for k, v in obj.items() if v is not None}
+    if isinstance(obj, list):
+        return [_without_none(v) for v in obj]
+    return obj
+
+
+def _content_text(content: Any) -> str:
+    if isinstance(content, list):  # content parts (cache_control breakpoints)
+        return "".join(p.get("text", "") for p in content if isinstance(p, dict))
+    return content or ""
+
+
+def exact_key(body: Dict[str, Any]) -> str:
+    payload = [_without_none(body.get("messages")), _without_none(body.get("tools")), bool(body.get("stream"))]
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+
+def loose_key(body: Dict[str, Any]) -> Tuple[bool, str, int]:
+    """(stream?, last user message, tool results after it): which call of which turn this is."""
+    messages = body.get("messages") or []
+    last_user = max((i for i, m in enumerate(messages) if m.get("role") == "user"), default=-1)
+    tool_results = sum(1 for m in messages[last_user + 1:] if m.get("role") == "tool")
+    text = _content_text(messages[last_user].get("content")) if last_user >= 0 else ""
+    return bool(body.get("stream")), text, tool_results
+
+
+class Tape:
+    """A recording with its URLs rewritten to the local page server, indexed for lookup."""
+
+    def __init__(self, events: List[Dict[str, Any]], page_base: str) -> None:
+        self.pages: Dict[str, Dict[str, Any]] = {}
+        local: Dict[str, str] = {}
+        for event in events:
+            if event["type"] == "page" and event["url"] not in local:
+                path = f"/r/{len(self.pages)}"
+                self.pages[path] = event
+                local[event["url"]] = page_base + path
+                local.setdefault(event.get("final_url") or event["url"], page_base + path)
+        for url, target in list(local.items()):
+            bare = re.sub(r"^https?://", "", url)  # users often type pages without a scheme
+            local.setdefault(bare, target)
+        self._rewrite_re = re.compile(
+            "|".join(re.escape(u) for u in sorted(local, key=len, reverse=True))) if local else None
+        self._local = local
+
+        self.turns = [self.rewrite(e) for e in events if e["type"] == "turn"]
+        chats = [self.rewrite(e) for e in events if e["type"] == "chat"]
+        self.model = chats[0].get("model", "") if chats else ""
+        self.exact: Dict[str, deque] = defaultdict(deque)
+        self.loose: Dict[Tuple[bool, str, int], deque] = defaultdict(deque)
+        self.any: Dict[bool, List[Dict[str, Any]]] = defaultdict(list)
+        for chat in chats:
+            request = chat.get("request") or {}
+            self.exact[exact_key(request)].append(chat)
+            self.loose[loose_key(request)].append(chat)
+            self.any[bool(chat.get("stream"))].append(chat)
+        self._cycle = {stream: itertools.cycle(items) for stream, items in self.any.items()}
+        self.matches = {"exact": 0, "loose": 0, "fallback": 0, "miss": 0}
+
+    def rewrite(self, obj: Any) -> Any:
+        if self._rewrite_re is None:
+            return obj
+        if isinstance(obj, str):
+            return self._rewrite_re.sub(lambda m: self._local[m.group(0)], obj)
+        if isinstance(obj, list):
+            return [self.rewrite(v) for v in obj]
+        if isinstance(obj, dict):
+            return {k: (v if k == "body" else self.rewrite(v)) for k, v in obj.items()}
+        return obj
+
+    def lookup(self, body: Dict[str, Any]):
+        """Recorded call to answer `body` with; a queue hit is rotated so repeats keep working."""
+        for kind, queue in (("exact", self.exact.get(exact_key(body))), ("loose", self.loose.get(loose_key(body)))):
+            if queue:
+                chat = queue[0]
+                queue.rotate(-1)
+                self.matches[kind] += 1
+                return chat
+        cycle = self._cycle.get(bool(body.get("stream")))
+        if cycle is None:
+            self.matches["miss"] += 1
+            return None
+        self.matches["fallback"] += 1
+        return next(cycle)
+
+
+# --- fake upstreams
+
+def make_proxy(tape: Tape, speed: float) -> web.Application:
+    async def completions(request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        chat = tape.lookup(body)
+        if chat is None:
+            return web.json_response({"error": {"message": "no recorded completion of this kind"}}, status=400)
+
+        if not body.get("stream"):
+            await asyncio.sleep(chat.get("duration_sec", 0) / speed)
+            return web.json_response(chat["response"])
+
+        resp = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await resp.prepare(request)
+        started = time.perf_counter()
+        for offset, chunk in chat.get("chunks", []):
+            delay = offset / speed - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if chunk.get("usage") and not (body.get("stream_options") or {}).get("include_usage"):
+                continue
+            await resp.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode())
+        await resp.write(b"data: [DONE]\n\n")
+        return resp
+
+    async def stats(_request: web.Request) -> web.Response:
+        return web.json_response(tape.matches)
+
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    for prefix in ("", "/v1"):
+        app.router.add_post(f"{prefix}/chat/completions", completions)
+    app.router.add_get("/replay/stats", stats)
+    return app
+
+
+def make_page_server(tape: Tape, speed: float) -> web.Application:
+    async def page(request: web.Request) -> web.Response:
+        event = tape.pages.get(request.path)
+        if event is None:
+            raise web.HTTPNotFound()
+        await asyncio.sleep(event.get("elapsed_sec", 0) / speed)
+        return web.Response(body=base64.b64decode(event.get("body") or ""), status=event.get("status", 200),
+                            headers={"Content-Type": event.get("content_type") or "text/html"})
+
+    app = web.Application()
+    app.router.add_get("/r/{n}", page)
+    return app
+
+
+async def start_site(app: web.Application, port: int) -> web.AppRunner:
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner
+
+
+# --- driving the app
+
+async def replay_turn(http: aiohttp.ClientSession, base: str, turn: Dict[str, Any]) -> Dict[str, Any]:
+    cookies = {"sid": turn.get("session", "")}
+    t0 = time.perf_counter()
+    ttft = None
+    ok = True
+    if turn.get("endpoint") == "/api/messages":
+        stream = "1" if turn.get("stream") else "0"
+        async with http.post(f"{base}/api/messages?stream={stream}", cookies=cookies,
+                             json={"type": "message", "text": turn["text"]}) as resp:
+            async for line in resp.content:
+                if ttft is None and b'"streamType": "streaming"' in line:
+                    ttft = time.perf_counter() - t0
+            ok = resp.status == 200
+    else:
+        async with http.post(f"{base}/chat", cookies=cookies, json={"text": turn["text"]}) as resp:
+            async for line in resp.content:
+                if ttft is None and line.startswith(b"event: token"):
+                    ttft = time.perf_counter() - t0
+                if line.startswith(b"event: error"):
+                    ok = False
+    return {"latency": time.perf_counter() - t0, "ttft": ttft, "ok": ok}
+
+
+async def drive(base: str, tape: Tape, pace: str, speed: float) -> Tuple[List[Dict[str, Any]], float]:
+    sessions: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for turn in tape.turns:
+        sessions[turn.get("session", "")].append(turn)
+    first_ts = min((t["ts"] for t in tape.turns), default=0)
+    results: List[Dict[str, Any]] = []
+    started = time.perf_counter()
+
+    async def run_session(turns: List[Dict[str, Any]]) -> None:
+        for turn in turns:
+            if pace == "recorded":  # never earlier than the user sent it (scaled), never before the last reply
+                delay = (turn["ts"] - first_ts) / speed - (time.perf_counter() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            try:
+                results.append(await replay_turn(http, base, turn))
+            except aiohttp.ClientError:
+                results.append({"latency": 0.0, "ttft": None, "ok": False})
+
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=600)) as http:
+        await asyncio.gather(*(run_session(turns) for turns in sessions.values()))
+    return results, time.perf_counter() - started
+
+
+def _pct(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[int(q * (len(values) - 1))] if values else 0.0
+
+
+def report(results: List[Dict[str, Any]], wall: float, matches: Dict[str, int]) -> None:
+    ok = [r for r in results if r["ok"]]
+    latencies = [r["latency"] for r in ok]
+    ttfts = [r["ttft"] for r in ok if r["ttft"] is not None]
+    print(f"turns {len(results)} ok {len(ok)} wall {wall:.2f}s  ({len(ok) / wall if wall else 0:.2f} turns/s)")
+    if latencies:
+        print(f"turn latency  p50 {statistics.median(latencies) * 1000:7.0f} ms   p95 {_pct(latencies, 0.95) * 1000:7.0f} ms")
+    if ttfts:
+        print(f"first token   p50 {statistics.median(ttfts) * 1000:7.0f} ms   p95 {_pct(ttfts, 0.95) * 1000:7.0f} ms")
+    print("completion matches: " + ", ".join(f"{k} {v}" for k, v in matches.items()))
+
+
+def start_app(args, tape: Tape, state_dir: str) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "USE_LITELLM": "1",
+        "LITELLM_PROXY_URL": f"http://127.0.0.1:{args.proxy_port}",
+        "LITELLM_PROXY_API_KEY": "sk-replay",
+        "LITELLM_MODEL_ID": tape.model or os.getenv("LITELLM_MODEL_ID", ""),
+        "RECORD_DIR": "",
+        "USAGE_LOG_PATH": "",
+        # every page comes from one local server: per-host pacing would measure the politeness limits instead
+        "FETCH_HOST_RPS": "0",
+        "FETCH_HOST_CONCURRENCY": "64",
+        "PORT": str(args.port),
+    }
+    if args.workers:
+        cmd = [sys.executable, "serve.py", "--workers", str(args.workers), "--port", str(args.port),
+               "--state-dir", state_dir]
+    else:
+        cmd = [sys.executable, "app.py"]
+    return subprocess.Popen(cmd, cwd=M365, env=env, stdout=subprocess.DEVNULL)
+
+
+async def wait_http(url: str, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as http:
+        while time.monotonic() < deadline:
+            try:
+                async with http.get(url) as resp:
+                    if resp.status < 500:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up")
+
+
+async def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("recordings", nargs="+", help="rec-*.jsonl.gz files (globs are expanded)")
+    ap.add_argument("--pace", choices=["asap", "recorded"], default="asap",
+                    help="asap: each session's turns back to back; recorded: keep the original arrival times")
+    ap.add_argument("--speed", type=float, default=1.0, help="divide every recorded delay by this")
+    ap.add_argument("--workers", type=int, default=0, help="run serve.py with this many workers (0 = app.py)")
+    ap.add_argument("--target", default="", help="replay against an app that is already running at this URL")
+    ap.add_argument("--serve-only", action="store_true", help="only run the fake proxy and page server")
+    ap.add_argument("--port", type=int, default=4030)
+    ap.add_argument("--proxy-port", type=int, default=4010)
+    ap.add_argument("--page-port", type=int, default=4011)
+    args = ap.parse_args()
+
+    paths = [p for pattern in args.recordings for p in sorted(glob.glob(pattern))]
+    if not paths:
+        print("no recordings found", file=sys.stderr)
+        return 2
+    tape = Tape(load_events(paths), f"http://127.0.0.1:{args.page_port}")
+    print(f"{len(paths)} file(s): {len(tape.turns)} turns, {sum(len(q) for q in tape.exact.values())} completions, "
+          f"{len(tape.pages)} pages; model {tape.model or '?'}", flush=True)
+
+    runners = [await start_site(make_proxy(tape, args.speed), args.proxy_port),
+               await start_site(make_page_server(tape, args.speed), args.page_port)]
+    app = None
+    try:
+        if args.serve_only:
+            print(f"proxy http://127.0.0.1:{args.proxy_port}  pages http://127.0.0.1:{args.page_port}  "
+                  f"(LITELLM_MODEL_ID={tape.model})", flush=True)
+            await asyncio.Event().wait()
+
+        with tempfile.TemporaryDirectory() as state_dir:
+            base = args.target.rstrip("/")
+            if not base:
+                app = start_app(args, tape, state_dir)
+                base = f"http://127.0.0.1:{args.port}"
+            await wait_http(f"{base}/healthz", 60)
+            results, wall = await drive(base, tape, args.pace, args.speed)
+            report(results, wall, tape.matches)
+            if app is not None:
+                app.send_signal(signal.SIGTERM)
+                app.wait(timeout=60)
+                app = None
+    finally:
+        if app is not None:
+            app.kill()
+        for runner in runners:
+            await runner.cleanup()
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(asyncio.run(main()))
+    except KeyboardInterrupt:
+        pass
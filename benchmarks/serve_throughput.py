@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Throughput of the M365 host vs. number of worker processes (ms_365_agent_trial/serve.py).
+
+Starts benchmarks/fakes.py (fake LiteLLM proxy + page server), then for each
+worker count starts serve.py and drives POST /chat with concurrent clients for a
+fixed time. Every message carries a unique page URL, so each turn downloads and
+parses a page (the CPU-bound part) before streaming the fake answer.
+
+    python benchmarks/serve_throughput.py                       # 1, 2, 4 ... up to os.cpu_count()
+    python benchmarks/serve_throughput.py --workers 1 2 4 --concurrency 64 --duration 15
+
+By default the model id is one the engine treats as tool-less, so the page is
+fetched locally on every turn; --tools goes through the probe -> tool call path.
+"""
+import argparse
+import asyncio
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+import aiohttp
+
+ROOT = Path(__file__).resolve().parent.parent
+M365 = ROOT / "ms_365_agent_trial"
+
+
+def default_worker_counts():
+    counts, n = [], 1
+    while n < (os.cpu_count() or 1):
+        counts.append(n)
+        n *= 2
+    return counts + [os.cpu_count() or 1]
+
+
+async def wait_http(url: str, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while True:
+            try:
+                async with session.get(url) as resp:
+                    if resp.status < 500:
+                        return
+            except aiohttp.ClientError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"{url} did not come up")
+            await asyncio.sleep(0.1)
+
+
+async def drive(base: str, page_base: str, args: argparse.Namespace):
+    """Closed loop: `concurrency` clients, each sending turns back to back until the deadline."""
+    latencies, errors = [], 0
+    deadline = time.monotonic() + args.duration
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+
+    async def client(session: aiohttp.ClientSession) -> None:
+        nonlocal errors
+        while time.monotonic() < deadline:
+            text = f"Summarize {page_base}/page/{uuid.uuid4().hex}?paragraphs={args.paragraphs}"
+            t0 = time.perf_counter()
+            try:
+                async with session.post(f"{base}/chat", json={"text": text}) as resp:
+                    body = await resp.read()
+                if b"event: done" not in body or b"event: error" in body:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - t0)
+            except aiohttp.ClientError:
+                errors += 1
+
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=120)) as session:
+        started = time.monotonic()
+        await asyncio.gather(*(client(session) for _ in range(args.concurrency)))
+        elapsed = time.monotonic() - started
+    return len(latencies) / elapsed, latencies, errors
+
+
+def start_serve(workers: int, port: int, proxy_port: int, state_dir: str, args) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "USE_LITELLM": "1",
+        "LITELLM_PROXY_URL": f"http://127.0.0.1:{proxy_port}",
+        "LITELLM_PROXY_API_KEY": "sk-bench",
+        "LITELLM_MODEL_ID": "fake-tools-model" if args.tools else "openai.gpt-oss-120b-1:0",
+        "USAGE_LOG_PATH": "",
+        "FETCH_CACHE_TTL_SEC": "300",
+        # every page comes from one local server: per-host pacing would measure the politeness limits instead
+        "FETCH_HOST_RPS": "0",
+        "FETCH_HOST_CONCURRENCY": "64",
+    }
+    return subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", str(workers), "--port", str(port), "--state-dir", state_dir],
+        cwd=M365, env=env, stdout=subprocess.DEVNULL,
+    )
+
+
+async def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--workers", type=int, nargs="*", default=default_worker_counts())
+    ap.add_argument("--concurrency", type=int, default=32)
+    ap.add_argument("--duration", type=float, default=10.0, help="seconds of load per worker count")
+    ap.add_argument("--paragraphs", type=int, default=300, help="synthetic page size (~0.5 KB per paragraph)")
+    ap.add_argument("--tools", action="store_true", help="use the probe -> tool-call path instead of local fetch")
+    ap.add_argument("--port", type=int, default=4020)
+    ap.add_argument("--proxy-port", type=int, default=4010)
+    ap.add_argument("--page-port", type=int, default=4011)
+    args = ap.parse_args()
+
+    fakes = subprocess.Popen(
+        [sys.executable, "fakes.py", "--proxy-port", str(args.proxy_port), "--page-port", str(args.page_port)],
+        cwd=Path(__file__).resolve().parent, stdout=subprocess.DEVNULL,
+    )
+    try:
+        await wait_http(f"http://127.0.0.1:{args.proxy_port}/v1/models", 15)
+        print(f"{'workers':>7} {'turns/s':>9} {'speedup':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}")
+        baseline = None
+        for workers in args.workers:
+            with tempfile.TemporaryDirectory() as state_dir:
+                serve = start_serve(workers, args.port, args.proxy_port, state_dir, args)
+                try:
+                    await wait_http(f"http://127.0.0.1:{args.port}/healthz", 60)
+                    await asyncio.sleep(0.5)  # let the remaining workers finish binding
+                    rate, latencies, errors = await drive(
+                        f"http://127.0.0.1:{args.port}", f"http://127.0.0.1:{args.page_port}", args)
+                finally:
+                    serve.send_signal(signal.SIGTERM)
+                    serve.wait(timeout=60)
+            baseline = baseline or rate
+            lat = sorted(latencies) or [0.0]
+            print(f"{workers:>7} {rate:9.1f} {rate / baseline if baseline else 0:7.2f}x "
+                  f"{statistics.median(lat) * 1000:8.0f} {lat[int(0.95 * (len(lat) - 1))] * 1000:8.0f} {errors:>7}",
+                  flush=True)
+    finally:
+        fakes.terminate()
+        fakes.wait(timeout=10)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
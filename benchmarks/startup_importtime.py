@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Import-time benchmark for every agent entry point (`python -X importtime`).
+
+For each entry point this imports the module in a fresh interpreter (from the
+directory it normally runs in), sums the cumulative time of all top-level
+imports, lists the heaviest ones, and fails (exit 1) when an entry point is
+slower than its threshold. Heavy stacks (SDKs, litellm, langchain, bs4, ...)
+are loaded on first use, so a regression usually means a new eager import.
+
+    python benchmarks/startup_importtime.py
+    python benchmarks/startup_importtime.py --runs 5 --threshold m365=500 --top 15
+
+Dummy proxy settings are injected so modules that read required env vars at
+import time can be imported without a .env file. No network calls are made.
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# name -> (working directory, module to import, threshold in ms)
+ENTRY_POINTS = {
+    "strands": ("aws_strands_trial", "agent", 150),
+    "langgraph": ("langgraph_agent_trial", "main", 150),
+    "adk": (".", "google_adk_trial", 150),
+    "m365": ("ms_365_agent_trial", "app", 600),  # aiohttp itself is needed to serve
+}
+
+DUMMY_ENV = {
+    "LITELLM_PROXY_URL": "http://127.0.0.1:9",
+    "LITELLM_PROXY_API_BASE": "http://127.0.0.1:9",
+    "LITELLM_PROXY_API_KEY": "sk-bench",
+    "OPENAI_API_KEY": "sk-bench",
+}
+
+# "import time: self [us] | cumulative | imported package"
+_LINE_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def measure(workdir: str, module: str):
+    """Return (total_ms, [(cumulative_ms, top_level_package), ...]) for one fresh import."""
+    env = {**os.environ, **{k: os.environ.get(k, v) for k, v in DUMMY_ENV.items()}}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT / workdir, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        last = (proc.stderr.strip().splitlines() or ["?"])[-1]
+        raise RuntimeError(f"import {module} failed: {last}")
+
+    top_level = []
+    for line in proc.stderr.splitlines():
+        m = _LINE_RE.match(line)
+        # Top-level imports have a single leading space in the package column
+        if m and len(m.group(3)) == 1:
+            top_level.append((int(m.group(2)) / 1000.0, m.group(4)))
+    return sum(ms for ms, _ in top_level), top_level
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--runs", type=int, default=3, help="fresh interpreters per entry point (median is used)")
+    ap.add_argument("--top", type=int, default=8, help="heaviest top-level imports to list")
+    ap.add_argument("--threshold", action="append", default=[], metavar="NAME=MS",
+                    help="override a regression threshold, e.g. m365=500")
+    ap.add_argument("--only", nargs="*", choices=sorted(ENTRY_POINTS), help="measure a subset")
+    args = ap.parse_args()
+
+    thresholds = {name: spec[2] for name, spec in ENTRY_POINTS.items()}
+    for item in args.threshold:
+        name, _, ms = item.partition("=")
+        thresholds[name] = float(ms)
+
+    failed = False
+    for name in args.only or ENTRY_POINTS:
+        workdir, module, _ = ENTRY_POINTS[name]
+        try:
+            samples = [measure(workdir, module) for _ in range(args.runs)]
+        except RuntimeError as e:
+            print(f"{name:<10} ERROR  {e}")
+            failed = True
+            continue
+
+        total = statistics.median(ms for ms, _ in samples)
+        verdict = "ok" if total <= thresholds[name] else "REGRESSION"
+        failed |= verdict != "ok"
+        print(f"{name:<10} {total:8.1f} ms  (threshold {thresholds[name]:.0f} ms)  {verdict}")
+        heaviest = sorted(samples[-1][1], reverse=True)[: args.top]
+        for ms, pkg in heaviest:
+            print(f"{'':<12}{ms:8.1f} ms  {pkg}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Map-reduce summarization of a long page (M365 core.summarize) against the fake
+LiteLLM proxy: wall time vs SUMMARY_CONCURRENCY, and the cached re-run.
+
+Every completion costs --ttft-ms, so the expected time is about
+ceil(chunks / concurrency) + reduce levels completions.
+
+    python benchmarks/summarize_long.py --paragraphs 2000 --concurrency 1 2 4 8
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+M365_DIR = HERE.parent / "ms_365_agent_trial"
+
+
+def long_text(paragraphs: int) -> str:
+    # distinct paragraphs, so no two chunks share a cache entry
+    return "\n".join(
+        f"Section {i}\nParagraph {i} reports figure {i * 7 % 101} for region {i % 13}. "
+        + "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor. " * 6
+        for i in range(paragraphs)
+    )
+
+
+def wait_http(url: str, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return
+        except Exception:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--paragraphs", type=int, default=2000, help="document size (~550 chars each)")
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    ap.add_argument("--ttft-ms", type=float, default=300, help="fake proxy latency per completion")
+    ap.add_argument("--proxy-port", type=int, default=4020)
+    args = ap.parse_args()
+
+    fakes = subprocess.Popen([sys.executable, "fakes.py", "--proxy-port", str(args.proxy_port),
+                              "--page-port", str(args.proxy_port + 1), "--ttft-ms", str(args.ttft_ms)], cwd=HERE)
+    try:
+        wait_http(f"http://127.0.0.1:{args.proxy_port}/v1/models")
+        os.environ.update(LITELLM_PROXY_URL=f"http://127.0.0.1:{args.proxy_port}/v1", LITELLM_PROXY_API_KEY="x",
+                          USAGE_LOG_PATH="", RECORD_DIR="")
+        os.chdir(M365_DIR)
+        sys.path.insert(0, str(M365_DIR))
+        from core import summarize
+
+        text = long_text(args.paragraphs)
+        chunks = summarize.document_chunks(text)
+        print(f"document: {len(text):,} chars -> {len(chunks)} chunks of ~{len(text) // len(chunks):,} "
+              f"(fake completion latency {args.ttft_ms:.0f} ms)")
+        print(f"{'concurrency':>11} {'seconds':>8} {'calls':>6} {'levels':>6} {'speedup':>8}")
+        base = None
+        for c in args.concurrency:
+            summarize.SUMMARY_CONCURRENCY = c
+            summarize._executor.cache_clear()
+            summarize.summary_cache.clear()
+            before = summarize.summary_stats.stats()
+            t0 = time.perf_counter()
+            summarize.summarize_document(text)
+            sec = time.perf_counter() - t0
+            after = summarize.summary_stats.stats()
+            base = base or sec
+            print(f"{c:>11} {sec:>8.2f} {after['calls'] - before['calls']:>6} "
+                  f"{after['reduce_levels'] - before['reduce_levels']:>6} {base / sec:>7.1f}x")
+        t0 = time.perf_counter()
+        summarize.summarize_document(text)
+        print(f"{'cached':>11} {time.perf_counter() - t0:>8.2f}")
+    finally:
+        fakes.terminate()
+        fakes.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
@@ -1 +1,6 @@
-from .agent import root_agent
+# `root_agent` resolves lazily (see agent.py) so importing the package stays cheap
+def __getattr__(name):
+    if name == "root_agent":
+        from .agent import root_agent
+        return root_agent
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
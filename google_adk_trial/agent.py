@@ -1,22 +1,22 @@
 # agent.py — Google ADK + LiteLLM + Web Fetch tool
 # CHANGE: added lightweight prints around the tool to show when it's used.
+# CHANGE: ADK/LiteLLM and requests/BeautifulSoup are imported lazily. `root_agent` is built on
+# first attribute access (module __getattr__), so importing this module for the tool alone is cheap.
+# CHANGE: the fetch tool now comes from the shared ../webfetch library (same code in every stack).
 import os
+import sys
+from pathlib import Path
 from dotenv import load_dotenv
 
-import litellm
-from google.adk.agents import LlmAgent
-from google.adk.models.lite_llm import LiteLlm
-
-# --- Web Fetch & Summarize tool deps ---
-import requests
-from bs4 import BeautifulSoup
+# Shared fetch-and-extract library lives at the repo root (`adk run` usually has it on sys.path already)
+_REPO_ROOT = str(Path(__file__).resolve().parent.parent)
+if _REPO_ROOT not in sys.path:
+    sys.path.insert(0, _REPO_ROOT)
+from webfetch.adapters import adk_tool
 
 # Ensure .env is loaded when running via `adk run` or the wrapper
 load_dotenv()
 
-# --- Force all requests through LiteLLM Proxy (OpenAI-compatible) ---
-litellm.use_litellm_proxy = True  # requires litellm >= 1.72.x
-
 # Also set OpenAI-compatible envs so any downstream client sees them
 os.environ.setdefault("OPENAI_API_BASE", os.getenv("LITELLM_PROXY_API_BASE", ""))
 os.environ.setdefault("OPENAI_API_KEY", os.getenv("LITELLM_PROXY_API_KEY", ""))
@@ -26,44 +26,34 @@ model_id = os.getenv("LITELLM_MODEL_ID", "azure/gpt-5-chat-eastus2")
 if not model_id.startswith("litellm_proxy/"):
     model_id = f"litellm_proxy/{model_id}"
 
-# Web Fetch & Clean tool
-def http_fetch_and_clean(url: str, timeout_sec: int = 10, max_chars: int = 6000) -> str:
-    """
-    Fetch a web page and return cleaned plain text (trimmed).
-    Use with prompts like: "fetch and summarize <url>".
-    """
-    # --- BEGIN: small, explicit tool-use logs ---
-    print(f"[tool] http_fetch_and_clean: start url={url}", flush=True)
-    try:
-        headers = {"User-Agent": "adk-agent/1.0 (+lite-llm-proxy)"}
-        r = requests.get(url, headers=headers, timeout=timeout_sec)
-        r.raise_for_status()
-
-        soup = BeautifulSoup(r.text, "html.parser")
-        # Remove scripts/styles/nav chrome
-        for tag in soup(["script", "style", "noscript", "header", "footer", "nav", "aside"]):
-            tag.extract()
-
-        text = " ".join(soup.get_text(separator=" ").split())
-        if len(text) > max_chars:
-            text = text[:max_chars] + " ...[truncated]"
-
-        print(f"[tool] http_fetch_and_clean: success chars={len(text)}", flush=True)
-        return text
-    except Exception as e:
-        print(f"[tool] http_fetch_and_clean: ERROR {type(e).__name__}: {e}", flush=True)
-        raise
-    # --- END: small, explicit tool-use logs ---
-
-
-root_agent = LlmAgent(
-    model=LiteLlm(
-        model=model_id,
-        api_base=os.getenv("LITELLM_PROXY_API_BASE", ""),
-        api_key=os.getenv("LITELLM_PROXY_API_KEY", ""),
-        custom_llm_provider="openai",
-    ),
-    name="Google_LiteLLM_Agent",
-    instruction="You are a helpful assistant. Keep answers concise unless asked otherwise.",
-    tools=[http_fetch_and_clean],  # unchanged list; tool now logs when used
-)
+# Web Fetch & Clean tool: shared webfetch adapter (logs start/success/error like before)
+http_fetch_and_clean = adk_tool("http_fetch_and_clean", default_timeout_sec=10, default_max_chars=6000)
+
+
+def build_root_agent():
+    import litellm
+    from google.adk.agents import LlmAgent
+    from google.adk.models.lite_llm import LiteLlm
+
+    # --- Force all requests through LiteLLM Proxy (OpenAI-compatible) ---
+    litellm.use_litellm_proxy = True  # requires litellm >= 1.72.x
+
+    return LlmAgent(
+        model=LiteLlm(
+            model=model_id,
+            api_base=os.getenv("LITELLM_PROXY_API_BASE", ""),
+            api_key=os.getenv("LITELLM_PROXY_API_KEY", ""),
+            custom_llm_provider="openai",
+        ),
+        name="Google_LiteLLM_Agent",
+        instruction="You are a helpful assistant. Keep answers concise unless asked otherwise.",
+        tools=[http_fetch_and_clean],  # unchanged list; tool now logs when used
+    )
+
+
+def __getattr__(name):
+    # `adk run` / `from agent import root_agent` land here on first access; cache the instance
+    if name == "root_agent":
+        agent = globals()["root_agent"] = build_root_agent()
+        return agent
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -6,16 +6,26 @@ time, while filtering only the noisy UserWarnings and collapsing any repeated
 
 Fixes:
 - Remove unsupported pty.spawn(env=...) usage; set env on os.environ instead.
-- Do chunk-level filtering (not line-buffered) so a prompt printed without a
-  trailing newline still appears immediately.
-- Collapse sequences like "[user]: [user]: [user]:" into a single "[user]: ".
+- Collapse sequences like "[user]: [user]: [user]:" into a single "[user]: ",
+  also when the repeats arrive in separate reads.
 - Hide only the specific UserWarning lines you asked to suppress.
+- Decode with an incremental UTF-8 decoder, so multi-byte characters split
+  across reads are no longer dropped.
+- Event-driven copy loop (selectors) instead of pty.spawn: larger adaptive
+  reads, one compiled regex pass per read instead of per-line/per-pattern
+  scans, and a fully filtered read no longer looks like EOF to the bridge.
 """
 
+import codecs
 import os
 import re
+import selectors
+import signal
 import sys
 import pty
+import tty
+import termios
+import fcntl
 
 # Hide only these warnings
 HIDE_PATTERNS = (
@@ -24,47 +34,159 @@ HIDE_PATTERNS = (
     'UserWarning: Field name "config_type" in "SequentialAgent" shadows an attribute in parent "BaseAgent"',
 )
 
+# One matcher for all patterns: drops every whole line (with its line ending) containing any of them
+HIDE_LINE_RE = re.compile(
+    r"^[^\n]*(?:" + "|".join(re.escape(p) for p in HIDE_PATTERNS) + r")[^\n]*(?:\n|$)",
+    re.MULTILINE,
+)
+
 # Collapse any burst of 2+ prompts into a single prompt token
 PROMPT_SEQ_RE = re.compile(r'(?:\s*\[user\]:\s*){2,}')
+PROMPT_HEAD_RE = re.compile(r'^\s*\[user\]:\s*')   # prompt at the start of new output
+PROMPT_TAIL_RE = re.compile(r'\[user\]:\s*$')      # output ends with a prompt
+
+# A partial line that may still turn into a hidden warning ("/path/x.py:12: UserWarning: ...")
+# is held back until its newline arrives (or the child goes idle); anything else, such as
+# a prompt or streamed tokens, is written immediately.
+MAYBE_WARNING_RE = re.compile(r'^\s*(?:/|[A-Za-z]:\\)|\.py:\d')
+
+IDLE_FLUSH_SEC = 0.05          # flush a held partial line after this much silence
+MAX_PENDING_CHARS = 64 * 1024  # never hold more than this
+MIN_READ = 4 * 1024
+MAX_READ = 64 * 1024
 
-def _filter_chunk(text: str) -> str:
+
+class OutputFilter:
     """
-    Filter a chunk of ADK output:
-      - drop lines matching HIDE_PATTERNS,
-      - collapse duplicate [user]: prompts,
-      - otherwise pass through unchanged.
-    Chunk-level so prompts without trailing newline still render.
+    Incremental filter for the child's output: bytes in, bytes out.
+      - drops whole lines matching HIDE_PATTERNS,
+      - collapses duplicate [user]: prompts (within and across reads),
+      - otherwise passes output through unchanged and without delay.
     """
-    # Remove only whole lines that contain the unwanted warnings
-    out_parts = []
-    for part in text.splitlines(keepends=True):
-        if any(pat in part for pat in HIDE_PATTERNS):
-            # drop this warning line
-            continue
-        out_parts.append(part)
-    out_text = "".join(out_parts)
-
-    # Collapse repeated [user]: prompts anywhere in the chunk
-    out_text = PROMPT_SEQ_RE.sub("[user]: ", out_text)
-
-    return out_text
-
-def master_read(fd: int) -> bytes:
-    """Read from child PTY, filter, and return bytes for stdout."""
+
+    def __init__(self) -> None:
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._pending = ""          # partial line held back (see MAYBE_WARNING_RE)
+        self._emitted_tail = ""     # last few chars written, to spot a prompt split across reads
+
+    @property
+    def has_pending(self) -> bool:
+        return bool(self._pending)
+
+    def feed(self, data: bytes) -> bytes:
+        text = self._pending + self._decoder.decode(data)
+        self._pending = ""
+
+        cut = text.rfind("\n") + 1
+        complete, tail = text[:cut], text[cut:]
+        if tail and MAYBE_WARNING_RE.search(tail) and len(tail) < MAX_PENDING_CHARS:
+            self._pending = tail
+            tail = ""
+        return self._emit(HIDE_LINE_RE.sub("", complete) + tail)
+
+    def flush_partial(self) -> bytes:
+        """Release a held partial line (called when the child has gone quiet)."""
+        text, self._pending = self._pending, ""
+        return self._emit(HIDE_LINE_RE.sub("", text))
+
+    def close(self) -> bytes:
+        text, self._pending = self._pending + self._decoder.decode(b"", final=True), ""
+        return self._emit(HIDE_LINE_RE.sub("", text))
+
+    def _emit(self, text: str) -> bytes:
+        if not text:
+            return b""
+        # Collapse repeated [user]: prompts anywhere in this output ...
+        text = PROMPT_SEQ_RE.sub("[user]: ", text)
+        # ... and against a prompt we already wrote in an earlier read
+        if PROMPT_TAIL_RE.search(self._emitted_tail):
+            text = PROMPT_HEAD_RE.sub("", text, count=1)
+            if not text:
+                return b""
+        self._emitted_tail = (self._emitted_tail + text)[-32:]
+        return text.encode("utf-8")
+
+
+class AdaptiveReadSize:
+    """Grow reads while the child is streaming heavily, shrink back when it is chatty."""
+
+    def __init__(self) -> None:
+        self.size = MIN_READ
+
+    def update(self, got: int) -> None:
+        if got >= self.size:
+            self.size = min(self.size * 2, MAX_READ)
+        elif got < self.size // 4:
+            self.size = max(self.size // 2, MIN_READ)
+
+
+def _write_all(fd: int, data: bytes) -> None:
+    while data:
+        n = os.write(fd, data)
+        data = data[n:]
+
+
+def _copy_winsize(src_fd: int, dst_fd: int) -> None:
     try:
-        data = os.read(fd, 4096)
+        size = fcntl.ioctl(src_fd, termios.TIOCGWINSZ, b"\0" * 8)
+        fcntl.ioctl(dst_fd, termios.TIOCSWINSZ, size)
     except OSError:
-        return b""
-    if not data:
-        return b""
+        pass
+
+
+def bridge(argv) -> int:
+    """Run `argv` under a PTY, filter its output, and return its exit code."""
+    stdin_fd, stdout_fd = sys.stdin.fileno(), sys.stdout.fileno()
+
+    pid, master_fd = pty.fork()
+    if pid == pty.CHILD:
+        os.execvp(argv[0], list(argv))
+
+    _copy_winsize(stdin_fd, master_fd)
+    signal.signal(signal.SIGWINCH, lambda *_: _copy_winsize(stdin_fd, master_fd))
 
     try:
-        text = data.decode("utf-8", errors="ignore")
-    except Exception:
-        text = data.decode(errors="ignore")
+        saved_tty = termios.tcgetattr(stdin_fd)
+        tty.setraw(stdin_fd)
+    except termios.error:  # stdin is not a terminal (piped input)
+        saved_tty = None
+
+    out_filter = OutputFilter()
+    read_size = AdaptiveReadSize()
+    sel = selectors.SelectSelector()  # select(): also works when stdin is a file or /dev/null
+    sel.register(master_fd, selectors.EVENT_READ)
+    sel.register(stdin_fd, selectors.EVENT_READ)
+
+    try:
+        while True:
+            events = sel.select(timeout=IDLE_FLUSH_SEC if out_filter.has_pending else None)
+            if not events:
+                _write_all(stdout_fd, out_filter.flush_partial())
+                continue
+
+            for key, _ in events:
+                if key.fd == master_fd:
+                    try:
+                        data = os.read(master_fd, read_size.size)
+                    except OSError:  # EIO once the child side closes (Linux)
+                        data = b""
+                    if not data:
+                        _write_all(stdout_fd, out_filter.close())
+                        return os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1])
+                    read_size.update(len(data))
+                    _write_all(stdout_fd, out_filter.feed(data))
+                else:
+                    data = os.read(stdin_fd, 1024)
+                    if data:
+                        _write_all(master_fd, data)
+                    else:  # EOF on our stdin: stop forwarding, keep draining the child
+                        sel.unregister(stdin_fd)
+    finally:
+        sel.close()
+        if saved_tty is not None:
+            termios.tcsetattr(stdin_fd, termios.TCSAFLUSH, saved_tty)
+        os.close(master_fd)
 
-    filtered = _filter_chunk(text)
-    return filtered.encode("utf-8")
 
 def main():
     # Ensure child Python ignores warnings too (belt & suspenders)
@@ -72,7 +194,7 @@ def main():
 
     # Spawn ADK CLI under this interpreter in a PTY (correct interactive behavior)
     argv = (sys.executable, "-W", "ignore", "-m", "google.adk.cli", "run", ".")
-    pty.spawn(argv, master_read=master_read)
+    sys.exit(bridge(argv))
 
 if __name__ == "__main__":
     main()
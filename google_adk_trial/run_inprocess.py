@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Run root_agent in-process through ADK's Runner (no CLI child, no PTY).
+
+run_adk.py starts a second interpreter (`python -m google.adk.cli run .`) under a
+PTY just to filter a few warnings, paying interpreter startup + the ADK import a
+second time. This launcher imports `root_agent` from agent.py directly, drives it
+with `Runner` + `InMemorySessionService`, streams tokens as they arrive (SSE mode)
+and silences the same noisy UserWarnings with the `warnings` module.
+
+Measure the startup difference with:  python ../benchmarks/adk_startup.py
+"""
+
+import asyncio
+import os
+import sys
+import time
+import uuid
+import warnings
+
+_T0 = time.perf_counter()
+
+# Hide only the warnings run_adk.py filters (matched against the warning message)
+for _msg in (
+    r"\[EXPERIMENTAL\] InMemoryCredentialService",
+    r"\[EXPERIMENTAL\] BaseCredentialService",
+    r'Field name "config_type" in "SequentialAgent" shadows an attribute in parent "BaseAgent"',
+):
+    warnings.filterwarnings("ignore", message=_msg, category=UserWarning)
+
+from google.adk.agents.run_config import RunConfig, StreamingMode
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from agent import root_agent
+from webfetch.keepalive import AsyncPoolWarmer, ping_url, pool_limits  # agent.py put the repo root on sys.path
+
+APP_NAME = "google_adk_trial"
+USER_ID = "cli_user"
+PROMPT = "[user]: "
+
+
+async def _new_session(session_service: InMemorySessionService) -> str:
+    session = await session_service.create_session(
+        app_name=APP_NAME, user_id=USER_ID, session_id=uuid.uuid4().hex[:12]
+    )
+    return session.id
+
+
+async def run_turn(runner: Runner, session_id: str, text: str) -> str:
+    """Send one user message and stream the reply to stdout. Returns the final text."""
+    message = types.Content(role="user", parts=[types.Part(text=text)])
+    run_config = RunConfig(streaming_mode=StreamingMode.SSE)
+
+    final_text = ""
+    streamed = False  # partial text already printed for the current model response
+    opened = False
+    async for event in runner.run_async(
+        user_id=USER_ID, session_id=session_id, new_message=message, run_config=run_config
+    ):
+        # The tool logs its own start / success lines (adk_tool(log=True) in agent.py)
+        if event.get_function_calls() and opened:
+            print(flush=True)  # end the streamed line first
+        if event.get_function_responses():
+            streamed = False
+
+        parts = event.content.parts if event.content and event.content.parts else []
+        text = "".join(p.text for p in parts if getattr(p, "text", None))
+        if not text:
+            continue
+        if not opened:
+            print(f"[{event.author}]: ", end="", flush=True)
+            opened = True
+        if event.partial:
+            print(text, end="", flush=True)
+            streamed = True
+        else:
+            # Final aggregated event: only print it if nothing was streamed for it
+            if not streamed:
+                print(text, end="", flush=True)
+            final_text = text
+            streamed = False
+    print()
+    return final_text
+
+
+def _warm_proxy_connections() -> AsyncPoolWarmer:
+    """
+    LiteLLM's async calls use litellm.aclient_session when set: give it a pool that keeps
+    idle connections, and open a few to the proxy now. Runs inside main()'s loop, which
+    every turn shares (async connections can't move between loops).
+    """
+    import httpx
+    import litellm
+
+    litellm.aclient_session = httpx.AsyncClient(limits=pool_limits())
+    return AsyncPoolWarmer(lambda: litellm.aclient_session, ping_url(os.getenv("LITELLM_PROXY_API_BASE", "")),
+                           headers={"Authorization": f"Bearer {os.getenv('LITELLM_PROXY_API_KEY', '')}"}).start()
+
+
+async def main() -> None:
+    _warm_proxy_connections()  # asyncio.run() cancels the ping task on exit
+    session_service = InMemorySessionService()
+    runner = Runner(agent=root_agent, app_name=APP_NAME, session_service=session_service)
+    session_id = await _new_session(session_service)
+
+    print(f"Running agent {root_agent.name} in-process (ready in {time.perf_counter() - _T0:.2f}s), "
+          "type exit to exit. Commands: /reset")
+    while True:
+        try:
+            user = (await asyncio.to_thread(input, PROMPT)).strip()
+        except (EOFError, KeyboardInterrupt):
+            print()
+            break
+        if not user:
+            continue
+        if user in {"exit", "/exit", "/quit"}:
+            break
+        if user in {"/reset", "/r"}:
+            session_id = await _new_session(session_service)
+            print("↺ session reset.")
+            continue
+        await run_turn(runner, session_id, user)
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        sys.exit(130)
@@ -1,44 +1,53 @@
 import os
+import sys
 import uuid
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from dotenv import load_dotenv
 
 load_dotenv()
 
-from langchain_litellm import ChatLiteLLM
-from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
-from langgraph.prebuilt import create_react_agent
-from langgraph.checkpoint.memory import InMemorySaver
-from langchain_core.messages import HumanMessage
+# Shared fetch-and-extract library (../webfetch): pooled HTTP, TTL cache, multi-URL fetch
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from webfetch.adapters import langchain_tool
+from webfetch.keepalive import PoolWarmer, ping_url, pool_limits
+
+# LangChain / LangGraph / LiteLLM (and requests/BeautifulSoup inside webfetch) load on first use:
+# the prompt shows immediately and the agent is built in the background while you type
+# (FAST_STARTUP=0 builds it before the prompt instead).
+FAST_STARTUP = os.getenv("FAST_STARTUP", "1") == "1"
 
-# --- NEW: tool decorator + deps for Web Fetch & Summarize ---
-from langchain_core.tools import tool
-import requests
-from bs4 import BeautifulSoup
 
 # --- NEW: callback to log tool usage ---
-from langchain.callbacks.base import BaseCallbackHandler
-
-class ToolLogHandler(BaseCallbackHandler):
-    """Log when tools start/end/error so you can see tool usage in the console."""
-
-    def on_tool_start(self, serialized=None, input_str=None, **kwargs):
-        # serialized is usually a dict like {"name": "<tool_name>", ...}
-        name = None
-        if isinstance(serialized, dict):
-            name = serialized.get("name") or serialized.get("id")
-        elif isinstance(serialized, str):
-            name = serialized
-        # print on a new line so it doesn't glue to streaming tokens
-        print(f"\n[tool] start: {name} input={input_str}", flush=True)
-
-    def on_tool_end(self, output, **kwargs):
-        out_preview = str(output)
-        if len(out_preview) > 140:
-            out_preview = out_preview[:140] + "…"
-        print(f"\n[tool] end: output_len={len(str(output))} preview={out_preview!r}", flush=True)
-
-    def on_tool_error(self, error, **kwargs):
-        print(f"\n[tool] error: {type(error).__name__}: {error}", flush=True)
+@functools.lru_cache(maxsize=None)
+def _tool_log_handler_cls():
+    """Defined lazily because the base class lives in LangChain."""
+    from langchain.callbacks.base import BaseCallbackHandler
+
+    class ToolLogHandler(BaseCallbackHandler):
+        """Log when tools start/end/error so you can see tool usage in the console."""
+
+        def on_tool_start(self, serialized=None, input_str=None, **kwargs):
+            # serialized is usually a dict like {"name": "<tool_name>", ...}
+            name = None
+            if isinstance(serialized, dict):
+                name = serialized.get("name") or serialized.get("id")
+            elif isinstance(serialized, str):
+                name = serialized
+            # print on a new line so it doesn't glue to streaming tokens
+            print(f"\n[tool] start: {name} input={input_str}", flush=True)
+
+        def on_tool_end(self, output, **kwargs):
+            out_preview = str(output)
+            if len(out_preview) > 140:
+                out_preview = out_preview[:140] + "…"
+            print(f"\n[tool] end: output_len={len(str(output))} preview={out_preview!r}", flush=True)
+
+        def on_tool_error(self, error, **kwargs):
+            print(f"\n[tool] error: {type(error).__name__}: {error}", flush=True)
+
+    return ToolLogHandler
 
 # --- LiteLLM Proxy envs ---
 api_base = os.getenv("LITELLM_PROXY_API_BASE", "")
@@ -49,67 +58,87 @@ model_id = os.getenv("LITELLM_MODEL_ID", "azure/gpt-5-chat-eastus2")
 if not model_id.startswith("litellm_proxy/"):
     model_id = f"litellm_proxy/{model_id}"
 
-# --- LLM with streaming enabled ---
-llm = ChatLiteLLM(
-    model=model_id,
-    api_base=api_base,
-    api_key=api_key,
-    streaming=True,  # stream tokens to stdout via callback
-)
-
-# --- Web Fetch & Summarize tool (same behavior as before) ---
-@tool("fetch_and_summarize")
-def fetch_and_summarize(url: str, timeout_sec: int = 10, max_chars: int = 6000) -> str:
-    """Fetch a web page, strip HTML (scripts/styles/nav), and return cleaned text (trimmed)."""
-    headers = {"User-Agent": "langgraph-agent/1.0 (+lite-llm-proxy)"}
-    r = requests.get(url, headers=headers, timeout=timeout_sec)
-    r.raise_for_status()
-
-    soup = BeautifulSoup(r.text, "html.parser")
-    for tag in soup(["script", "style", "noscript", "header", "footer", "nav", "aside"]):
-        tag.extract()
-
-    text = " ".join(soup.get_text(separator=" ").split())
-    if len(text) > max_chars:
-        text = text[:max_chars] + " ...[truncated]"
-    return text
-
-# --- LangGraph agent with in-memory checkpointer ---
-checkpoint = InMemorySaver()
-agent = create_react_agent(
-    llm,
-    tools=[fetch_and_summarize],  # register the tool
-    prompt="You are a helpful, concise assistant.",
-    checkpointer=checkpoint,
-)
-
-# One session/thread id for this CLI run (required by checkpointer)
-session_id = os.getenv("SESSION_ID", str(uuid.uuid4())[:8])
-
-print("LangGraph chatbot is running. Type your questions (or 'exit' to quit).")
-print(f"[session thread_id: {session_id}]")
-
-while True:
-    try:
-        user_input = input("User: ")
-    except (EOFError, KeyboardInterrupt):
-        print()  # clean newline on Ctrl-D/C
-        break
-
-    if user_input.strip().lower() in {"exit", "quit"}:
-        break
-
-    # Build message list
-    messages = [HumanMessage(content=user_input)]
-
-    # Streaming tokens to stdout via callback; do NOT reprint final text
-    cfg = {
-        "configurable": {"thread_id": session_id},
-        # --- NEW: add ToolLogHandler alongside the token stream handler ---
-        "callbacks": [StreamingStdOutCallbackHandler(), ToolLogHandler()],
-    }
-
-    # Label once, then stream; no second print of the same answer
-    print("Assistant: ", end="", flush=True)
-    agent.invoke({"messages": messages}, config=cfg)
-    print()  # newline after streaming
+def _warm_proxy_connections() -> PoolWarmer:
+    """
+    Give LiteLLM one long-lived sync httpx client (litellm.client_session; the agent's
+    invoke() goes through litellm.completion) and keep a few connections to the proxy
+    open on it, so the first answer doesn't pay DNS/TCP/TLS.
+    """
+    import httpx
+    import litellm
+
+    if litellm.client_session is None:
+        litellm.client_session = httpx.Client(limits=pool_limits())
+    return PoolWarmer(lambda: litellm.client_session, ping_url(api_base),
+                      headers={"Authorization": f"Bearer {api_key}"}).start()
+
+
+def build_agent():
+    """LLM + tools + LangGraph agent with in-memory checkpointer."""
+    from langchain_litellm import ChatLiteLLM
+    from langgraph.prebuilt import create_react_agent
+    from langgraph.checkpoint.memory import InMemorySaver
+
+    _warm_proxy_connections()
+
+    # --- LLM with streaming enabled ---
+    llm = ChatLiteLLM(
+        model=model_id,
+        api_base=api_base,
+        api_key=api_key,
+        streaming=True,  # stream tokens to stdout via callback
+    )
+
+    checkpoint = InMemorySaver()
+    return create_react_agent(
+        llm,
+        tools=[langchain_tool(default_timeout_sec=10, default_max_chars=6000)],  # register the tool
+        prompt="You are a helpful, concise assistant.",
+        checkpointer=checkpoint,
+    )
+
+
+def main() -> None:
+    builder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="agent-build")
+    pending_agent = builder.submit(build_agent)
+    if not FAST_STARTUP:
+        pending_agent.result()
+
+    # One session/thread id for this CLI run (required by checkpointer)
+    session_id = os.getenv("SESSION_ID", str(uuid.uuid4())[:8])
+
+    print("LangGraph chatbot is running. Type your questions (or 'exit' to quit).")
+    print(f"[session thread_id: {session_id}]")
+
+    while True:
+        try:
+            user_input = input("User: ")
+        except (EOFError, KeyboardInterrupt):
+            print()  # clean newline on Ctrl-D/C
+            break
+
+        if user_input.strip().lower() in {"exit", "quit"}:
+            break
+
+        agent = pending_agent.result()  # waits only if the background build is still running
+        from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
+        from langchain_core.messages import HumanMessage
+
+        # Build message list
+        messages = [HumanMessage(content=user_input)]
+
+        # Streaming tokens to stdout via callback; do NOT reprint final text
+        cfg = {
+            "configurable": {"thread_id": session_id},
+            # --- NEW: add ToolLogHandler alongside the token stream handler ---
+            "callbacks": [StreamingStdOutCallbackHandler(), _tool_log_handler_cls()()],
+        }
+
+        # Label once, then stream; no second print of the same answer
+        print("Assistant: ", end="", flush=True)
+        agent.invoke({"messages": messages}, config=cfg)
+        print()  # newline after streaming
+
+
+if __name__ == "__main__":
+    main()
@@ -1,64 +1,36 @@
 # app.py
 import os
 import json
+import asyncio
+import socket
+import time
 import uuid
 import traceback
-import re
-from typing import List, Dict, Any
+from concurrent.futures import Future
+from typing import Awaitable, List, Dict, Any, Tuple
 
 from dotenv import load_dotenv
 from aiohttp import web
 
-from microsoft.agents.core.models.activity import Activity
-
-# Import ACTIVE_MODEL if available (from your toggle-enabled client);
-# fall back gracefully if not exported.
-try:
-    from core.lite_llm_model import chat, ACTIVE_MODEL  # type: ignore
-except Exception:  # pragma: no cover
-    from core.lite_llm_model import chat  # type: ignore
-    ACTIVE_MODEL = os.getenv("LITELLM_MODEL_ID") or os.getenv("OPENAI_MODEL_ID") or "unknown"
-
-from tools.fetch_and_summarize import TOOL_SPEC, run as run_fetch
+from core.engine import (
+    SESSIONS,
+    append_turn,
+    build_messages,
+    handle_engine_turn_oneshot,
+    handle_engine_turn_streaming,
+    prefetch_urls,
+    reset_session,
+)
+from core.diagnostics import DIAGNOSTICS, PROFILE_HZ, loop_lag, profiler
+from core.lite_llm_model import chat_flight, connection_warmer
+from core.prompt import prompt_cache_stats
+from core.recorder import recorder
+from core.summarize import summary_stats
+from core.usage import usage_tracker
+from webfetch import document_flight, host_profiles, host_scheduler, page_cache, parse_executor  # importable once core.engine set up sys.path
 
 load_dotenv()
 
-SYSTEM_PROMPT = os.getenv(
-    "SYSTEM_PROMPT",
-    "You are a helpful, concise assistant. Use tools when they help."
-)
-
-TOOLS: List[Dict[str, Any]] = [TOOL_SPEC]
-
-# ---- enforce a healthy first fetch so models don't ask for a second round
-FETCH_MIN_CHARS = int(os.getenv("FETCH_MIN_CHARS", "8000"))  # can override in .env
-
-# --- Models known (or conservatively assumed) to NOT support OpenAI-style function calling
-# Add/adjust as needed for your environment.
-NO_TOOL_MODELS = {
-    "openai.gpt-oss-120b-1:0",
-    "openai.gpt-oss-20b-1:0",
-    "DeepSeek-R1",
-    "us.deepseek.r1-v1:0",
-    "us.meta.llama4-maverick-17b-instruct-v1:0",
-    "us.meta.llama4-scout-17b-instruct-v1:0",
-}
-
-# Simple heuristic: treat ids containing these tokens as non-tool-capable too
-_NO_TOOL_SUBSTRINGS = ("gpt-oss", "r1", "llama4-maverick", "llama4-scout")
-
-def _tools_supported(model_id: str) -> bool:
-    mid = (model_id or "").strip()
-    if mid in NO_TOOL_MODELS:
-        return False
-    lower = mid.lower()
-    return not any(tok in lower for tok in _NO_TOOL_SUBSTRINGS)
-
-# --- URL detector (for auto local fetch when tools aren't supported)
-URL_RE = re.compile(r'https?://\S+')
-
-# --- Simple in-memory sessions for multi-turn ---
-SESSIONS: Dict[str, List[Dict[str, Any]]] = {}  # sid -> list[{"role": ..., "content": ...}]
 COOKIE_NAME = "sid"
 
 
@@ -66,74 +38,10 @@ def _ensure_sid(request: web.Request) -> str:
     sid = request.cookies.get(COOKIE_NAME)
     if not sid:
         sid = uuid.uuid4().hex[:12]
-    if sid not in SESSIONS:
-        SESSIONS[sid] = []
+    SESSIONS.ensure(sid)
     return sid
 
 
-def _append_history(sid: str, role: str, content: str) -> None:
-    SESSIONS[sid].append({"role": role, "content": content})
-
-
-def _build_messages(sid: str, new_user_text: str) -> List[Dict[str, Any]]:
-    msgs: List[Dict[str, Any]] = [{"role": "system", "content": SYSTEM_PROMPT}]
-    msgs.extend(SESSIONS[sid])  # prior turns
-    msgs.append({"role": "user", "content": new_user_text})
-    return msgs
-
-
-def _tool_call_messages(msg) -> List[Dict[str, Any]]:
-    """Convert tool_calls into assistant stub + tool outputs (ONE ROUND ONLY)."""
-    addl: List[Dict[str, Any]] = []
-    addl.append({
-        "role": "assistant",
-        "content": msg.content or "",
-        "tool_calls": [
-            {
-                "id": tc.id,
-                "type": tc.type,
-                "function": {
-                    "name": tc.function.name,
-                    "arguments": tc.function.arguments,
-                }
-            } for tc in (msg.tool_calls or [])
-        ],
-    })
-
-    for tc in (msg.tool_calls or []):
-        try:
-            args = json.loads(tc.function.arguments or "{}")
-        except json.JSONDecodeError:
-            args = {}
-
-        if tc.function.name == "fetch_and_summarize":
-            # enforce a generous first fetch to avoid second-round retries
-            timeout = int(args.get("timeout_sec", 12))
-            max_chars = int(args.get("max_chars", 6000))
-            if max_chars < FETCH_MIN_CHARS:
-                max_chars = FETCH_MIN_CHARS
-
-            out = run_fetch(
-                url=args.get("url", ""),
-                timeout_sec=timeout,
-                max_chars=max_chars,
-            )
-            addl.append({
-                "role": "tool",
-                "tool_call_id": tc.id,
-                "name": "fetch_and_summarize",
-                "content": out,
-            })
-        else:
-            addl.append({
-                "role": "tool",
-                "tool_call_id": tc.id,
-                "name": tc.function.name,
-                "content": "ERROR: unknown tool",
-            })
-    return addl
-
-
 # -------------------------
 # SSE helpers (emit BYTES)
 # -------------------------
@@ -146,98 +54,163 @@ async def _stream_reply(resp: web.StreamResponse, text: str | None = None) -> No
     await resp.write(_sse_event("done", {"text": text or ""}))
 
 
-# -------------------------
-# ONE-ROUND tools, then stream the final answer
-# -------------------------
-async def handle_engine_turn_streaming(resp: web.StreamResponse, messages: List[Dict[str, Any]]) -> str:
+# ---- /api/messages streaming: typing indicator first, then partial updates as tokens arrive
+ACTIVITY_STREAMING = os.getenv("ACTIVITY_STREAMING", "0") == "1"  # default when the request doesn't choose
+STREAM_UPDATE_INTERVAL_SEC = float(os.getenv("STREAM_UPDATE_MS", "500")) / 1000.0  # min gap between updates
+
+
+class SseStreamer:
+    """Writes engine events as SSE frames and keeps the streamed text (for partial history)."""
+
+    def __init__(self, resp: web.StreamResponse) -> None:
+        self.resp = resp
+        self.parts: List[str] = []
+
+    @property
+    def text(self) -> str:
+        return "".join(self.parts)
+
+    async def emit(self, event: str, data: Dict[str, Any]) -> None:
+        if event == "token":
+            self.parts.append(data.get("delta", ""))
+        await self.resp.write(_sse_event(event, data))
+
+
+# ---- client disconnects: stop the turn (upstream stream, pending fetches) instead of finishing for nobody
+DISCONNECT_POLL_SEC = float(os.getenv("DISCONNECT_POLL_MS", "200")) / 1000.0
+TURN_STATS: Dict[str, int] = {"disconnects": 0, "prefetches_cancelled": 0}
+
+
+def _client_gone(request: web.Request) -> bool:
+    transport = request.transport
+    return transport is None or transport.is_closing()
+
+
+async def _run_turn(request: web.Request, turn: Awaitable[str], prefetches: List[Future]) -> Tuple[str, bool]:
     """
-    Probe once (non-stream).
-    If tool_calls exist -> execute them ONCE, emit tool events.
-    Then do a single streaming call for the answer.
+    Run one engine turn, watching the client connection. On disconnect the turn is
+    cancelled: the upstream stream is closed (engine `finally`), the probe is
+    abandoned (nobody waits for it unless another turn shares it; its thread still
+    finishes the call) and prefetches that haven't started are dropped.
+    Returns (reply, disconnected); reply is "" if cancelled.
+    Cancellation of the handler itself (shutdown) cancels the turn and propagates.
     """
-    # Decide tool capability for the active model, and whether we need to locally fetch a URL.
-    user_text = messages[-1]["content"]
-    needs_fetch = URL_RE.search(user_text) is not None
-    supports_tools = _tools_supported(ACTIVE_MODEL)
-
-    # If tools aren't supported but a URL is present, fetch locally and inject the text.
-    tool_choice = "auto" if supports_tools else "none"
-    if needs_fetch and not supports_tools:
-        url = URL_RE.search(user_text).group(0)
-        # Emit tool events to keep UI consistent
-        await resp.write(_sse_event("tool", {
-            "phase": "start",
-            "name": "fetch_and_summarize",
-            "args": {"url": url, "max_chars": max(FETCH_MIN_CHARS, 10_000)}
-        }))
-        fetched = run_fetch(url=url, timeout_sec=12, max_chars=max(FETCH_MIN_CHARS, 10_000))
-        await resp.write(_sse_event("tool", {
-            "phase": "end",
-            "name": "fetch_and_summarize",
-            "chars": len(fetched),
-            "preview": (fetched[:200] + ("…" if len(fetched) > 200 else ""))
-        }))
-        messages.append({
-            "role": "user",
-            "content": f"Here is the page text from {url}:\n\n{fetched}\n\nPlease provide 3 concise key points."
-        })
-        tool_choice = "none"  # final LLM call should not include tool params
-
-    # Probe for tools once (only if we intend to use tools)
-    probe = chat(
-        messages,
-        tools=(TOOLS if tool_choice != "none" else None),
-        tool_choice=tool_choice,
-        stream=False
-    )
-    msg = probe.choices[0].message
-
-    if getattr(msg, "tool_calls", None):
-        # Append assistant stub + tool results (one round only)
-        messages.extend(_tool_call_messages(msg))
-
-        # Emit tool events so they appear BEFORE the final answer
-        for tc in msg.tool_calls:
+    task = asyncio.ensure_future(turn)
+    gone = False
+    try:
+        while not task.done():
+            await asyncio.wait({task}, timeout=DISCONNECT_POLL_SEC)
+            if not task.done() and _client_gone(request):
+                gone = True
+                task.cancel()
+        return await task, False
+    except ConnectionResetError:
+        pass  # a write hit the closed socket before the watcher noticed
+    except asyncio.CancelledError:
+        if not gone:
+            task.cancel()
+            for fut in prefetches:
+                fut.cancel()
+            raise
+    if not task.done():
+        task.cancel()
+    TURN_STATS["disconnects"] += 1
+    TURN_STATS["prefetches_cancelled"] += sum(f.cancel() for f in prefetches)
+    return "", True
+
+
+def _wants_streaming(request: web.Request) -> bool:
+    """?stream=1|0 wins, then `Accept: application/x-ndjson`, then ACTIVITY_STREAMING."""
+    flag = request.query.get("stream")
+    if flag is not None:
+        return flag.lower() in {"1", "true", "yes"}
+    if "application/x-ndjson" in request.headers.get("Accept", ""):
+        return True
+    return ACTIVITY_STREAMING
+
+
+class ActivityStreamer:
+    """
+    Turns engine events into Teams-style streaming activities, one JSON object per line:
+    typing (informative) -> typing (streaming, cumulative text, throttled) -> message (final).
+    """
+
+    def __init__(self, resp: web.StreamResponse) -> None:
+        self.resp = resp
+        self.stream_id = uuid.uuid4().hex
+        self.sequence = 0
+        self.parts: List[str] = []
+        self.sent_chars = 0
+        self.last_update = 0.0
+
+    @property
+    def text(self) -> str:
+        return "".join(self.parts)
+
+    async def send(self, activity_type: str, text: str = "", stream_type: str = "") -> None:
+        activity: Dict[str, Any] = {"type": activity_type}
+        if text:
+            activity["text"] = text
+        if stream_type:
+            channel_data: Dict[str, Any] = {"streamId": self.stream_id, "streamType": stream_type}
+            if stream_type != "final":
+                self.sequence += 1
+                channel_data["streamSequence"] = self.sequence
+            activity["channelData"] = channel_data
+        await self.resp.write((json.dumps(activity, ensure_ascii=False) + "\n").encode("utf-8"))
+
+    async def emit(self, event: str, data: Dict[str, Any]) -> None:
+        if event == "token":
+            self.parts.append(data.get("delta", ""))
+            if time.monotonic() - self.last_update >= STREAM_UPDATE_INTERVAL_SEC:
+                await self.flush()
+        elif event == "tool" and data.get("phase") == "start":
+            await self.send("typing", f"Running {data.get('name', 'tool')}…", "informative")
+
+    async def flush(self) -> None:
+        text = self.text
+        if len(text) > self.sent_chars:
+            await self.send("typing", text, "streaming")
+            self.sent_chars = len(text)
+            self.last_update = time.monotonic()
+
+    async def finish(self, text: str) -> None:
+        await self.send("message", text, "final")
+
+
+async def _reply_streaming(request: web.Request, sid: str, text: str) -> web.StreamResponse:
+    resp = web.StreamResponse(status=200, headers={
+        "Content-Type": "application/x-ndjson; charset=utf-8",
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+    await resp.prepare(request)
+    streamer = ActivityStreamer(resp)
+    await streamer.send("typing")  # right away, before any model work
+
+    prefetches = prefetch_urls(text)
+    try:
+        reply, disconnected = await _run_turn(
+            request, handle_engine_turn_streaming(streamer.emit, build_messages(sid, text), sid), prefetches)
+        if disconnected:
+            append_turn(sid, text, streamer.text)
+            return resp
+    except Exception:
+        traceback.print_exc()
+        if streamer.parts:
+            reply = streamer.text  # keep what the user already saw
+        else:
+            # nothing streamed yet: fall back to the one-shot engine
             try:
-                args = json.loads(tc.function.arguments or "{}")
-            except json.JSONDecodeError:
-                args = {}
-            # reflect enforced min chars in the visible args (so it's clear we fetched enough)
-            shown_args = dict(args)
-            if shown_args.get("max_chars", 0) and shown_args["max_chars"] < FETCH_MIN_CHARS:
-                shown_args["max_chars"] = FETCH_MIN_CHARS
-
-            await resp.write(_sse_event("tool", {
-                "phase": "start",
-                "name": tc.function.name,
-                "args": shown_args
-            }))
-            out_msg = next((m for m in messages if m.get("role") == "tool" and m.get("tool_call_id") == tc.id), None)
-            if out_msg:
-                preview = out_msg["content"][:200] + ("…" if len(out_msg["content"]) > 200 else "")
-                await resp.write(_sse_event("tool", {
-                    "phase": "end",
-                    "name": tc.function.name,
-                    "chars": len(out_msg["content"]),
-                    "preview": preview
-                }))
-
-    # Final streaming answer (single call)
-    stream = chat(
-        messages,
-        tools=(TOOLS if tool_choice != "none" else None),
-        tool_choice=tool_choice,
-        stream=True
-    )
-    final_text_parts: List[str] = []
-    for chunk in stream:
-        delta = getattr(chunk.choices[0].delta, "content", None)
-        if delta:
-            delta_text = delta if isinstance(delta, str) else str(delta)
-            final_text_parts.append(delta_text)
-            await resp.write(_sse_event("token", {"delta": delta_text}))
-    final_text = "".join(final_text_parts)
-    return final_text
+                reply = await handle_engine_turn_oneshot(build_messages(sid, text), sid)
+            except Exception as e:
+                traceback.print_exc()
+                await streamer.finish(f"[error] {e}")
+                return resp
+
+    append_turn(sid, text, reply)
+    await streamer.finish(reply)
+    return resp
 
 
 # -------------------------
@@ -384,9 +357,27 @@ resetBtn.onclick = async () => {{
     async def health(_req: web.Request) -> web.Response:
         return web.json_response({"ok": True})
 
+    async def metrics(request: web.Request) -> web.Response:
+        # single-flight counters: "shared" = calls that piggybacked on an identical in-flight one
+        return web.json_response({
+            "worker": {"pid": os.getpid(), "id": os.getenv("WORKER_ID", "")},
+            "usage": usage_tracker.stats(sessions=request.query.get("sessions") == "1"),
+            "fetch": document_flight.stats(),
+            "page_cache": page_cache.stats(),
+            "chat": chat_flight.stats(),
+            "llm_pool": connection_warmer().stats(),
+            "prompt_cache": prompt_cache_stats.stats(),
+            "turns": dict(TURN_STATS),
+            "parse": parse_executor.stats(),
+            "summaries": summary_stats.stats(),
+            "host_profiles": host_profiles.stats(hosts=request.query.get("hosts") == "1"),
+            "fetch_scheduler": host_scheduler.stats(hosts=request.query.get("hosts") == "1"),
+            **({"loop_lag": loop_lag.stats()} if DIAGNOSTICS else {}),
+        })
+
     async def reset(request: web.Request) -> web.Response:
         sid = _ensure_sid(request)
-        SESSIONS[sid] = []
+        reset_session(sid)
         return web.json_response({"ok": True})
 
     async def chat_stream(request: web.Request) -> web.StreamResponse:
@@ -407,13 +398,18 @@ resetBtn.onclick = async () => {{
                 await _stream_reply(resp, "")
                 return resp
 
-            messages = _build_messages(sid, text)
-            final_text = await handle_engine_turn_streaming(resp, messages)
+            recorder.record("turn", session=sid, endpoint="/chat", text=text)
+            prefetches = prefetch_urls(text)  # overlaps page download with the probe round trip
+            messages = build_messages(sid, text)
+            streamer = SseStreamer(resp)
+            final_text, disconnected = await _run_turn(
+                request, handle_engine_turn_streaming(streamer.emit, messages, sid), prefetches)
 
-            _append_history(sid, "user", text)
-            _append_history(sid, "assistant", final_text)
+            # a cut-off turn keeps what was streamed (nothing, if no token made it out)
+            append_turn(sid, text, streamer.text if disconnected else final_text)
 
-            await _stream_reply(resp, final_text)
+            if not disconnected:
+                await _stream_reply(resp, final_text)
             return resp
 
         except Exception as e:
@@ -424,56 +420,129 @@ resetBtn.onclick = async () => {{
             await _stream_reply(resp, "")
             return resp
 
-    async def messages_http(request: web.Request) -> web.Response:
+    async def messages_http(request: web.Request) -> web.StreamResponse:
         sid = _ensure_sid(request)
         try:
+            # Agents SDK models are only needed on this route; import on first use
+            from microsoft.agents.core.models.activity import Activity
+
             payload = await request.json()
             activity = Activity.model_validate(payload)
             text = (activity.text or "").strip()
             if not text:
                 return web.json_response({"error": "activity missing 'text'"}, status=400)
 
-            messages = _build_messages(sid, text)
-
-            # Apply the same tool-capability logic for non-streaming path
-            needs_fetch = URL_RE.search(text) is not None
-            supports_tools = _tools_supported(ACTIVE_MODEL)
-            tool_choice = "auto" if supports_tools else "none"
-
-            if needs_fetch and not supports_tools:
-                url = URL_RE.search(text).group(0)
-                fetched = run_fetch(url=url, timeout_sec=12, max_chars=max(FETCH_MIN_CHARS, 10_000))
-                messages.append({
-                    "role": "user",
-                    "content": f"Here is the page text from {url}:\n\n{fetched}\n\nPlease provide 3 concise key points."
-                })
-                tool_choice = "none"
-
-            probe = chat(messages, tools=(TOOLS if tool_choice != "none" else None), tool_choice=tool_choice, stream=False)
-            msg = probe.choices[0].message
-            if getattr(msg, "tool_calls", None):
-                messages.extend(_tool_call_messages(msg))
-                final = chat(messages, tools=(TOOLS if tool_choice != "none" else None), tool_choice=tool_choice, stream=False)
-                reply = final.choices[0].message.content or ""
-            else:
-                reply = msg.content or ""
-
-            _append_history(sid, "user", text)
-            _append_history(sid, "assistant", reply)
+            streaming = _wants_streaming(request)
+            recorder.record("turn", session=sid, endpoint="/api/messages", text=text, stream=streaming)
+            if streaming:
+                return await _reply_streaming(request, sid, text)
+
+            prefetch_urls(text)
+            reply = await handle_engine_turn_oneshot(build_messages(sid, text), sid)
+
+            append_turn(sid, text, reply)
             return web.json_response({"reply": reply})
 
         except Exception as e:
             traceback.print_exc()
             return web.json_response({"error": "internal_error", "detail": str(e)}, status=500)
 
+    async def warm_parse_pool(_app: web.Application) -> None:
+        parse_executor.use_pool()  # the web host parses big pages off-process (PARSE_POOL_WORKERS, default min(4, cores))
+        await asyncio.to_thread(parse_executor.warm)  # start the parse processes before the first big page
+
+    async def stop_parse_pool(_app: web.Application) -> None:
+        parse_executor.shutdown()
+
+    async def warm_llm_pool(_app: web.Application) -> None:
+        connection_warmer().start()  # connects in the background; the first user doesn't pay the TLS handshake
+
+    async def stop_llm_pool(_app: web.Application) -> None:
+        connection_warmer().stop()
+
+    app.on_startup.append(warm_parse_pool)
+    app.on_startup.append(warm_llm_pool)
+    app.on_cleanup.append(stop_parse_pool)
+    app.on_cleanup.append(stop_llm_pool)
+    if DIAGNOSTICS:
+        _add_diagnostics(app)
     app.router.add_get("/", home)
     app.router.add_get("/healthz", health)
+    app.router.add_get("/metrics", metrics)
     app.router.add_post("/reset", reset)
     app.router.add_post("/chat", chat_stream)
     app.router.add_post("/api/messages", messages_http)
     return app
 
 
+# -------------------------
+# Diagnostics (DIAGNOSTICS=1): loop-lag watchdog + on-demand sampling profiler
+# -------------------------
+def _add_diagnostics(app: web.Application) -> None:
+    """
+    GET  /debug/loop-lag        lag percentiles and the recent stalls, each with the stack that blocked the loop
+    POST /debug/profile         ?seconds=10&hz=100&threads=all|loop -> collapsed stacks (flamegraph.pl, speedscope)
+    GET  /debug/profile         the latest profile again
+    These expose code paths and arguments: only turn them on where /metrics is already private.
+    """
+
+    async def start_watchdog(_app: web.Application) -> None:
+        loop_lag.start()
+
+    async def stop_watchdog(_app: web.Application) -> None:
+        loop_lag.stop()
+
+    async def lag(_request: web.Request) -> web.Response:
+        return web.json_response(loop_lag.stats(stalls=True))
+
+    def _profile_response(text: str) -> web.Response:
+        headers = {f"X-Profile-{k.title()}": str(v) for k, v in profiler.last_meta.items()}
+        return web.Response(text=text, content_type="text/plain", headers=headers)
+
+    async def run_profile(request: web.Request) -> web.Response:
+        try:
+            seconds = float(request.query.get("seconds", "10"))
+            hz = int(request.query.get("hz", str(PROFILE_HZ)))
+        except ValueError:
+            return web.json_response({"error": "seconds and hz must be numbers"}, status=400)
+        threads = [loop_lag.loop_thread] if request.query.get("threads") == "loop" else None
+        try:
+            text = await asyncio.to_thread(profiler.run, seconds, hz, threads)  # sampling thread, not the loop
+        except RuntimeError as e:
+            return web.json_response({"error": str(e)}, status=409)
+        return _profile_response(text)
+
+    async def last_profile(_request: web.Request) -> web.Response:
+        if not profiler.last_meta:
+            return web.json_response({"error": "no profile yet: POST /debug/profile?seconds=10"}, status=404)
+        return _profile_response(profiler.last)
+
+    app.on_startup.append(start_watchdog)
+    app.on_cleanup.append(stop_watchdog)
+    app.router.add_get("/debug/loop-lag", lag)
+    app.router.add_post("/debug/profile", run_profile)
+    app.router.add_get("/debug/profile", last_profile)
+
+
+def _worker_ready(*_args) -> None:
+    """run_app calls this once the site is listening; tells serve.py this worker is up."""
+    ready_fd = os.getenv("READY_FD")
+    if ready_fd:
+        os.write(int(ready_fd), b"1")
+        os.close(int(ready_fd))
+    else:
+        print(*_args)
+
+
 if __name__ == "__main__":
     port = int(os.getenv("PORT", "3978"))
-    web.run_app(make_app(), host="127.0.0.1", port=port)
+    host = os.getenv("HOST", "127.0.0.1")
+    # On SIGTERM, stop accepting and give in-flight turns this long to finish (serve.py reload/stop)
+    drain_sec = float(os.getenv("DRAIN_TIMEOUT_SEC", "30"))
+    listen_fd = os.getenv("LISTEN_FD")  # socket inherited from serve.py (shared-socket mode)
+    if listen_fd:
+        web.run_app(make_app(), sock=socket.socket(fileno=int(listen_fd)),
+                    shutdown_timeout=drain_sec, print=_worker_ready)
+    else:
+        web.run_app(make_app(), host=host, port=port, reuse_port=os.getenv("REUSE_PORT") == "1",
+                    shutdown_timeout=drain_sec, print=_worker_ready)
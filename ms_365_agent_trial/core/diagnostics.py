@@ -0,0 +1,220 @@
+# core/diagnostics.py
+"""
+Opt-in (DIAGNOSTICS=1) tools for finding what stalls the event loop.
+
+Every /chat turn on a worker shares one loop, so a synchronous chat(), run_fetch
+or parse that slips onto it stalls every other stream. Two tools:
+
+  loop lag    a heartbeat task on the loop plus a watchdog thread. When the loop
+              hasn't run the heartbeat for LOOP_LAG_MS, the watchdog grabs the
+              loop thread's stack *while it is still blocked* (plus the task that
+              was running) and logs it. Recent stalls and lag percentiles are kept.
+              A loop caught idle in select() wasn't blocked but starved: other
+              threads held the GIL (parsing on fetch threads, say) or the CPU was full.
+  profiler    on demand: sample every thread's stack PROFILE_HZ times a second
+              for a few seconds and fold the samples into collapsed stacks
+              ("thread;outer;...;leaf count" lines), the input of flamegraph.pl,
+              speedscope and inferno.
+
+Both only read sys._current_frames() from their own thread: nothing is hooked
+into the loop or the interpreter, and they cost nothing when off.
+"""
+import asyncio
+import os
+import selectors
+import statistics
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, Optional
+
+DIAGNOSTICS = os.getenv("DIAGNOSTICS", "0") == "1"
+LOOP_LAG_MS = float(os.getenv("LOOP_LAG_MS", "100"))  # stalls longer than this are logged with the blocking stack
+PROFILE_HZ = int(os.getenv("PROFILE_HZ", "100"))
+PROFILE_MAX_SEC = float(os.getenv("PROFILE_MAX_SEC", "60"))
+STALLS_KEPT = 50
+_LAG_SAMPLES = 2000
+_ASYNCIO_DIR = os.path.dirname(asyncio.__file__)
+_SELECTORS_FILE = os.path.splitext(selectors.__file__)[0]
+
+
+def _label(frame) -> str:
+    code = frame.f_code
+    path = code.co_filename.replace("\\", "/").rsplit("/", 2)
+    return f"{code.co_name} ({'/'.join(path[-2:])}:{code.co_firstlineno})".replace(";", ":")
+
+
+def _labels(frame) -> List[str]:
+    out = []
+    while frame is not None:
+        out.append(_label(frame))
+        frame = frame.f_back
+    out.reverse()  # outermost first
+    return out
+
+
+def _task_frames(frame) -> List[traceback.FrameSummary]:
+    """The stack below the loop machinery: starts at the running task's coroutine when there is one."""
+    summary = traceback.extract_stack(frame)
+    last_asyncio = max((i for i, f in enumerate(summary) if f.filename.startswith(_ASYNCIO_DIR)), default=-1)
+    if 0 <= last_asyncio < len(summary) - 1:
+        return summary[last_asyncio + 1:]
+    return summary  # blocked inside asyncio itself (or no loop frames): keep it all
+
+
+# -------------------------
+# event-loop lag watchdog
+# -------------------------
+class LoopLagMonitor:
+    def __init__(self, threshold_ms: float = LOOP_LAG_MS) -> None:
+        self.threshold = threshold_ms / 1000
+        self.interval = max(0.005, self.threshold / 4)  # heartbeat period
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.loop_thread = 0
+        self._beat = 0.0
+        self._open: Optional[Dict[str, Any]] = None  # stall seen by the watchdog, not finished yet
+        self._lags: Deque[float] = deque(maxlen=_LAG_SAMPLES)
+        self._stalls: Deque[Dict[str, Any]] = deque(maxlen=STALLS_KEPT)
+        self._stop = threading.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.stall_count = 0
+        self.max_lag_ms = 0.0
+
+    def start(self) -> None:
+        """Call on the loop to watch."""
+        self._loop = asyncio.get_running_loop()
+        self.loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._task = self._loop.create_task(self._heartbeat(), name="loop-lag-heartbeat")
+        threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True).start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _heartbeat(self) -> None:
+        while True:
+            t0 = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag_ms = (now - t0 - self.interval) * 1000
+            with self._lock:
+                self._beat = now
+                self._lags.append(lag_ms)
+                self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+                stall, self._open = self._open, None
+            if stall is not None:
+                stall["lag_ms"] = round(lag_ms, 1)  # how long it finally lasted
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                overdue = time.monotonic() - self._beat - self.interval
+                if overdue < self.threshold or self._open is not None:
+                    continue
+                self._open = stall = {"at": time.time(), "lag_ms": None}
+            frame = sys._current_frames().get(self.loop_thread)
+            if frame is None:
+                continue
+            idle = os.path.splitext(frame.f_code.co_filename)[0] == _SELECTORS_FILE
+            stall["kind"] = "starved" if idle else "blocked"
+            stall["task"] = "" if idle else self._running_task()
+            stall["stack"] = [] if idle else traceback.format_list(_task_frames(frame))
+            del frame
+            with self._lock:
+                self.stall_count += 1
+                self._stalls.append(stall)
+            if idle:
+                print(f"[diagnostics] event loop late by > {overdue * 1000:.0f} ms while idle in select(): "
+                      "other threads held the GIL or the CPU was saturated", flush=True)
+            else:
+                print(f"[diagnostics] event loop blocked > {overdue * 1000:.0f} ms in {stall['task'] or 'a callback'}:\n"
+                      + "".join(stall["stack"]), end="", flush=True)
+
+    def _running_task(self) -> str:
+        try:
+            task = asyncio.current_task(self._loop)
+        except RuntimeError:
+            return ""
+        if task is None:
+            return ""
+        coro = task.get_coro()
+        return f"{task.get_name()} ({getattr(coro, '__qualname__', type(coro).__name__)})"
+
+    def stats(self, stalls: bool = False) -> Dict[str, Any]:
+        with self._lock:
+            lags = sorted(self._lags)
+            out: Dict[str, Any] = {
+                "threshold_ms": self.threshold * 1000,
+                "stalls": self.stall_count,
+                "max_lag_ms": round(self.max_lag_ms, 1),
+                "lag_p50_ms": round(statistics.median(lags), 2) if lags else None,
+                "lag_p99_ms": round(lags[int(0.99 * (len(lags) - 1))], 2) if lags else None,
+            }
+            if stalls:
+                out["recent"] = [dict(s) for s in reversed(self._stalls)]
+        return out
+
+
+# -------------------------
+# sampling profiler
+# -------------------------
+class SamplingProfiler:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.running = False
+        self.last = ""  # collapsed stacks of the latest finished profile
+        self.last_meta: Dict[str, Any] = {}
+
+    def run(self, seconds: float, hz: int = PROFILE_HZ, thread_ids: Optional[List[int]] = None) -> str:
+        """
+        Blocking (call it off the loop): samples for `seconds`, returns collapsed stacks,
+        most frequent first. Raises RuntimeError if a profile is already running.
+        """
+        with self._lock:
+            if self.running:
+                raise RuntimeError("a profile is already running")
+            self.running = True
+        try:
+            me = threading.get_ident()
+            period = 1.0 / max(1, hz)
+            counts: Counter = Counter()
+            samples = 0
+            started = time.monotonic()
+            deadline = started + min(seconds, PROFILE_MAX_SEC)
+            next_tick = started
+            while True:
+                names = {t.ident: t.name for t in threading.enumerate()}
+                for tid, frame in sys._current_frames().items():
+                    if tid == me or (thread_ids and tid not in thread_ids):
+                        continue
+                    counts[";".join([names.get(tid, f"thread-{tid}").replace(";", ":")] + _labels(frame))] += 1
+                frame = None  # don't keep the last sampled frame (and its locals) alive between ticks
+                samples += 1
+                next_tick += period
+                now = time.monotonic()
+                if next_tick >= deadline:
+                    break
+                if next_tick > now:
+                    time.sleep(next_tick - now)
+                else:
+                    next_tick = now  # fell behind: don't burst to catch up
+            out = "".join(f"{stack} {n}\n" for stack, n in counts.most_common())
+            elapsed = time.monotonic() - started
+            with self._lock:
+                self.last = out
+                self.last_meta = {"at": time.time(), "seconds": round(elapsed, 2), "samples": samples,
+                                  "hz": round(samples / elapsed, 1) if elapsed else 0.0,
+                                  "threads": "loop" if thread_ids else "all"}
+            return out
+        finally:
+            with self._lock:
+                self.running = False
+
+
+loop_lag = LoopLagMonitor()
+profiler = SamplingProfiler()
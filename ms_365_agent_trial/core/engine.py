@@ -0,0 +1,509 @@
+# core/engine.py
+"""
+The M365 chat engine, shared by the web host (app.py) and the terminal REPL (repl.py).
+
+One turn: prefetch URLs in the message, probe the model once (tools offered),
+run the requested tools ONCE (fetch / crawl / search_fetched, off the event
+loop), then stream the final answer. Events ("tool", "token") go to an `emit`
+callback, so each front end renders them its own way (SSE frames, Teams
+streaming activities, terminal output). Models without tool support get the
+page (or local passages) injected instead.
+
+Conversation state lives in SESSIONS; build_messages() sends at most
+HISTORY_MAX_TURNS earlier turns.
+"""
+import os
+import json
+import asyncio
+import re
+import traceback
+from concurrent.futures import Future
+from typing import Awaitable, Callable, List, Dict, Any, Optional
+
+from dotenv import load_dotenv
+
+# Import ACTIVE_MODEL if available (from your toggle-enabled client);
+# fall back gracefully if not exported.
+try:
+    from core.lite_llm_model import achat, chat, ACTIVE_MODEL  # type: ignore
+except Exception:  # pragma: no cover
+    from core.lite_llm_model import achat, chat  # type: ignore
+    ACTIVE_MODEL = os.getenv("LITELLM_MODEL_ID") or os.getenv("OPENAI_MODEL_ID") or "unknown"
+
+from core.prompt import assemble, cache_hints_enabled, window_history
+from core.sessions import make_session_store
+from core.summarize import needs_map_reduce, summarize_document
+from tools.fetch_and_summarize import CRAWL_TOOL_SPEC, TOOL_SPEC, run as run_fetch, run_crawl
+from tools.search_fetched import (
+    DOCS_PER_SESSION,
+    TOOL_SPEC as SEARCH_TOOL_SPEC,
+    forget as forget_fetched,
+    get_store,
+    remember as remember_fetched,
+    run as run_search,
+)
+from webfetch import cached_document, fetch_text, fit, normalize_url, prefetch  # importable once tools.fetch_and_summarize set up sys.path
+from webfetch.rank import tokenize
+
+load_dotenv()
+
+SYSTEM_PROMPT = os.getenv(
+    "SYSTEM_PROMPT",
+    "You are a helpful, concise assistant. Use tools when they help."
+)
+
+TOOLS: List[Dict[str, Any]] = [TOOL_SPEC, CRAWL_TOOL_SPEC, SEARCH_TOOL_SPEC]
+
+# ---- enforce a healthy first fetch so models don't ask for a second round
+FETCH_MIN_CHARS = int(os.getenv("FETCH_MIN_CHARS", "8000"))  # can override in .env
+
+# ---- when there is a question to rank against, fetches return the most relevant
+# passages (BM25) instead of the page head, so a smaller budget answers better
+FETCH_RANKED_CHARS = int(os.getenv("FETCH_RANKED_CHARS", "4000"))
+
+# --- Models known (or conservatively assumed) to NOT support OpenAI-style function calling
+# Add/adjust as needed for your environment.
+NO_TOOL_MODELS = {
+    "openai.gpt-oss-120b-1:0",
+    "openai.gpt-oss-20b-1:0",
+    "DeepSeek-R1",
+    "us.deepseek.r1-v1:0",
+    "us.meta.llama4-maverick-17b-instruct-v1:0",
+    "us.meta.llama4-scout-17b-instruct-v1:0",
+}
+
+# Simple heuristic: treat ids containing these tokens as non-tool-capable too
+_NO_TOOL_SUBSTRINGS = ("gpt-oss", "r1", "llama4-maverick", "llama4-scout")
+
+def _tools_supported(model_id: str) -> bool:
+    mid = (model_id or "").strip()
+    if mid in NO_TOOL_MODELS:
+        return False
+    lower = mid.lower()
+    return not any(tok in lower for tok in _NO_TOOL_SUBSTRINGS)
+
+# --- URL detector (for auto local fetch when tools aren't supported, and for prefetching)
+URL_RE = re.compile(r'https?://\S+')
+_URL_TRAILING = ".,;:!?)]}>'\""
+
+
+def _urls_in(text: str) -> List[str]:
+    """URLs in the user's text, without sentence punctuation glued to the end."""
+    return [u.rstrip(_URL_TRAILING) for u in URL_RE.findall(text or "")]
+
+
+def prefetch_urls(text: str) -> List[Future]:
+    """
+    Start downloading every URL in the message right away, in parallel with the
+    probe call. When the model then calls fetch_and_summarize, the fetch waits on
+    (or reads the cached result of) this download instead of starting from zero.
+    """
+    return [prefetch(url) for url in _urls_in(text)]
+
+# --- Sessions for multi-turn: in memory, or sqlite shared by all workers (SESSION_STORE_PATH) ---
+SESSIONS = make_session_store()
+# Earlier turns (user + assistant message pairs) sent with each request; the store keeps everything
+HISTORY_MAX_TURNS = int(os.getenv("HISTORY_MAX_TURNS", "20"))
+
+
+def append_history(sid: str, role: str, content: str) -> None:
+    SESSIONS.append(sid, role, content)
+
+
+def append_turn(sid: str, user_text: str, reply: str) -> None:
+    """
+    Record a turn as a user/assistant pair. A turn cut off before its first token
+    leaves nothing: Anthropic / Bedrock models reject empty assistant content, so
+    storing one would fail every later turn of the session.
+    """
+    if not reply.strip():
+        return
+    append_history(sid, "user", user_text)
+    append_history(sid, "assistant", reply)
+
+
+def reset_session(sid: str) -> None:
+    """Drop a session's history and its fetched-page index."""
+    SESSIONS.reset(sid)
+    forget_fetched(sid)
+
+
+def _remember_pages(sid: str, documents: Dict[str, str]) -> None:
+    """Index fetched pages (url -> full text) for search_fetched and note them on the (possibly shared) session."""
+    if not documents:
+        return
+    SESSIONS.add_pages(sid, list(documents))
+    remember_fetched(sid, documents)
+
+
+def _doc_store(sid: str):
+    """
+    This session's page index. Pages fetched by another worker process are
+    indexed here from the shared page cache on first use (no network).
+    """
+    store = get_store(sid)
+    known = set(store.urls()) if store else set()
+    missing = [u for u in SESSIONS.pages(sid)[-DOCS_PER_SESSION:] if u not in known]
+    if missing:
+        remember_fetched(sid, {u: cached_document(u) or "" for u in missing})
+        store = get_store(sid)
+    return store
+
+
+def build_messages(sid: str, new_user_text: str) -> List[Dict[str, Any]]:
+    """System prompt + prior turns (stable, cacheable prefix), then this turn's context and text."""
+    context: List[str] = []
+    store = _doc_store(sid)
+    if store and store.urls():
+        # tool results aren't kept in history, so tell the model what it can still search locally
+        context.append("Pages fetched earlier in this conversation (use search_fetched for follow-ups, "
+                       "no need to fetch again): " + ", ".join(store.urls()))
+    history = window_history(SESSIONS.history(sid), 2 * HISTORY_MAX_TURNS)
+    return assemble(SYSTEM_PROMPT, history, new_user_text, context, cache_hints=cache_hints_enabled(ACTIVE_MODEL))
+
+
+def _question_text(user_text: str) -> str:
+    """The user's message without its URLs: what fetched pages are ranked against."""
+    return " ".join(URL_RE.sub(" ", user_text or "").split())
+
+
+def _fetch_args(args: Dict[str, Any], user_text: str = "") -> Dict[str, Any]:
+    """Effective fetch_and_summarize arguments, with the budget policy applied."""
+    query = (args.get("query") or _question_text(user_text)).strip()
+    # enforce a generous first fetch to avoid second-round retries; it is also what a
+    # question that matches nothing on the page gets (the head, like a plain fetch)
+    max_chars = max(int(args.get("max_chars", 6000)), FETCH_MIN_CHARS)
+    return {
+        "url": args.get("url", ""),
+        "urls": args.get("urls") or None,
+        "timeout_sec": int(args.get("timeout_sec", 12)),
+        "max_chars": max_chars,
+        "query": query,
+        # passages actually selected for the question need less
+        "ranked_chars": min(FETCH_RANKED_CHARS, max_chars) if tokenize(query) else None,
+    }
+
+
+def _fetch_for_answer(fetch_args: Dict[str, Any], sid: str = "", documents: Optional[Dict[str, str]] = None) -> str:
+    """
+    run_fetch(), except on a plain "summarize this" turn (no question to rank by):
+    pages longer than the budget are map-reduce summarized whole instead of cut
+    off at max_chars (core.summarize). The full text of every page fetched goes
+    into `documents` when given. Blocking; run it off the event loop.
+    """
+    documents = {} if documents is None else documents
+    out = run_fetch(**fetch_args, documents=documents)
+    urls = _fetched_urls(fetch_args)
+    if out.startswith("ERROR:") or tokenize(fetch_args["query"]) or not urls:
+        return out
+    per_page = fetch_args["max_chars"] // len(urls)
+    docs = [(u, documents.get(normalize_url(u))) for u in urls]
+    if not any(doc and needs_map_reduce(doc, per_page) for _u, doc in docs):
+        return out
+    sections: List[str] = []
+    try:
+        for url, doc in docs:
+            if doc and needs_map_reduce(doc, per_page):
+                text = f"(whole page, summarized in parts)\n{summarize_document(doc, session=sid)}"
+            else:
+                text = fit(doc, per_page) if doc else fetch_text(url, fetch_args["timeout_sec"], per_page)
+            sections.append(text if len(urls) == 1 else f"### {url}\n{text}")
+    except Exception:
+        traceback.print_exc()  # LLM error mid map-reduce: the truncated page is still an answer
+        return out
+    return "\n\n".join(sections)
+
+
+def _crawl_args(args: Dict[str, Any], user_text: str = "") -> Dict[str, Any]:
+    """Effective crawl_and_extract arguments: the question defaults to the user's message."""
+    out = {k: args[k] for k in ("url", "max_depth", "max_pages", "same_origin", "path_prefix", "max_chars")
+           if k in args}
+    out["query"] = (args.get("query") or _question_text(user_text)).strip()
+    return out
+
+
+def _fetched_urls(fetch_args: Dict[str, Any]) -> List[str]:
+    return [u for u in [fetch_args.get("url"), *(fetch_args.get("urls") or [])] if u]
+
+
+def _local_passages(sid: str, user_text: str) -> str:
+    """Passages from this session's fetched pages that match a follow-up ("" if none / no pages)."""
+    store = _doc_store(sid)
+    query = _question_text(user_text)
+    if not store or not store.urls() or not tokenize(query):
+        return ""
+    out = run_search(sid, query, max_chars=FETCH_RANKED_CHARS)
+    return "" if out.startswith(("ERROR:", "No passages matched")) else out
+
+
+def _tool_call_messages(msg, user_text: str = "", sid: str = "") -> List[Dict[str, Any]]:
+    """Convert tool_calls into assistant stub + tool outputs (ONE ROUND ONLY)."""
+    addl: List[Dict[str, Any]] = []
+    addl.append({
+        "role": "assistant",
+        "content": msg.content or "",
+        "tool_calls": [
+            {
+                "id": tc.id,
+                "type": tc.type,
+                "function": {
+                    "name": tc.function.name,
+                    "arguments": tc.function.arguments,
+                }
+            } for tc in (msg.tool_calls or [])
+        ],
+    })
+
+    for tc in (msg.tool_calls or []):
+        try:
+            args = json.loads(tc.function.arguments or "{}")
+        except json.JSONDecodeError:
+            args = {}
+
+        if tc.function.name == "fetch_and_summarize":
+            documents: Dict[str, str] = {}
+            out = _fetch_for_answer(_fetch_args(args, user_text), sid, documents)
+            if sid:
+                _remember_pages(sid, documents)
+            addl.append({
+                "role": "tool",
+                "tool_call_id": tc.id,
+                "name": "fetch_and_summarize",
+                "content": out,
+            })
+        elif tc.function.name == "crawl_and_extract":
+            documents = {}
+            out = run_crawl(**_crawl_args(args, user_text), documents=documents)
+            if sid:
+                _remember_pages(sid, documents)
+            addl.append({
+                "role": "tool",
+                "tool_call_id": tc.id,
+                "name": "crawl_and_extract",
+                "content": out,
+            })
+        elif tc.function.name == "search_fetched":
+            _doc_store(sid)
+            out = run_search(sid, args.get("query") or _question_text(user_text),
+                             url=args.get("url", ""), max_chars=int(args.get("max_chars", FETCH_RANKED_CHARS)))
+            addl.append({
+                "role": "tool",
+                "tool_call_id": tc.id,
+                "name": "search_fetched",
+                "content": out,
+            })
+        else:
+            addl.append({
+                "role": "tool",
+                "tool_call_id": tc.id,
+                "name": tc.function.name,
+                "content": "ERROR: unknown tool",
+            })
+    return addl
+
+
+# emit(event, data): how the engine reports tool/token events to whichever transport is driving it
+Emit = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+
+async def _open_stream(messages: List[Dict[str, Any]], **kwargs):
+    """
+    chat(..., stream=True) off the event loop. Opening the stream blocks until upstream
+    sends its headers; if the turn is cancelled meanwhile, the thread still returns an
+    open stream, so it is closed as soon as it arrives (upstream stops generating and
+    its usage is recorded) instead of being dropped unread.
+    """
+    opening = asyncio.ensure_future(asyncio.to_thread(chat, messages, stream=True, **kwargs))
+    try:
+        return await asyncio.shield(opening)
+    except asyncio.CancelledError:
+        opening.add_done_callback(
+            lambda fut: fut.result().close() if not fut.cancelled() and fut.exception() is None else None)
+        raise
+
+
+async def _aiter_chunks(stream):
+    """Iterate a (blocking) completion stream from a worker thread without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
+
+    def pump() -> None:
+        try:
+            for chunk in stream:
+                loop.call_soon_threadsafe(queue.put_nowait, chunk)
+        except Exception as e:  # includes the error raised when the stream is closed under us
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, done)
+
+    loop.run_in_executor(None, pump)
+    while True:
+        item = await queue.get()
+        if item is done:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+
+# -------------------------
+# ONE-ROUND tools, then stream the final answer
+# -------------------------
+async def handle_engine_turn_streaming(emit: Emit, messages: List[Dict[str, Any]], sid: str = "") -> str:
+    """
+    Probe once (non-stream).
+    If tool_calls exist -> execute them ONCE, emit tool events.
+    Then do a single streaming call for the answer.
+    Events ("tool", "token") go through `emit`, so /chat (SSE) and /api/messages
+    (streamed activities) share this engine.
+    """
+    # Decide tool capability for the active model, and whether we need to locally fetch a URL.
+    user_text = messages[-1]["content"]
+    needs_fetch = URL_RE.search(user_text) is not None
+    supports_tools = _tools_supported(ACTIVE_MODEL)
+
+    # If tools aren't supported but a URL is present, fetch locally and inject the text.
+    tool_choice = "auto" if supports_tools else "none"
+    if needs_fetch and not supports_tools:
+        url = _urls_in(user_text)[0]
+        fetch_args = _fetch_args({"url": url, "max_chars": max(FETCH_MIN_CHARS, 10_000)}, user_text)
+        # Emit tool events to keep UI consistent
+        await emit("tool", {
+            "phase": "start",
+            "name": "fetch_and_summarize",
+            "args": fetch_args
+        })
+        documents: Dict[str, str] = {}
+        fetched = await asyncio.to_thread(_fetch_for_answer, fetch_args, sid, documents)  # usually already prefetched
+        if sid:
+            _remember_pages(sid, documents)
+        await emit("tool", {
+            "phase": "end",
+            "name": "fetch_and_summarize",
+            "chars": len(fetched),
+            "preview": (fetched[:200] + ("…" if len(fetched) > 200 else ""))
+        })
+        messages.append({
+            "role": "user",
+            "content": f"Here is the page text from {url}:\n\n{fetched}\n\nPlease provide 3 concise key points."
+        })
+        tool_choice = "none"  # final LLM call should not include tool params
+    elif not supports_tools:
+        # Follow-up on a page fetched earlier: answer from the local index, no network
+        passages = _local_passages(sid, user_text)
+        if passages:
+            search_args = {"query": _question_text(user_text)}
+            await emit("tool", {"phase": "start", "name": "search_fetched", "args": search_args})
+            await emit("tool", {
+                "phase": "end",
+                "name": "search_fetched",
+                "chars": len(passages),
+                "preview": (passages[:200] + ("…" if len(passages) > 200 else ""))
+            })
+            messages.append({
+                "role": "user",
+                "content": f"Relevant passages from pages fetched earlier:\n\n{passages}\n\nAnswer my last question using them."
+            })
+
+    # Probe for tools once (only if we intend to use tools); off the event loop so
+    # prefetches and other sessions keep moving, and shared with identical concurrent probes
+    probe = await achat(
+        messages,
+        tools=(TOOLS if tool_choice != "none" else None),
+        tool_choice=tool_choice,
+        session=sid,
+    )
+    msg = probe.choices[0].message
+
+    if getattr(msg, "tool_calls", None):
+        # Append assistant stub + tool results (one round only); fetches reuse the prefetch
+        messages.extend(await asyncio.to_thread(_tool_call_messages, msg, user_text, sid))
+
+        # Emit tool events so they appear BEFORE the final answer
+        for tc in msg.tool_calls:
+            try:
+                args = json.loads(tc.function.arguments or "{}")
+            except json.JSONDecodeError:
+                args = {}
+            # reflect the effective budget/query in the visible args (so it's clear what we fetched)
+            shown_args = (_fetch_args(args, user_text) if tc.function.name == "fetch_and_summarize" else
+                          _crawl_args(args, user_text) if tc.function.name == "crawl_and_extract" else args)
+
+            await emit("tool", {
+                "phase": "start",
+                "name": tc.function.name,
+                "args": shown_args
+            })
+            out_msg = next((m for m in messages if m.get("role") == "tool" and m.get("tool_call_id") == tc.id), None)
+            if out_msg:
+                preview = out_msg["content"][:200] + ("…" if len(out_msg["content"]) > 200 else "")
+                await emit("tool", {
+                    "phase": "end",
+                    "name": tc.function.name,
+                    "chars": len(out_msg["content"]),
+                    "preview": preview
+                })
+
+    # Final streaming answer (single call), read off the event loop so a disconnect can stop it
+    stream = await _open_stream(
+        messages,
+        tools=(TOOLS if tool_choice != "none" else None),
+        tool_choice=tool_choice,
+        session=sid,
+    )
+    final_text_parts: List[str] = []
+    try:
+        async for chunk in _aiter_chunks(stream):
+            if not chunk.choices:  # trailing usage-only chunk (stream_options.include_usage)
+                continue
+            delta = getattr(chunk.choices[0].delta, "content", None)
+            if delta:
+                delta_text = delta if isinstance(delta, str) else str(delta)
+                final_text_parts.append(delta_text)
+                await emit("token", {"delta": delta_text})
+    finally:
+        stream.close()  # no-op once finished; on cancellation it stops upstream generation
+    final_text = "".join(final_text_parts)
+    return final_text
+
+
+async def handle_engine_turn_oneshot(messages: List[Dict[str, Any]], sid: str = "") -> str:
+    """
+    Same policy as the streaming engine, but one complete reply:
+    probe -> (tools, ONE round) -> second non-stream call.
+    """
+    user_text = messages[-1]["content"]
+    needs_fetch = URL_RE.search(user_text) is not None
+    supports_tools = _tools_supported(ACTIVE_MODEL)
+    tool_choice = "auto" if supports_tools else "none"
+
+    if needs_fetch and not supports_tools:
+        url = _urls_in(user_text)[0]
+        documents: Dict[str, str] = {}
+        fetched = await asyncio.to_thread(
+            _fetch_for_answer, _fetch_args({"url": url, "max_chars": max(FETCH_MIN_CHARS, 10_000)}, user_text), sid,
+            documents)
+        if sid:
+            _remember_pages(sid, documents)
+        messages.append({
+            "role": "user",
+            "content": f"Here is the page text from {url}:\n\n{fetched}\n\nPlease provide 3 concise key points."
+        })
+        tool_choice = "none"
+    elif not supports_tools:
+        passages = _local_passages(sid, user_text)
+        if passages:
+            messages.append({
+                "role": "user",
+                "content": f"Relevant passages from pages fetched earlier:\n\n{passages}\n\nAnswer my last question using them."
+            })
+
+    probe = await achat(messages, tools=(TOOLS if tool_choice != "none" else None), tool_choice=tool_choice, session=sid)
+    msg = probe.choices[0].message
+    if getattr(msg, "tool_calls", None):
+        messages.extend(await asyncio.to_thread(_tool_call_messages, msg, user_text, sid))
+        final = await achat(messages, tools=(TOOLS if tool_choice != "none" else None), tool_choice=tool_choice,
+                            session=sid)
+        return final.choices[0].message.content or ""
+    return msg.content or ""
@@ -1,8 +1,25 @@
 # core/lite_llm_model.py
 import os
+import sys
+import json
+import asyncio
+import hashlib
+import functools
+import threading
+import time
+from pathlib import Path
 from dotenv import load_dotenv
-from openai import OpenAI
-from openai import BadRequestError
+
+# Shared helpers (webfetch.singleflight) live at the repo root
+_REPO_ROOT = str(Path(__file__).resolve().parents[2])
+if _REPO_ROOT not in sys.path:
+    sys.path.insert(0, _REPO_ROOT)
+
+from webfetch.keepalive import PoolWarmer, ping_url, pool_limits
+from webfetch.singleflight import AsyncSingleFlight
+from core.prompt import prompt_cache_stats
+from core.recorder import recorder
+from core.usage import usage_tracker
 
 load_dotenv()
 
@@ -23,15 +40,105 @@ else:
     API_KEY  = os.environ["OPENAI_API_KEY"]
     MODEL    = os.getenv("OPENAI_MODEL_ID", "gpt-4o-mini")
 
-# One official OpenAI client works for both paths (LiteLLM is OpenAI-compatible)
-client = OpenAI(base_url=BASE_URL, api_key=API_KEY)
+@functools.lru_cache(maxsize=None)
+def get_client():
+    """
+    One official OpenAI client works for both paths (LiteLLM is OpenAI-compatible).
+    Created (and `openai` imported) on the first call, not at import time.
+    Its pool keeps idle connections PROXY_KEEPALIVE_SEC (not httpx's 5 s), so the
+    connections connection_warmer() opens are still there for the first user.
+    """
+    from openai import DefaultHttpxClient, OpenAI
+    return OpenAI(base_url=BASE_URL, api_key=API_KEY, http_client=DefaultHttpxClient(limits=pool_limits()))
 
-def chat(messages, tools=None, tool_choice="auto", temperature=0.3, stream=False, max_tokens=None):
+
+@functools.lru_cache(maxsize=None)
+def connection_warmer() -> PoolWarmer:
+    """
+    Opens PROXY_WARM_CONNECTIONS connections to the backend and pings them every
+    PROXY_PING_SEC (webfetch.keepalive). Call .start() once per process; .stats()
+    is the pool state for /metrics.
+    """
+    return PoolWarmer(lambda: get_client()._client, ping_url(BASE_URL),
+                      headers={"Authorization": f"Bearer {API_KEY}"})
+
+class MeteredStream:
+    """
+    Passes stream chunks through unchanged and, when the stream ends (or is
+    closed early), records token usage, TTFT and decode rate for it. With the
+    recorder on, it also keeps every chunk with its arrival time.
+    """
+
+    def __init__(self, stream, session: str, started: float, request=None):
+        self._stream = stream
+        self._request = request  # kwargs sent upstream; only kept while recording
+        self._tape = [] if request is not None else None  # [seconds since request, chunk]
+        self._session = session
+        self._started = started
+        self._first_token = None
+        self._recorded = False
+        self._lock = threading.Lock()  # iteration runs in a worker thread, close() may come from the loop
+        self.finished = False
+        self.closed = False  # close() called: stopped on purpose (client gone, Ctrl-C)
+        self.errored = False  # upstream failed mid-stream
+        self.usage = None
+        self.chunks = 0  # chunks carrying content
+
+    def __iter__(self):
+        try:
+            for chunk in self._stream:
+                if getattr(chunk, "usage", None):
+                    self.usage = chunk.usage  # final usage-only chunk (choices == [])
+                if chunk.choices and getattr(chunk.choices[0].delta, "content", None):
+                    if self._first_token is None:
+                        self._first_token = time.perf_counter()
+                    self.chunks += 1
+                if self._tape is not None:
+                    self._tape.append([round(time.perf_counter() - self._started, 4), chunk])
+                yield chunk
+            self.finished = True
+        except Exception:
+            self.errored = not self.closed  # close() from another thread can break the read too
+            raise
+        finally:
+            self._record()
+
+    def close(self) -> None:
+        """Stop early: drops the upstream HTTP response so the backend stops generating."""
+        self.closed = True
+        try:
+            self._stream.close()
+        finally:
+            self._record()
+
+    def _record(self) -> None:
+        with self._lock:
+            if self._recorded:
+                return
+            self._recorded = True
+        # only a stream we stopped counts as cancelled (and as tokens saved); a failed one is an error
+        cancelled = self.closed and not self.finished and not self.errored
+        if cancelled:
+            usage_tracker.record_cancelled(MODEL, self.chunks)
+        ttft = self._first_token - self._started if self._first_token is not None else None
+        usage_tracker.record(MODEL, self.usage, session=self._session, stream=True,
+                             duration_sec=time.perf_counter() - self._started, ttft_sec=ttft,
+                             chunks=self.chunks, cancelled=cancelled, errored=self.errored)
+        prompt_cache_stats.record(self.usage)
+        if self._tape is not None:
+            recorder.record("chat", session=self._session, model=MODEL, request=self._request, stream=True,
+                            chunks=self._tape, finished=self.finished,
+                            duration_sec=round(time.perf_counter() - self._started, 4))
+
+
+def chat(messages, tools=None, tool_choice="auto", temperature=0.3, stream=False, max_tokens=None, session=""):
     """
     OpenAI Chat Completions call via either:
       - LiteLLM proxy (if USE_LITELLM=1), or
       - OpenAI direct (if USE_LITELLM=0).
     Supports function tools when backend supports them.
+    Usage is recorded per model (and per `session` when given); streams come back
+    wrapped in a MeteredStream and ask for a final usage chunk.
     """
     kwargs = {
         "model": MODEL,
@@ -39,6 +146,8 @@ def chat(messages, tools=None, tool_choice="auto", temperature=0.3, stream=False
         "temperature": temperature,
         "stream": stream,
     }
+    if stream:
+        kwargs["stream_options"] = {"include_usage": True}  # last chunk: usage, empty choices
     if tools:
         kwargs["tools"] = tools
     if tool_choice:
@@ -46,17 +155,63 @@ def chat(messages, tools=None, tool_choice="auto", temperature=0.3, stream=False
     if max_tokens is not None:
         kwargs["max_tokens"] = max_tokens
 
-    try:
-        return client.chat.completions.create(**kwargs)
-    except BadRequestError as e:
-        # If the backend rejects tool params (common on some Bedrock routes),
-        # retry once without tool-use so non-tool models still work gracefully.
-        msg = str(e)
-        if ("UnsupportedParamsError" in msg or "drop_params" in msg) and (tools or tool_choice):
-            kwargs.pop("tools", None)
-            kwargs.pop("tool_choice", None)
-            return client.chat.completions.create(**kwargs)
-        raise
+    from openai import BadRequestError
+
+    client = get_client()
+    started = time.perf_counter()
+    for _ in range(3):
+        try:
+            resp = client.chat.completions.create(**kwargs)
+            break
+        except BadRequestError as e:
+            msg = str(e)
+            if "stream_options" in msg and "stream_options" in kwargs:
+                # Older backends don't know include_usage: stream without it (usage gets estimated)
+                kwargs.pop("stream_options")
+            elif ("UnsupportedParamsError" in msg or "drop_params" in msg) and ("tools" in kwargs or "tool_choice" in kwargs):
+                # If the backend rejects tool params (common on some Bedrock routes),
+                # retry once without tool-use so non-tool models still work gracefully.
+                kwargs.pop("tools", None)
+                kwargs.pop("tool_choice", None)
+            else:
+                raise
+    else:
+        resp = client.chat.completions.create(**kwargs)
+
+    if stream:
+        # copy the message list: the engine keeps appending to it while this stream is read
+        request = {**kwargs, "messages": list(messages)} if recorder.enabled else None
+        return MeteredStream(resp, session, started, request=request)
+    usage = getattr(resp, "usage", None)
+    duration = time.perf_counter() - started
+    usage_tracker.record(MODEL, usage, session=session, duration_sec=duration)
+    prompt_cache_stats.record(usage)  # how much of the prefix the provider reused
+    recorder.record("chat", session=session, model=MODEL, request=kwargs, stream=False, response=resp,
+                    duration_sec=round(duration, 4))
+    return resp
+
+# Identical concurrent completions (same FAQ asked by several people at once) share one request
+chat_flight = AsyncSingleFlight()
+
+
+def _completion_key(messages, tools, tool_choice, temperature, max_tokens) -> str:
+    payload = json.dumps([MODEL, messages, tools, tool_choice, temperature, max_tokens],
+                         sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+async def achat(messages, tools=None, tool_choice="auto", temperature=0.3, max_tokens=None, session=""):
+    """
+    Async, non-streaming chat(): runs off the event loop, and identical concurrent
+    requests are coalesced into one upstream call (see chat_flight.stats()).
+    Streams can't be shared this way, so this is for probes/one-shot answers only.
+    A coalesced call's usage is booked to the session that started it. Cancelling
+    stops the wait, not the request: the blocking call finishes in its thread.
+    """
+    key = _completion_key(messages, tools, tool_choice, temperature, max_tokens)
+    return await chat_flight.do(key, lambda: asyncio.to_thread(
+        chat, messages, tools=tools, tool_choice=tool_choice, temperature=temperature,
+        stream=False, max_tokens=max_tokens, session=session))
 
 # Expose which side we're using + the resolved model for any callers that care
 BACKEND = "litellm" if USE_LITELLM else "openai"
@@ -0,0 +1,119 @@
+# core/prompt.py
+"""
+Message assembly with a stable, cacheable prefix.
+
+Provider prompt caches (OpenAI automatic prefix caching, Anthropic/Bedrock
+cache_control via LiteLLM) only pay off when consecutive requests start with
+byte-identical content. So every request is laid out as:
+
+    [tools] + system prompt + older history   <- stable, cacheable prefix
+    + per-turn context + the new user message <- volatile, always last
+
+Per-turn context (fetched-page notes, injected page text) never goes into the
+system message: LiteLLM hoists every system message into Anthropic's top-level
+`system`, which would change the prefix on every turn.
+"""
+import os
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+# auto = send cache_control only to backends known to honour it; 1 = always; 0 = never
+PROMPT_CACHE_HINTS = os.getenv("PROMPT_CACHE_HINTS", "auto").lower()
+_CACHE_CONTROL_MODELS = ("anthropic", "claude", "bedrock")
+
+EPHEMERAL = {"type": "ephemeral"}
+
+
+def cache_hints_enabled(model_id: str) -> bool:
+    if PROMPT_CACHE_HINTS in {"1", "true", "yes"}:
+        return True
+    if PROMPT_CACHE_HINTS in {"0", "false", "no"}:
+        return False
+    lower = (model_id or "").lower()
+    return any(tok in lower for tok in _CACHE_CONTROL_MODELS)
+
+
+def _with_breakpoint(message: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of `message` whose (text) content carries a cache_control breakpoint."""
+    content = message.get("content")
+    if isinstance(content, str):
+        blocks = [{"type": "text", "text": content, "cache_control": EPHEMERAL}]
+    elif isinstance(content, list) and content:
+        blocks = [dict(b) for b in content]
+        blocks[-1]["cache_control"] = EPHEMERAL
+    else:
+        return message
+    return {**message, "content": blocks}
+
+
+def assemble(system_prompt: str, history: Sequence[Dict[str, Any]], user_text: str,
+             context: Optional[Sequence[str]] = None, cache_hints: bool = False) -> List[Dict[str, Any]]:
+    """
+    Build the request messages: stable prefix first, volatile content last.
+    `context` items are per-turn notes sent as one user message right before the
+    new user message (so messages[-1] is always the user's own text).
+    With `cache_hints`, breakpoints mark the end of the system prompt and of the
+    history, so both the fixed part and the conversation so far get cached.
+    """
+    system = {"role": "system", "content": system_prompt}
+    msgs: List[Dict[str, Any]] = [_with_breakpoint(system) if cache_hints else system]
+    msgs.extend(history)
+    if cache_hints and history:
+        msgs[-1] = _with_breakpoint(msgs[-1])  # copy: the session history itself stays plain
+    notes = [c for c in (context or []) if c]
+    if notes:
+        msgs.append({"role": "user", "content": "\n\n".join(notes)})
+    msgs.append({"role": "user", "content": user_text})
+    return msgs
+
+
+def window_history(history: Sequence[Dict[str, Any]], max_messages: int) -> List[Dict[str, Any]]:
+    """
+    The newest part of `history`, at most `max_messages` long (0 = no limit). The cut
+    moves in jumps of half the window rather than one turn at a time, so between jumps
+    every request starts with the same messages and the provider cache keeps hitting.
+    """
+    excess = len(history) - max_messages
+    if max_messages <= 0 or excess <= 0:
+        return list(history)
+    step = max(2, max_messages // 4 * 2)  # even: the window starts on a user message
+    start = -(-excess // step) * step
+    return list(history[start:])
+
+
+def cached_tokens(usage: Any) -> int:
+    """Prompt tokens served from the provider cache, whatever shape the backend reports."""
+    if usage is None:
+        return 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    n = getattr(details, "cached_tokens", None) if details is not None else None
+    if n is None:  # Anthropic-style fields passed through by LiteLLM
+        n = getattr(usage, "cache_read_input_tokens", None)
+    return int(n or 0)
+
+
+class PromptCacheStats:
+    """Running totals of prompt vs cached prompt tokens (exported on /metrics)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+
+    def record(self, usage: Any) -> None:
+        if usage is None:
+            return
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += int(getattr(usage, "prompt_tokens", 0) or 0)
+            self.cached_tokens += cached_tokens(usage)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            ratio = self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+            return {"requests": self.requests, "prompt_tokens": self.prompt_tokens,
+                    "cached_tokens": self.cached_tokens, "hit_ratio": round(ratio, 3)}
+
+
+prompt_cache_stats = PromptCacheStats()
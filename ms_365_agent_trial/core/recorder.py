@@ -0,0 +1,80 @@
+# core/recorder.py
+"""
+Opt-in traffic recorder for reproducing slowdowns offline.
+
+With RECORD_DIR set, every user turn, chat() call (request, response, and the
+arrival time of each stream chunk), fetch tool call and downloaded page is
+appended as one JSON line to RECORD_DIR/rec-<time>-<pid>.jsonl.gz.
+
+    RECORD_DIR=recordings python app.py
+    python ../benchmarks/replay.py recordings/rec-*.jsonl.gz
+
+benchmarks/replay.py serves a recording back through a fake proxy and page
+server. Recordings hold full prompts and page bodies, so handle them like logs
+with user data in them.
+"""
+import atexit
+import base64
+import gzip
+import json
+import os
+import threading
+import time
+from typing import Any, Optional
+
+RECORD_DIR = os.getenv("RECORD_DIR", "")  # "" = off
+
+
+def _jsonable(obj: Any) -> Any:
+    if hasattr(obj, "model_dump"):  # openai / pydantic objects (responses, tool calls in messages)
+        return obj.model_dump(exclude_none=True)
+    if isinstance(obj, bytes):
+        return base64.b64encode(obj).decode("ascii")
+    return str(obj)
+
+
+class Recorder:
+    def __init__(self, directory: str = RECORD_DIR) -> None:
+        self.directory = directory
+        self.path = ""
+        self.events = 0
+        self._fh = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory)
+
+    def record(self, kind: str, **fields: Any) -> None:
+        """Append one event; a no-op when recording is off. Never raises into the caller."""
+        if not self.directory:
+            return
+        try:
+            line = json.dumps({"type": kind, "ts": time.time(), "pid": os.getpid(), **fields},
+                              ensure_ascii=False, default=_jsonable)
+            with self._lock:
+                fh = self._open()
+                fh.write(line + "\n")
+                fh.flush()  # sync-flushes the gzip stream: a killed worker leaves a readable file
+                self.events += 1
+        except Exception as e:
+            print(f"[recorder] dropped a {kind} event: {e}")
+
+    def _open(self):
+        if self._fh is None:
+            os.makedirs(self.directory, exist_ok=True)
+            name = f"rec-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.jsonl.gz"
+            self.path = os.path.join(self.directory, name)
+            self._fh = gzip.open(self.path, "at", encoding="utf-8")
+            atexit.register(self.close)
+        return self._fh
+
+    def close(self) -> None:
+        with self._lock:
+            fh: Optional[Any] = self._fh
+            self._fh = None
+        if fh is not None:
+            fh.close()
+
+
+recorder = Recorder()
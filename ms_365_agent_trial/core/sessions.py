@@ -0,0 +1,104 @@
+# core/sessions.py
+"""
+Conversation state per session id: chat history and the URLs fetched in it.
+
+MemorySessionStore is the single-process default. SqliteSessionStore keeps the
+same interface in a sqlite file, so every worker started by serve.py sees the
+same conversations no matter which process a request lands on.
+"""
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, List
+
+# "" = in-process memory; serve.py points every worker at one sqlite file
+SESSION_STORE_PATH = os.getenv("SESSION_STORE_PATH", "")
+
+
+class MemorySessionStore:
+    def __init__(self) -> None:
+        self._history: Dict[str, List[Dict[str, Any]]] = {}  # sid -> [{"role": ..., "content": ...}]
+        self._pages: Dict[str, List[str]] = {}  # sid -> fetched urls, oldest first
+        self._lock = threading.Lock()
+
+    def ensure(self, sid: str) -> None:
+        with self._lock:
+            self._history.setdefault(sid, [])
+
+    def history(self, sid: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._history.get(sid, []))
+
+    def append(self, sid: str, role: str, content: str) -> None:
+        with self._lock:
+            self._history.setdefault(sid, []).append({"role": role, "content": content})
+
+    def add_pages(self, sid: str, urls: List[str]) -> None:
+        with self._lock:
+            pages = self._pages.setdefault(sid, [])
+            for url in urls:
+                if url in pages:
+                    pages.remove(url)
+                pages.append(url)
+
+    def pages(self, sid: str) -> List[str]:
+        with self._lock:
+            return list(self._pages.get(sid, []))
+
+    def reset(self, sid: str) -> None:
+        with self._lock:
+            self._history[sid] = []
+            self._pages.pop(sid, None)
+
+
+class SqliteSessionStore:
+    """Same interface, stored in sqlite (WAL) so several processes can share it."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._local = threading.local()
+        db = self._conn()
+        db.execute("CREATE TABLE IF NOT EXISTS messages ("
+                   "id INTEGER PRIMARY KEY AUTOINCREMENT, sid TEXT NOT NULL, message TEXT NOT NULL)")
+        db.execute("CREATE INDEX IF NOT EXISTS messages_sid ON messages(sid, id)")
+        db.execute("CREATE TABLE IF NOT EXISTS pages ("
+                   "sid TEXT NOT NULL, url TEXT NOT NULL, seq INTEGER NOT NULL, PRIMARY KEY (sid, url))")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def ensure(self, sid: str) -> None:
+        pass  # rows are created on first append
+
+    def history(self, sid: str) -> List[Dict[str, Any]]:
+        rows = self._conn().execute("SELECT message FROM messages WHERE sid = ? ORDER BY id", (sid,))
+        return [json.loads(m) for (m,) in rows]
+
+    def append(self, sid: str, role: str, content: str) -> None:
+        self._conn().execute("INSERT INTO messages (sid, message) VALUES (?, ?)",
+                             (sid, json.dumps({"role": role, "content": content}, ensure_ascii=False)))
+
+    def add_pages(self, sid: str, urls: List[str]) -> None:
+        db = self._conn()
+        for url in urls:
+            db.execute("INSERT OR REPLACE INTO pages (sid, url, seq) VALUES "
+                       "(?, ?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM pages WHERE sid = ?))", (sid, url, sid))
+
+    def pages(self, sid: str) -> List[str]:
+        return [u for (u,) in self._conn().execute("SELECT url FROM pages WHERE sid = ? ORDER BY seq", (sid,))]
+
+    def reset(self, sid: str) -> None:
+        db = self._conn()
+        db.execute("DELETE FROM messages WHERE sid = ?", (sid,))
+        db.execute("DELETE FROM pages WHERE sid = ?", (sid,))
+
+
+def make_session_store(path: str = SESSION_STORE_PATH):
+    return SqliteSessionStore(path) if path else MemorySessionStore()
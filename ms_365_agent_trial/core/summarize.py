@@ -0,0 +1,161 @@
+# core/summarize.py
+"""
+Map-reduce summaries of pages too long for one prompt.
+
+A fetch truncated at max_chars never shows the model anything past the first
+~10k characters. For "summarize this page" turns (no question to rank passages
+by) the engine uses this instead:
+
+  map     split the whole extracted text into ~SUMMARY_CHUNK_CHARS chunks and
+          summarize them in parallel (SUMMARY_CONCURRENCY completions in flight
+          per process, shared by every session);
+  reduce  while the partial summaries are over SUMMARY_REDUCE_CHARS, merge runs
+          of consecutive ones with another parallel round (hierarchically);
+  answer  the remaining partials go back as the tool result and the engine's
+          usual streamed completion writes the final answer from them.
+
+Wall time is roughly ceil(chunks / SUMMARY_CONCURRENCY) completions plus one per
+reduce level. Every summary is cached by the hash of the text it summarizes
+(and the model), so a page summarized once, or a chunk shared by two versions
+of a page, isn't paid for twice.
+"""
+import functools
+import hashlib
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List
+
+_REPO_ROOT = str(Path(__file__).resolve().parents[2])
+if _REPO_ROOT not in sys.path:
+    sys.path.insert(0, _REPO_ROOT)
+
+from webfetch.cache import make_cache
+from webfetch.rank import split_chunks
+from core.lite_llm_model import MODEL, chat
+
+SUMMARIZE_LONG_PAGES = os.getenv("SUMMARIZE_LONG_PAGES", "1") == "1"
+SUMMARY_CHUNK_CHARS = int(os.getenv("SUMMARY_CHUNK_CHARS", "12000"))  # text per map call (~3k tokens)
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "4"))  # completions in flight per process
+SUMMARY_REDUCE_CHARS = int(os.getenv("SUMMARY_REDUCE_CHARS", "8000"))  # partials handed to the final answer
+SUMMARY_MAX_CHUNKS = int(os.getenv("SUMMARY_MAX_CHUNKS", "48"))  # bigger documents get bigger chunks
+SUMMARY_MAX_TOKENS = int(os.getenv("SUMMARY_MAX_TOKENS", "500"))  # per partial summary
+SUMMARY_CACHE_TTL_SEC = float(os.getenv("SUMMARY_CACHE_TTL_SEC", "86400"))
+SUMMARY_CACHE_MAX_ENTRIES = int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", "2048"))
+# sqlite file shared by serve.py workers (it sets its own); without one, the page cache's file, in a separate table
+SUMMARY_CACHE_PATH = os.getenv("SUMMARY_CACHE_PATH", "") or os.getenv("FETCH_CACHE_PATH", "")
+MAX_REDUCE_LEVELS = 4
+
+MAP_PROMPT = (
+    "You summarize one part of a longer document. Keep the facts that matter: names, numbers, dates, "
+    "decisions, definitions and conclusions. Plain prose or short bullets, no preamble, no comment on "
+    "the part being incomplete."
+)
+REDUCE_PROMPT = (
+    "These are summaries of consecutive parts of one document. Merge them into one summary of the whole, "
+    "in document order, dropping repetition but keeping the facts that matter. No preamble."
+)
+
+# content hash -> summary; keyed on the model too, so switching models doesn't serve another model's words
+summary_cache = make_cache(SUMMARY_CACHE_TTL_SEC, SUMMARY_CACHE_MAX_ENTRIES, SUMMARY_CACHE_PATH, table="summaries")
+
+
+@functools.lru_cache(maxsize=None)
+def _executor() -> ThreadPoolExecutor:
+    # One pool per process: the concurrency bound holds across sessions, not per document
+    return ThreadPoolExecutor(max_workers=max(1, SUMMARY_CONCURRENCY), thread_name_prefix="summarize")
+
+
+class SummaryStats:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.documents = 0
+        self.chunks = 0
+        self.calls = 0
+        self.cache_hits = 0
+        self.reduce_levels = 0
+
+    def add(self, **counts: int) -> None:
+        with self._lock:
+            for name, n in counts.items():
+                setattr(self, name, getattr(self, name) + n)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"documents": self.documents, "chunks": self.chunks, "calls": self.calls,
+                    "cache_hits": self.cache_hits, "reduce_levels": self.reduce_levels,
+                    "cache": summary_cache.stats()}
+
+
+summary_stats = SummaryStats()
+
+
+def _summary_key(kind: str, text: str) -> str:
+    return hashlib.sha256(f"{MODEL}\0{kind}\0{text}".encode("utf-8")).hexdigest()
+
+
+def _summarize(kind: str, text: str, session: str) -> str:
+    """One map/reduce step (runs on a summarize thread): cached, else one completion."""
+    key = _summary_key(kind, text)
+    cached = summary_cache.get(key)
+    if cached is not None:
+        summary_stats.add(cache_hits=1)
+        return cached
+    resp = chat([{"role": "system", "content": MAP_PROMPT if kind == "map" else REDUCE_PROMPT},
+                 {"role": "user", "content": text}],
+                tool_choice=None, temperature=0.0, max_tokens=SUMMARY_MAX_TOKENS, session=session)
+    summary_stats.add(calls=1)
+    out = (resp.choices[0].message.content or "").strip()
+    if out:
+        summary_cache.put(key, out)
+    return out
+
+
+def _run_all(kind: str, texts: List[str], session: str) -> List[str]:
+    futures = [_executor().submit(_summarize, kind, t, session) for t in texts]
+    return [f.result() for f in futures]
+
+
+def _groups(parts: List[str], max_chars: int) -> List[List[str]]:
+    """Runs of consecutive parts, each at most max_chars joined (and at least two parts when possible)."""
+    groups: List[List[str]] = [[]]
+    size = 0
+    for part in parts:
+        if groups[-1] and size + len(part) > max_chars and len(groups[-1]) > 1:
+            groups.append([])
+            size = 0
+        groups[-1].append(part)
+        size += len(part) + 2
+    return groups
+
+
+def needs_map_reduce(text: str, max_chars: int) -> bool:
+    return SUMMARIZE_LONG_PAGES and len(text) > max(max_chars, SUMMARY_CHUNK_CHARS)
+
+
+def document_chunks(text: str) -> List[str]:
+    """Map inputs: ~SUMMARY_CHUNK_CHARS each, larger when that would exceed SUMMARY_MAX_CHUNKS."""
+    return split_chunks(text, max(SUMMARY_CHUNK_CHARS, len(text) // max(1, SUMMARY_MAX_CHUNKS) + 1))
+
+
+def summarize_document(text: str, session: str = "") -> str:
+    """
+    Partial summaries of the whole of `text`, reduced until they fit SUMMARY_REDUCE_CHARS,
+    joined in document order. Blocking (call it off the event loop); raises on LLM errors.
+    """
+    chunks = document_chunks(text)
+    summary_stats.add(documents=1, chunks=len(chunks))
+    parts = [p for p in _run_all("map", chunks, session) if p]
+
+    for _level in range(MAX_REDUCE_LEVELS):
+        if len(parts) <= 1 or sum(len(p) + 2 for p in parts) <= SUMMARY_REDUCE_CHARS:
+            break
+        groups = _groups(parts, SUMMARY_CHUNK_CHARS)
+        if len(groups) == len(parts):  # nothing left to merge
+            break
+        summary_stats.add(reduce_levels=1)
+        parts = [p for p in _run_all("reduce", ["\n\n".join(g) for g in groups], session) if p]
+    return "\n\n".join(f"[Part {i}/{len(parts)}]\n{p}" for i, p in enumerate(parts, 1)) if len(parts) > 1 \
+        else (parts[0] if parts else "")
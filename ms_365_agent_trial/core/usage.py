@@ -0,0 +1,192 @@
+# core/usage.py
+"""
+Token accounting + throughput telemetry for every completion.
+
+chat() reports each call here: token usage (prompt / completion / cached), and
+for streams time-to-first-token (TTFT) and decode rate (completion tokens per
+second after the first token). Aggregates per model and per session (the
+USAGE_MAX_SESSIONS most recently active) are served on /metrics; every call is
+also appended to a rolling JSONL log for offline capacity planning
+(USAGE_LOG_PATH, "" to disable).
+"""
+import json
+import logging
+import math
+import os
+import statistics
+import threading
+import time
+from collections import OrderedDict, deque
+from logging.handlers import RotatingFileHandler
+from typing import Any, Deque, Dict, Optional
+
+from core.prompt import cached_tokens
+
+USAGE_LOG_PATH = os.getenv("USAGE_LOG_PATH", "logs/usage.jsonl")
+if USAGE_LOG_PATH and os.getenv("WORKER_ID"):
+    # one file per serve.py worker: rotating one file from several processes isn't safe
+    _root, _ext = os.path.splitext(USAGE_LOG_PATH)
+    USAGE_LOG_PATH = f"{_root}.w{os.environ['WORKER_ID']}{_ext}"
+USAGE_LOG_MAX_BYTES = int(os.getenv("USAGE_LOG_MAX_BYTES", str(5 * 1024 * 1024)))
+USAGE_LOG_BACKUPS = int(os.getenv("USAGE_LOG_BACKUPS", "3"))
+USAGE_MAX_SESSIONS = int(os.getenv("USAGE_MAX_SESSIONS", "1000"))  # least recently active dropped first
+_SAMPLES = 500  # recent TTFT / decode-rate samples kept per model for percentiles
+
+
+def _tokens(usage: Any, field: str) -> int:
+    return int(getattr(usage, field, 0) or 0) if usage is not None else 0
+
+
+class _Totals:
+    def __init__(self) -> None:
+        self.requests = 0
+        self.streams = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+        self.estimated = 0  # streams where the backend sent no usage (completion tokens ~ chunk count)
+        self.cancelled = 0  # streams closed early (their usage is partial)
+        self.errored = 0  # streams that failed upstream mid-way (partial too)
+        self.stream_completion_tokens = 0  # completion tokens over finished streams
+        self.decode_tokens = 0
+        self.decode_sec = 0.0
+        self.ttft_ms: Deque[float] = deque(maxlen=_SAMPLES)
+
+    def add(self, row: Dict[str, Any]) -> None:
+        self.requests += 1
+        self.prompt_tokens += row["prompt_tokens"]
+        self.completion_tokens += row["completion_tokens"]
+        self.cached_tokens += row["cached_tokens"]
+        self.estimated += int(row["estimated"])
+        if row["stream"]:
+            self.streams += 1
+            if row.get("cancelled"):
+                self.cancelled += 1
+            elif row.get("errored"):
+                self.errored += 1
+            else:
+                self.stream_completion_tokens += row["completion_tokens"]
+        if row["ttft_ms"] is not None:
+            self.ttft_ms.append(row["ttft_ms"])
+        if row["decode_tok_per_sec"] is not None:
+            self.decode_tokens += row["completion_tokens"] - 1
+            self.decode_sec += row["decode_sec"]
+
+    def summary(self) -> Dict[str, Any]:
+        ttft = sorted(self.ttft_ms)
+        return {
+            "requests": self.requests,
+            "streams": self.streams,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_tokens": self.cached_tokens,
+            "estimated_usage": self.estimated,
+            "cancelled": self.cancelled,
+            "errored": self.errored,
+            "ttft_ms_p50": round(statistics.median(ttft), 1) if ttft else None,
+            "ttft_ms_p95": round(ttft[math.ceil(0.95 * len(ttft)) - 1], 1) if ttft else None,  # nearest rank
+            "decode_tok_per_sec": round(self.decode_tokens / self.decode_sec, 1) if self.decode_sec else None,
+        }
+
+
+class UsageTracker:
+    def __init__(self, log_path: str = USAGE_LOG_PATH, max_sessions: int = USAGE_MAX_SESSIONS) -> None:
+        self._lock = threading.Lock()
+        self._models: Dict[str, _Totals] = {}
+        self._sessions: "OrderedDict[str, _Totals]" = OrderedDict()
+        self.max_sessions = max_sessions
+        # streams closed early (client gone): tokens we stopped paying for, estimated from
+        # the model's average completion length minus what had already streamed
+        self.cancelled_streams = 0
+        self.tokens_saved_est = 0
+        self._log_path = log_path
+        self._log: Optional[logging.Logger] = None
+
+    def _logger(self) -> Optional[logging.Logger]:
+        if self._log is None and self._log_path:
+            os.makedirs(os.path.dirname(self._log_path) or ".", exist_ok=True)
+            handler = RotatingFileHandler(self._log_path, maxBytes=USAGE_LOG_MAX_BYTES,
+                                          backupCount=USAGE_LOG_BACKUPS, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            log = logging.getLogger("m365.usage")
+            log.setLevel(logging.INFO)
+            log.propagate = False
+            log.addHandler(handler)
+            self._log = log
+        return self._log
+
+    def record(self, model: str, usage: Any, session: str = "", stream: bool = False,
+               duration_sec: float = 0.0, ttft_sec: Optional[float] = None,
+               chunks: int = 0, cancelled: bool = False, errored: bool = False) -> Dict[str, Any]:
+        """
+        Record one completion. For streams, pass `ttft_sec` (request -> first token)
+        and `chunks` (content chunks seen: the completion-token estimate when the
+        backend didn't send usage). `cancelled`: we closed it early; `errored`: it
+        failed upstream before finishing.
+        """
+        completion = _tokens(usage, "completion_tokens")
+        estimated = usage is None and chunks > 0
+        if estimated:
+            completion = chunks
+        # decode rate: tokens after the first one over the time after the first one
+        decode_sec = max(duration_sec - ttft_sec, 0.0) if ttft_sec is not None else 0.0
+        decode_rate = (completion - 1) / decode_sec if completion > 1 and decode_sec > 0 else None
+        row = {
+            "ts": round(time.time(), 3),
+            "model": model,
+            "session": session,
+            "stream": stream,
+            "prompt_tokens": _tokens(usage, "prompt_tokens"),
+            "completion_tokens": completion,
+            "cached_tokens": cached_tokens(usage),
+            "estimated": estimated,
+            "cancelled": cancelled,
+            "errored": errored,
+            "duration_ms": round(duration_sec * 1000, 1),
+            "ttft_ms": round(ttft_sec * 1000, 1) if ttft_sec is not None else None,
+            "decode_sec": round(decode_sec, 4),
+            "decode_tok_per_sec": round(decode_rate, 1) if decode_rate is not None else None,
+        }
+        with self._lock:
+            self._models.setdefault(model, _Totals()).add(row)
+            if session:
+                totals = self._sessions.get(session)
+                if totals is None:
+                    totals = self._sessions[session] = _Totals()
+                    if len(self._sessions) > self.max_sessions:
+                        self._sessions.popitem(last=False)
+                else:
+                    self._sessions.move_to_end(session)
+                totals.add(row)
+            log = self._logger()
+        if log is not None:
+            log.info(json.dumps(row, ensure_ascii=False))
+        return row
+
+    def record_cancelled(self, model: str, streamed_tokens: int) -> int:
+        """
+        Count a stream closed before it finished; returns the estimated tokens saved.
+        Call before record(..., cancelled=True), which counts it on the model and session.
+        """
+        with self._lock:
+            totals = self._models.get(model)
+            finished = totals.streams - totals.cancelled - totals.errored if totals else 0
+            avg = (totals.stream_completion_tokens / finished) if totals and finished else 0.0
+            saved = max(int(avg) - streamed_tokens, 0)
+            self.cancelled_streams += 1
+            self.tokens_saved_est += saved
+            return saved
+
+    def stats(self, sessions: bool = True) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = {
+                "models": {m: t.summary() for m, t in self._models.items()},
+                "cancelled_streams": self.cancelled_streams,
+                "tokens_saved_est": self.tokens_saved_est,
+            }
+            if sessions:
+                out["sessions"] = {s: t.summary() for s, t in self._sessions.items()}
+            return out
+
+
+usage_tracker = UsageTracker()
@@ -1,98 +1,122 @@
 # repl.py
+"""
+Terminal front end for the same engine the web host runs (core/engine.py):
+URL prefetch, one tool round (fetch / crawl / search_fetched, run off the event
+loop), then the answer streamed token by token as it arrives. History is kept
+across turns (bounded by HISTORY_MAX_TURNS) until /reset.
+
+    python repl.py              # streaming
+    python repl.py --no-stream  # one complete reply per turn (REPL_STREAMING=0)
+"""
+import argparse
+import asyncio
+import importlib
 import os
-import json
-from typing import List, Dict, Any
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
 
 from dotenv import load_dotenv
-from core.lite_llm_model import chat
-from tools.fetch_and_summarize import TOOL_SPEC, run as run_fetch
 
 load_dotenv()
 
-SYSTEM_PROMPT = os.getenv(
-    "SYSTEM_PROMPT",
-    "You are a helpful, concise assistant. Use tools when they help.",
-)
+REPL_STREAMING = os.getenv("REPL_STREAMING", "1") == "1"
+# The engine (openai client, webfetch, bs4...) is imported in the background while you
+# type the first message; FAST_STARTUP=0 imports it before the prompt instead.
+FAST_STARTUP = os.getenv("FAST_STARTUP", "1") == "1"
+PREVIEW_CHARS = 120
+
+
+class TerminalStreamer:
+    """Prints engine events: tool start/end lines, then the answer as tokens arrive."""
+
+    def __init__(self) -> None:
+        self.parts: List[str] = []
+
+    @property
+    def text(self) -> str:
+        return "".join(self.parts)
+
+    async def emit(self, event: str, data: Dict[str, Any]) -> None:
+        if event == "token":
+            if not self.parts:
+                print("assistant > ", end="", flush=True)
+            self.parts.append(data.get("delta", ""))
+            print(data.get("delta", ""), end="", flush=True)
+        elif event == "tool" and data.get("phase") == "start":
+            print(f"[tool] {data.get('name')} start: {data.get('args')}", flush=True)
+        elif event == "tool" and data.get("phase") == "end":
+            preview = " ".join((data.get("preview") or "").split())[:PREVIEW_CHARS]
+            print(f"[tool] {data.get('name')} end: {data.get('chars', 0)} chars  {preview}", flush=True)
 
-TOOLS: List[Dict[str, Any]] = [TOOL_SPEC]
 
+def _turn(loop: asyncio.AbstractEventLoop, engine, sid: str, text: str, streaming: bool) -> None:
+    prefetches = engine.prefetch_urls(text)  # downloads overlap the probe round trip
+    messages = engine.build_messages(sid, text)
+    streamer = TerminalStreamer()
+    if streaming:
+        task = loop.create_task(engine.handle_engine_turn_streaming(streamer.emit, messages, sid))
+    else:
+        task = loop.create_task(engine.handle_engine_turn_oneshot(messages, sid))
+    try:
+        reply = loop.run_until_complete(task)
+        if not streaming:
+            print(f"assistant > {reply}", end="")
+    except KeyboardInterrupt:
+        # Ctrl-C mid-answer: the engine closes the upstream stream; keep what was shown (nothing before the first token)
+        task.cancel()
+        loop.run_until_complete(asyncio.gather(task, return_exceptions=True))
+        for fut in prefetches:
+            fut.cancel()
+        reply = streamer.text
+        print(" [interrupted]", end="")
+    print("\n")
+    engine.append_turn(sid, text, reply)
 
-def main():
-    print("Microsoft 365 Agent (SDK-backed engine) – interactive mode")
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--no-stream", dest="stream", action="store_false", default=REPL_STREAMING,
+                    help="print each reply when it is complete")
+    args = ap.parse_args()
+
+    loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="engine-import")
+    pending_engine = loader.submit(importlib.import_module, "core.engine")
+    # then open the backend connections, so the first answer doesn't wait on DNS/TLS
+    loader.submit(lambda: importlib.import_module("core.lite_llm_model").connection_warmer().start())
+    if not FAST_STARTUP:
+        pending_engine.result()
+
+    # One loop for the whole session: the engine's single-flight and stream pumps live on it
+    loop = asyncio.new_event_loop()
+    sid = os.getenv("SESSION_ID", "repl-" + uuid.uuid4().hex[:8])
+    print("Microsoft 365 Agent (SDK-backed engine) – interactive mode" + ("" if args.stream else " (no streaming)"))
     print("Commands: /exit  /reset\n")
-    while True:
-        try:
-            user = input("you > ").strip()
-        except (EOFError, KeyboardInterrupt):
-            print("\nbye!")
-            break
-
-        if not user:
-            continue
-        if user in {"/exit", "/quit"}:
-            print("bye!")
-            break
-        if user in {"/reset", "/r"}:
-            print("↺ (stateless sample) nothing to reset.\n")
-            continue
-
-        messages: List[Dict[str, Any]] = [
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": user},
-        ]
-
-        # 1) Probe for tool usage
-        resp = chat(messages, tools=TOOLS, tool_choice="auto", stream=False)
-        choice = resp.choices[0]
-        msg = choice.message
-
-        if msg.tool_calls:
-            messages.append({
-                "role": "assistant",
-                "content": msg.content or "",
-                "tool_calls": [
-                    {
-                        "id": tc.id,
-                        "type": tc.type,
-                        "function": {
-                            "name": tc.function.name,
-                            "arguments": tc.function.arguments,
-                        }
-                    } for tc in msg.tool_calls
-                ],
-            })
-
-            for tc in msg.tool_calls:
-                if tc.function.name == "fetch_and_summarize":
-                    try:
-                        args = json.loads(tc.function.arguments or "{}")
-                    except json.JSONDecodeError:
-                        args = {}
-                    print(f"[tool] fetch_and_summarize start: {args}")
-                    out = run_fetch(
-                        url=args.get("url", ""),
-                        timeout_sec=int(args.get("timeout_sec", 10)),
-                        max_chars=int(args.get("max_chars", 6000)),
-                    )
-                    print(f"[tool] fetch_and_summarize end: {len(out)} chars\n")
-                    messages.append({
-                        "role": "tool",
-                        "tool_call_id": tc.id,
-                        "name": "fetch_and_summarize",
-                        "content": out,
-                    })
-                else:
-                    messages.append({
-                        "role": "tool",
-                        "tool_call_id": tc.id,
-                        "name": tc.function.name,
-                        "content": "ERROR: unknown tool",
-                    })
-
-            final = chat(messages, tools=TOOLS, tool_choice="auto", stream=False)
-            print(f"assistant > {final.choices[0].message.content or ''}\n")
-        else:
-            print(f"assistant > {msg.content or ''}\n")
+    try:
+        while True:
+            try:
+                user = input("you > ").strip()
+            except (EOFError, KeyboardInterrupt):
+                print("\nbye!")
+                break
+
+            if not user:
+                continue
+            if user in {"/exit", "/quit"}:
+                print("bye!")
+                break
+            engine = pending_engine.result()  # waits only if the background import is still running
+            if user in {"/reset", "/r"}:
+                engine.reset_session(sid)
+                print("↺ history and fetched pages cleared.\n")
+                continue
+
+            try:
+                _turn(loop, engine, sid, user, args.stream)
+            except Exception as e:
+                print(f"\n[error] {type(e).__name__}: {e}\n")
+    finally:
+        loop.close()
 
 
 if __name__ == "__main__":
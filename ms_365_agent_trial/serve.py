@@ -0,0 +1,180 @@
+# serve.py
+"""
+Multi-process launcher for app.py: N workers on one port, one core each.
+
+    python serve.py --workers 4            # default: one worker per CPU
+    kill -HUP  <launcher pid>              # graceful reload: new workers up first, then old ones drain
+    kill -TERM <launcher pid>              # drain everything and stop (Ctrl-C does the same)
+
+Workers share conversations, the page cache and chunk summaries through sqlite
+files in --state-dir (SESSION_STORE_PATH / FETCH_CACHE_PATH / SUMMARY_CACHE_PATH),
+so a follow-up can land on any worker. Two ways to share the port:
+  reuseport  every worker binds with SO_REUSEPORT; the kernel balances new connections (Linux default)
+  shared     the launcher binds once and workers inherit the listening socket (accept-queue sharing)
+Workers are fresh interpreters, so a reload also picks up code changes. A worker
+that dies unexpectedly is restarted.
+"""
+import argparse
+import os
+import select
+import signal
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+HERE = Path(__file__).resolve().parent
+
+
+class Worker:
+    def __init__(self, worker_id: int, proc: subprocess.Popen, ready_fd: int) -> None:
+        self.id = worker_id
+        self.proc = proc
+        self.ready_fd = ready_fd  # read end of the pipe the worker writes to once listening
+        self.ready = False
+        self.draining_since: Optional[float] = None
+
+
+class Launcher:
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.args = args
+        self.workers: List[Worker] = []
+        self.next_id = 0
+        self.listen_sock: Optional[socket.socket] = None
+        self.reload_requested = False
+        self.stop_requested = False
+
+        state = Path(args.state_dir).resolve()
+        state.mkdir(parents=True, exist_ok=True)
+        self.env: Dict[str, str] = {
+            **os.environ,
+            "HOST": args.host,
+            "PORT": str(args.port),
+            "DRAIN_TIMEOUT_SEC": str(args.drain_timeout),
+            "SESSION_STORE_PATH": os.getenv("SESSION_STORE_PATH", str(state / "sessions.sqlite")),
+            "FETCH_CACHE_PATH": os.getenv("FETCH_CACHE_PATH", str(state / "fetch_cache.sqlite")),
+            "SUMMARY_CACHE_PATH": os.getenv("SUMMARY_CACHE_PATH", str(state / "summary_cache.sqlite")),
+            # one process per core already; a parse pool in every worker would oversubscribe the CPUs
+            "PARSE_POOL_WORKERS": os.getenv("PARSE_POOL_WORKERS", "0"),
+            "PYTHONUNBUFFERED": "1",
+        }
+        if args.mode == "shared":
+            self.listen_sock = socket.create_server((args.host, args.port), backlog=2048, reuse_port=False)
+            self.listen_sock.set_inheritable(True)
+        else:
+            self.env["REUSE_PORT"] = "1"
+
+    # --- workers
+    def spawn(self) -> Worker:
+        read_fd, write_fd = os.pipe()
+        env = {**self.env, "WORKER_ID": str(self.next_id), "READY_FD": str(write_fd)}
+        pass_fds = [write_fd]
+        if self.listen_sock is not None:
+            env["LISTEN_FD"] = str(self.listen_sock.fileno())
+            pass_fds.append(self.listen_sock.fileno())
+        proc = subprocess.Popen([sys.executable, str(HERE / "app.py")], cwd=HERE, env=env, pass_fds=pass_fds)
+        os.close(write_fd)
+        worker = Worker(self.next_id, proc, read_fd)
+        self.next_id += 1
+        self.workers.append(worker)
+        return worker
+
+    def wait_ready(self, workers: List[Worker], timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        pending = {w.ready_fd: w for w in workers if not w.ready}
+        while pending and time.monotonic() < deadline:
+            readable, _, _ = select.select(list(pending), [], [], 0.2)
+            for fd in readable:
+                worker = pending.pop(fd)
+                worker.ready = bool(os.read(fd, 1))
+                self._close_ready_fd(worker)
+            for fd, worker in list(pending.items()):
+                if worker.proc.poll() is not None:  # died during startup
+                    pending.pop(fd)
+                    self._close_ready_fd(worker)
+        return all(w.ready for w in workers)
+
+    @staticmethod
+    def _close_ready_fd(worker: Worker) -> None:
+        if worker.ready_fd >= 0:
+            os.close(worker.ready_fd)
+            worker.ready_fd = -1
+
+    def drain(self, workers: List[Worker]) -> None:
+        for worker in workers:
+            if worker.draining_since is None and worker.proc.poll() is None:
+                worker.draining_since = time.monotonic()
+                worker.proc.send_signal(signal.SIGTERM)  # aiohttp: stop accepting, finish in-flight requests
+
+    # --- lifecycle
+    def reload(self) -> None:
+        old = [w for w in self.workers if w.draining_since is None]
+        new = [self.spawn() for _ in range(self.args.workers)]
+        if self.wait_ready(new, self.args.ready_timeout):
+            print(f"[serve] reload: {len(new)} new workers ready, draining {len(old)}", flush=True)
+            self.drain(old)
+        else:
+            print("[serve] reload: new workers failed to start; keeping the old ones", flush=True)
+            self.drain(new)
+
+    def reap(self) -> None:
+        for worker in list(self.workers):
+            code = worker.proc.poll()
+            if code is None:
+                if worker.draining_since is not None and \
+                        time.monotonic() - worker.draining_since > self.args.drain_timeout + 5:
+                    worker.proc.kill()  # stuck while draining
+                continue
+            self.workers.remove(worker)
+            self._close_ready_fd(worker)
+            if worker.draining_since is None and not self.stop_requested:
+                print(f"[serve] worker {worker.id} exited ({code}); restarting", flush=True)
+                self.spawn()
+
+    def run(self) -> int:
+        signal.signal(signal.SIGHUP, lambda *_: setattr(self, "reload_requested", True))
+        signal.signal(signal.SIGTERM, lambda *_: setattr(self, "stop_requested", True))
+        signal.signal(signal.SIGINT, lambda *_: setattr(self, "stop_requested", True))
+
+        first = [self.spawn() for _ in range(self.args.workers)]
+        ok = self.wait_ready(first, self.args.ready_timeout)
+        print(f"[serve] {sum(w.ready for w in first)}/{len(first)} workers on http://{self.args.host}:{self.args.port} "
+              f"({self.args.mode}); pid {os.getpid()}", flush=True)
+        if not ok and not any(w.ready for w in first):
+            self.stop_requested = True
+
+        while not self.stop_requested:
+            if self.reload_requested:
+                self.reload_requested = False
+                self.reload()
+            self.reap()
+            time.sleep(0.2)
+
+        self.drain(self.workers)
+        while self.workers:
+            self.reap()
+            time.sleep(0.1)
+        if self.listen_sock is not None:
+            self.listen_sock.close()
+        return 0
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--host", default=os.getenv("HOST", "127.0.0.1"))
+    ap.add_argument("--port", type=int, default=int(os.getenv("PORT", "3978")))
+    ap.add_argument("--mode", choices=["reuseport", "shared"],
+                    default="reuseport" if hasattr(socket, "SO_REUSEPORT") else "shared")
+    ap.add_argument("--state-dir", default=os.getenv("STATE_DIR", ".state"),
+                    help="where the shared sessions / page-cache / summary-cache sqlite files live")
+    ap.add_argument("--drain-timeout", type=float, default=float(os.getenv("DRAIN_TIMEOUT_SEC", "30")),
+                    help="seconds a stopping worker gets to finish in-flight turns")
+    ap.add_argument("--ready-timeout", type=float, default=30.0)
+    return Launcher(ap.parse_args()).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,38 +1,75 @@
+"""
+fetch_and_summarize for the M365 engine: OpenAI-style TOOL_SPEC + run().
+crawl_and_extract (CRAWL_TOOL_SPEC + run_crawl()) for answers spread over several
+pages of one site: a bounded crawl from a start URL, ranked and merged.
+
+The fetching, caching, decoding and two-pass extraction live in the shared
+../webfetch library (used by every stack), so improvements land everywhere.
+"""
 from __future__ import annotations
-import re
-from urllib.parse import urlparse
-from typing import Dict, Any, Optional
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional
 
-import requests
-from bs4 import BeautifulSoup, UnicodeDammit
+# Shared fetch-and-extract library lives at the repo root
+_REPO_ROOT = str(Path(__file__).resolve().parents[2])
+if _REPO_ROOT not in sys.path:
+    sys.path.insert(0, _REPO_ROOT)
 
-# How much text we aim for before truncation
-DEFAULT_MAX_CHARS = 10_000
-MIN_REASONABLE_CHARS = 1_200  # if below, use aggressive fallback extraction
+from webfetch import DEFAULT_MAX_CHARS, fetch
+from webfetch.adapters import tool_spec
+from webfetch.crawl import CRAWL_MAX_CHARS, CRAWL_MAX_DEPTH, CRAWL_MAX_PAGES, crawl_and_extract
+from webfetch.transport import download_observers
+from core.recorder import recorder
 
-TOOL_SPEC: Dict[str, Any] = {
+TOOL_SPEC: Dict[str, Any] = tool_spec("fetch_and_summarize", default_max_chars=DEFAULT_MAX_CHARS)
+
+CRAWL_TOOL_SPEC: Dict[str, Any] = {
     "type": "function",
     "function": {
-        "name": "fetch_and_summarize",
-        "description": "Fetch a public web page and return cleaned/plain text for summarization.",
+        "name": "crawl_and_extract",
+        "description": (
+            "Crawl a site from a start URL, following its links a few levels deep, and return the passages "
+            "most relevant to the question from all pages found. Use it when the answer is likely spread "
+            "over several pages of one site (docs, handbooks, wikis); for one known page use fetch_and_summarize."
+        ),
         "parameters": {
             "type": "object",
             "properties": {
                 "url": {
                     "type": "string",
-                    "description": "The full URL to fetch (http/https).",
+                    "description": "Start page (http/https).",
+                },
+                "query": {
+                    "type": "string",
+                    "description": "The user's question; passages are ranked against it across all pages.",
+                },
+                "max_depth": {
+                    "type": "integer",
+                    "description": "How many links away from the start page to go (default: 1).",
+                    "minimum": 0,
+                    "maximum": CRAWL_MAX_DEPTH,
                 },
-                "timeout_sec": {
+                "max_pages": {
                     "type": "integer",
-                    "description": "HTTP timeout in seconds (default: 12).",
+                    "description": "Most pages to fetch, start page included (default: 10).",
                     "minimum": 1,
-                    "maximum": 60,
+                    "maximum": CRAWL_MAX_PAGES,
+                },
+                "same_origin": {
+                    "type": "boolean",
+                    "description": "Only follow links to the start page's scheme and host (default: true).",
+                },
+                "path_prefix": {
+                    "type": "string",
+                    "description": "Only follow links whose path starts with this, e.g. \"/docs/\" (optional).",
                 },
                 "max_chars": {
                     "type": "integer",
-                    "description": f"Truncate cleaned text to this many characters (default: {DEFAULT_MAX_CHARS}).",
-                    "minimum": 500,
-                    "maximum": 100_000,
+                    "description": f"Character budget for the merged text (default: {CRAWL_MAX_CHARS}).",
+                    "minimum": 1000,
+                    "maximum": 50_000,
                 },
             },
             "required": ["url"],
@@ -41,133 +78,55 @@ TOOL_SPEC: Dict[str, Any] = {
     },
 }
 
-def _normalize_url(u: str) -> str:
-    """
-    Correct common URL typos:
-      - https.www.example.com  -> https://www.example.com
-      - https//example.com     -> https://example.com
-      - https:/example.com     -> https://example.com
-      - www.example.com        -> https://www.example.com
-      - https://https.www.x    -> https://www.x
-    """
-    if not u:
-        return u
-    u = u.strip().strip('"\'')
-
-    # Remove spaces
-    u = u.replace(" ", "")
-
-    # Fix missing colon or slash variations
-    u = re.sub(r'^(https?)(//)(?!/)', r'\1://', u)        # https//x -> https://x
-    u = re.sub(r'^(https?):/([^/])', r'\1://\2', u)       # https:/x  -> https://x
 
-    # Fix "https.www..." or "http.www..."
-    u = re.sub(r'^(https?)\.(?=[^/])', r'\1://', u)       # https.www -> https://www
+def _record_page(url: str, page, elapsed_sec: float) -> None:
+    # raw bytes (base64) so a replay goes through decode + parse exactly like the original fetch
+    recorder.record("page", url=url, final_url=page.url, status=page.status, content_type=page.content_type,
+                    truncated=page.truncated, elapsed_sec=round(elapsed_sec, 4), body=page.content)
 
-    # If it starts with www., prepend https://
-    if u.startswith("www."):
-        u = "https://" + u
 
-    # If still missing a scheme, default to https://
-    if not re.match(r'^[a-zA-Z][a-zA-Z0-9+.-]*://', u):
-        u = "https://" + u
+if recorder.enabled:
+    download_observers.append(_record_page)
 
-    # Collapse accidental double scheme like "https://https.www..."
-    u = u.replace("https://https.", "https://").replace("http://http.", "http://")
 
-    # Final sanity via urlparse; if netloc is still empty, try treating path as host
-    p = urlparse(u)
-    if not p.netloc:
-        if p.path:
-            candidate = "https://" + p.path
-            p2 = urlparse(candidate)
-            if p2.netloc:
-                return candidate
-    return u
-
-def _decode_html(content: bytes, declared_encoding: Optional[str]) -> str:
+def run(url: str = "", timeout_sec: int = 12, max_chars: int = DEFAULT_MAX_CHARS,
+        urls: Optional[List[str]] = None, query: str = "", ranked_chars: Optional[int] = None,
+        documents: Optional[Dict[str, str]] = None) -> str:
     """
-    Use UnicodeDammit to robustly decode HTML bytes (fixes stray Â, smart quotes, etc.).
+    Fetch the page at `url` (and/or every page in `urls`, concurrently), return
+    cleaned plain text within max_chars: the passages most relevant to `query`
+    when given (within `ranked_chars`, when set), else the head of the page.
+    The full text of each page is put in `documents` when given.
+    Errors come back as "ERROR: ..." text.
     """
-    if declared_encoding:
-        try:
-            return content.decode(declared_encoding, errors="replace")
-        except Exception:
-            pass
-    dammit = UnicodeDammit(content, is_html=True)
-    return dammit.unicode_markup or content.decode("utf-8", errors="replace")
-
-def _visible_text_first_pass(soup: BeautifulSoup) -> str:
+    if not recorder.enabled:
+        return fetch(url, urls, timeout_sec, max_chars, query, ranked_chars, documents)
+    started = time.perf_counter()
+    out = fetch(url, urls, timeout_sec, max_chars, query, ranked_chars, documents)
+    recorder.record("tool", name="fetch_and_summarize",
+                    args={"url": url, "urls": urls, "timeout_sec": timeout_sec, "max_chars": max_chars, "query": query,
+                          "ranked_chars": ranked_chars},
+                    duration_sec=round(time.perf_counter() - started, 4), result_chars=len(out),
+                    error=out if out.startswith("ERROR:") else None)
+    return out
+
+
+def run_crawl(url: str = "", query: str = "", max_depth: int = 1, max_pages: int = 10, same_origin: bool = True,
+              path_prefix: str = "", max_chars: int = CRAWL_MAX_CHARS, timeout_sec: int = 12,
+              documents: Optional[Dict[str, str]] = None) -> str:
     """
-    Prefer textual content from main content selectors; keep <noscript>.
+    Crawl from `url` (bounded by depth / page count / origin), return the merged text
+    of the pages found, ranked against `query`. The full text of the pages that
+    returned text is put in `documents` (by URL) when given. Errors come back as
+    "ERROR: ..." text.
     """
-    # Remove obviously non-content tags (keep <noscript>)
-    for tag in soup(["script", "style", "svg", "iframe", "canvas", "form"]):
-        tag.decompose()
-
-    # Remove site chrome if present
-    for sel in ["header", "footer", "nav", "[role=navigation]", ".cookie", ".cookie-banner", ".consent"]:
-        for t in soup.select(sel):
-            t.decompose()
-
-    root = soup.find(["main", "article"]) or soup.body or soup
-    # Collect headings + paragraphs + list items
-    chunks = [el.get_text(" ", strip=True) for el in root.select("h1,h2,h3,p,li") if el.get_text(strip=True)]
-    text = "\n".join(chunks)
-
-    # Collapse excessive blank lines
-    text = re.sub(r"\n{3,}", "\n\n", text)
-    return text.strip()
-
-def _aggressive_fallback(soup: BeautifulSoup) -> str:
-    """
-    Fallback: get as much visible text as possible from <body>.
-    """
-    body = soup.body or soup
-    text = body.get_text(separator="\n", strip=True)
-    text = re.sub(r"\n{3,}", "\n\n", text)
-    return text.strip()
-
-def run(url: str, timeout_sec: int = 12, max_chars: int = DEFAULT_MAX_CHARS) -> str:
-    """
-    Fetch the page at `url`, return cleaned plain text (truncated to max_chars).
-    Robust decoding + two-pass extraction yields enough text in one shot.
-    """
-    try:
-        norm = _normalize_url(url)
-        headers = {
-            "User-Agent": (
-                "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
-                "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
-            ),
-            "Accept-Language": "en-US,en;q=0.9",
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-        }
-        r = requests.get(norm, headers=headers, timeout=timeout_sec, allow_redirects=True)
-        r.raise_for_status()
-
-        # Robust decode (fixes mis-encoded chars like Â)
-        html = _decode_html(r.content, r.encoding or None)
-
-        # Parse and extract
-        soup = BeautifulSoup(html, "html.parser")
-        text = _visible_text_first_pass(soup)
-
-        if len(text) < MIN_REASONABLE_CHARS:
-            # Try aggressive fallback over full body text
-            text2 = _aggressive_fallback(soup)
-            # Choose the longer non-empty result
-            if len(text2) > len(text):
-                text = text2
-
-        # Final trim
-        cap = max_chars if max_chars and max_chars > 0 else DEFAULT_MAX_CHARS
-        if len(text) > cap:
-            text = text[:cap] + "…"
-
-        return text if text else "ERROR: No visible text found."
-
-    except requests.exceptions.RequestException as e:
-        return f"ERROR: HTTP request failed: {e}"
-    except Exception as e:
-        return f"ERROR: {e}"
+    started = time.perf_counter()
+    out = crawl_and_extract(url, query, max_depth, max_pages, same_origin, path_prefix, max_chars, timeout_sec,
+                            documents)
+    if recorder.enabled:
+        recorder.record("tool", name="crawl_and_extract",
+                        args={"url": url, "query": query, "max_depth": max_depth, "max_pages": max_pages,
+                              "same_origin": same_origin, "path_prefix": path_prefix, "max_chars": max_chars},
+                        duration_sec=round(time.perf_counter() - started, 4), result_chars=len(out),
+                        error=out if out.startswith("ERROR:") else None)
+    return out
@@ -0,0 +1,221 @@
+"""
+search_fetched: answer follow-up questions from pages already fetched in this session.
+
+After fetch_and_summarize runs, the page's FULL extracted text is kept in a
+per-session DocStore (passages + inverted index). The model can then call
+`search_fetched` to pull only the passages relevant to a follow-up question,
+with no network I/O and no re-fetch.
+"""
+from __future__ import annotations
+import math
+import os
+import sys
+import threading
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+# Shared fetch-and-extract library lives at the repo root
+_REPO_ROOT = str(Path(__file__).resolve().parents[2])
+if _REPO_ROOT not in sys.path:
+    sys.path.insert(0, _REPO_ROOT)
+
+from webfetch.extract import normalize_url
+from webfetch.rank import BM25_B, BM25_K1, GAP_MARK, split_chunks, tokenize
+
+DOCS_PER_SESSION = int(os.getenv("DOCS_PER_SESSION", "8"))  # oldest page dropped beyond this
+DOC_STORE_SESSIONS = int(os.getenv("DOC_STORE_SESSIONS", "200"))  # least recently used session dropped beyond this
+SEARCH_DEFAULT_MAX_CHARS = 4_000
+
+TOOL_SPEC: Dict[str, Any] = {
+    "type": "function",
+    "function": {
+        "name": "search_fetched",
+        "description": (
+            "Search the full text of pages already fetched earlier in this conversation and return "
+            "the passages relevant to a question. No network access: use it for follow-up questions "
+            "about a page instead of fetching it again."
+        ),
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "What to look for (the user's follow-up question).",
+                },
+                "url": {
+                    "type": "string",
+                    "description": "Only search this previously fetched page (optional).",
+                },
+                "max_chars": {
+                    "type": "integer",
+                    "description": f"Character budget for the passages (default: {SEARCH_DEFAULT_MAX_CHARS}).",
+                    "minimum": 500,
+                    "maximum": 20_000,
+                },
+            },
+            "required": ["query"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+class DocStore:
+    """
+    Full text of the pages fetched in one session, split into passages, with an
+    inverted index (term -> {passage id: term frequency}) for BM25 lookups.
+    Adding or dropping a page only touches that page's postings; passage ids
+    grow with every add, so sorting by id keeps document order per page.
+    Pages are keyed by normalize_url(), so "example.com", "https://Example.com/"
+    and "https://example.com/#top" are one page.
+    """
+
+    def __init__(self, max_docs: int = DOCS_PER_SESSION) -> None:
+        self.max_docs = max_docs
+        self._docs: "OrderedDict[str, List[int]]" = OrderedDict()  # url -> passage ids
+        self._passages: Dict[int, Tuple[str, str]] = {}  # id -> (url, text)
+        self._terms: Dict[int, List[str]] = {}  # id -> its distinct terms (to unindex it)
+        self._lengths: Dict[int, int] = {}
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._total_len = 0
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def _index(self, url: str, passages: List[str]) -> List[int]:
+        pids = []
+        for text in passages:
+            pid = self._next_id
+            self._next_id += 1
+            counts = Counter(tokenize(text))
+            self._passages[pid] = (url, text)
+            self._terms[pid] = list(counts)
+            self._lengths[pid] = sum(counts.values())
+            self._total_len += self._lengths[pid]
+            for term, tf in counts.items():
+                self._postings.setdefault(term, {})[pid] = tf
+            pids.append(pid)
+        return pids
+
+    def _unindex(self, pids: List[int]) -> None:
+        for pid in pids:
+            del self._passages[pid]
+            self._total_len -= self._lengths.pop(pid)
+            for term in self._terms.pop(pid):
+                postings = self._postings[term]
+                del postings[pid]
+                if not postings:
+                    del self._postings[term]
+
+    def add(self, url: str, text: str) -> None:
+        if not text or text.startswith("ERROR:"):
+            return
+        url = normalize_url(url)
+        passages = split_chunks(text)  # outside the lock: searches don't wait on tokenizing
+        with self._lock:
+            old = self._docs.pop(url, None)
+            if old:
+                self._unindex(old)
+            self._docs[url] = self._index(url, passages)
+            while len(self._docs) > self.max_docs:
+                self._unindex(self._docs.popitem(last=False)[1])
+
+    def urls(self) -> List[str]:
+        with self._lock:
+            return list(self._docs)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._unindex([pid for pids in self._docs.values() for pid in pids])
+            self._docs.clear()
+
+    def search(self, query: str, max_chars: int = SEARCH_DEFAULT_MAX_CHARS, url: str = "") -> List[Tuple[str, str]]:
+        """Best passages for `query` as (url, text), in document order, within `max_chars`."""
+        url = normalize_url(url) if url else ""
+        with self._lock:
+            n = len(self._passages)
+            if not n:
+                return []
+            avg_len = max(self._total_len / n, 1.0)
+            scores: Dict[int, float] = {}
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log1p((n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for pid, tf in postings.items():
+                    if url and self._passages[pid][0] != url:
+                        continue
+                    norm = BM25_K1 * (1.0 - BM25_B + BM25_B * self._lengths[pid] / avg_len)
+                    scores[pid] = scores.get(pid, 0.0) + idf * tf * (BM25_K1 + 1.0) / (tf + norm)
+
+            picked, used = [], 0
+            for pid in sorted(scores, key=lambda p: (-scores[p], p)):
+                cost = len(self._passages[pid][1]) + len(GAP_MARK)
+                if used + cost <= max_chars:
+                    picked.append(pid)
+                    used += cost
+            if scores and not picked:  # even the best passage is over budget: trim it
+                best = min(scores, key=lambda p: (-scores[p], p))
+                return [(self._passages[best][0], self._passages[best][1][:max_chars] + "…")]
+            return [self._passages[pid] for pid in sorted(picked)]
+
+
+# sid -> DocStore, least recently used first
+DOC_STORES: "OrderedDict[str, DocStore]" = OrderedDict()
+_STORES_LOCK = threading.Lock()
+
+
+def get_store(sid: str) -> Optional[DocStore]:
+    """This session's store, if it has one (marks it recently used)."""
+    with _STORES_LOCK:
+        store = DOC_STORES.get(sid)
+        if store is not None:
+            DOC_STORES.move_to_end(sid)
+        return store
+
+
+def store_for(sid: str) -> DocStore:
+    with _STORES_LOCK:
+        store = DOC_STORES.get(sid)
+        if store is None:
+            store = DOC_STORES[sid] = DocStore()
+            while len(DOC_STORES) > DOC_STORE_SESSIONS:
+                DOC_STORES.popitem(last=False)
+        else:
+            DOC_STORES.move_to_end(sid)
+        return store
+
+
+def forget(sid: str) -> None:
+    with _STORES_LOCK:
+        DOC_STORES.pop(sid, None)
+
+
+def remember(sid: str, documents: Dict[str, str]) -> None:
+    """Index the full text of just-fetched pages (url -> text, as the fetch returned it)."""
+    store = store_for(sid)
+    for url, text in documents.items():
+        if text:
+            store.add(url, text)
+
+
+def format_passages(hits: List[Tuple[str, str]]) -> str:
+    out: List[str] = []
+    last_url: Optional[str] = None
+    for url, text in hits:
+        if url != last_url:
+            out.append(f"### {url}")
+            last_url = url
+        out.append(text)
+    return "\n\n".join(out)
+
+
+def run(sid: str, query: str, url: str = "", max_chars: int = SEARCH_DEFAULT_MAX_CHARS) -> str:
+    store = get_store(sid)
+    if store is None or not store.urls():
+        return "ERROR: No pages have been fetched in this conversation yet; use fetch_and_summarize."
+    hits = store.search(query, max_chars=max_chars, url=url)
+    if not hits:
+        return f"No passages matched. Pages available: {', '.join(store.urls())}"
+    return format_passages(hits)
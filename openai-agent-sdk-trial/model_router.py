@@ -0,0 +1,238 @@
+# model_router.py
+"""
+Latency-aware model router for the OpenAI Agents SDK.
+
+`LatencyRouterModel` is a drop-in `Model` that wraps one `OpenAIChatCompletionsModel`
+per configured alias and, for every request:
+  - ranks the aliases by live EWMA latency, EWMA error rate and in-flight load,
+  - sends the request to the best one,
+  - fails over to the next alias on 429 / 5xx / connection errors
+    (only before the first streamed event, so nothing is ever emitted twice),
+  - parks a rate-limited alias for its Retry-After (or ROUTER_COOLDOWN_SEC), and
+    one failing with 5xx / connection errors for ROUTER_FAILURE_COOLDOWN_SEC.
+
+Latency is full call time for non-streamed runs. For streamed runs it is the time
+to the SDK's first event (`response.created`), which the SDK emits when upstream's
+first chunk arrives; that chunk may carry only the role, so this is not time to the
+first token. A stream is booked once, when it ends: a success, or a failure when it
+broke mid-way with 5xx / connection errors. Errors that say nothing about the
+alias's health (e.g. a 400 for a malformed request) are raised without touching
+its stats.
+Call `router.stats()` (or `/stats` in the REPL) to see the routing table.
+"""
+import os
+import random
+import time
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import openai
+from agents import Model, OpenAIChatCompletionsModel
+
+# --- Tunables (override in .env) ---
+EWMA_ALPHA = float(os.getenv("ROUTER_EWMA_ALPHA", "0.3"))            # weight of the newest sample
+ERROR_PENALTY = float(os.getenv("ROUTER_ERROR_PENALTY", "4.0"))      # score multiplier per unit error rate
+INFLIGHT_PENALTY_SEC = float(os.getenv("ROUTER_INFLIGHT_PENALTY_SEC", "0.25"))
+COOLDOWN_SEC = float(os.getenv("ROUTER_COOLDOWN_SEC", "20"))         # parking time after 429 without Retry-After
+FAILURE_COOLDOWN_SEC = float(os.getenv("ROUTER_FAILURE_COOLDOWN_SEC", "5"))  # parking time after 5xx / connection error
+UNMEASURED_ERROR_SEC = float(os.getenv("ROUTER_UNMEASURED_ERROR_SEC", "5"))  # latency charged per unit error rate
+                                                                             # to an alias that never succeeded
+EXPLORE_PROB = float(os.getenv("ROUTER_EXPLORE_PROB", "0.05"))       # occasionally refresh a non-best alias
+
+
+@dataclass
+class AliasStats:
+    """Live routing state for one alias."""
+    alias: str
+    model_id: str
+    ewma_latency: Optional[float] = None  # seconds; None until the first success
+    ewma_error: float = 0.0               # 0.0 (healthy) .. 1.0 (always failing)
+    requests: int = 0
+    successes: int = 0
+    failures: int = 0
+    failovers: int = 0                    # requests moved away from this alias
+    in_flight: int = 0
+    cooldown_until: float = 0.0           # time.monotonic() deadline
+    last_error: Optional[str] = None
+
+    def score(self, now: float) -> float:
+        """Lower is better. Unmeasured, error-free aliases score 0 so they get tried early."""
+        if now < self.cooldown_until:
+            return float("inf")
+        # Without a latency to scale, the error rate alone has to push a never-working alias down
+        latency = UNMEASURED_ERROR_SEC * self.ewma_error if self.ewma_latency is None else self.ewma_latency
+        return (latency + INFLIGHT_PENALTY_SEC * self.in_flight) * (1.0 + ERROR_PENALTY * self.ewma_error)
+
+
+def _ewma(prev: Optional[float], sample: float) -> float:
+    return sample if prev is None else (EWMA_ALPHA * sample + (1.0 - EWMA_ALPHA) * prev)
+
+
+def _failover_reason(exc: BaseException) -> Optional[str]:
+    """Return a short reason if `exc` should move the request to another alias, else None."""
+    if isinstance(exc, openai.RateLimitError):
+        return "429"
+    if isinstance(exc, openai.APIStatusError) and exc.status_code >= 500:
+        return str(exc.status_code)
+    if isinstance(exc, openai.APIConnectionError):  # includes APITimeoutError
+        return "connection"
+    return None
+
+
+def _retry_after_sec(exc: BaseException) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class LatencyRouterModel(Model):
+    """
+    Spread requests across several model aliases behind one proxy.
+
+    aliases: sequence of (alias, model_id) pairs, e.g. [("GPT5_CHAT", "azure/gpt-5-chat-eastus2"), ...]
+    openai_client: the shared AsyncOpenAI client. Its built-in retries are disabled for
+    routed calls so a 429 fails over immediately instead of sleeping on the same alias.
+    """
+
+    def __init__(self, aliases: Sequence[Tuple[str, str]], openai_client: openai.AsyncOpenAI):
+        if not aliases:
+            raise ValueError("LatencyRouterModel needs at least one (alias, model_id) pair.")
+        routed_client = openai_client.with_options(max_retries=0)
+        self._models: Dict[str, OpenAIChatCompletionsModel] = {}
+        self._stats: Dict[str, AliasStats] = {}
+        for alias, model_id in aliases:
+            self._models[alias] = OpenAIChatCompletionsModel(model=model_id, openai_client=routed_client)
+            self._stats[alias] = AliasStats(alias=alias, model_id=model_id)
+
+    # ------------------------------------------------------------------
+    # routing bookkeeping
+    # ------------------------------------------------------------------
+    def _plan(self) -> List[AliasStats]:
+        """Aliases in the order they should be tried for the next request."""
+        now = time.monotonic()
+        ranked = sorted(self._stats.values(), key=lambda s: s.score(now))
+        # Everything cooling down? Try them anyway, soonest-available first.
+        if all(s.score(now) == float("inf") for s in ranked):
+            ranked = sorted(ranked, key=lambda s: s.cooldown_until)
+        elif len(ranked) > 1 and random.random() < EXPLORE_PROB:
+            # Keep stats of the runners-up fresh: promote one of them for this request.
+            pick = random.randrange(1, len(ranked))
+            if ranked[pick].score(now) != float("inf"):
+                ranked.insert(0, ranked.pop(pick))
+        return ranked
+
+    def _begin(self, stats: AliasStats) -> float:
+        stats.requests += 1
+        stats.in_flight += 1
+        return time.perf_counter()
+
+    def _record_success(self, stats: AliasStats, latency: float) -> None:
+        stats.successes += 1
+        stats.ewma_latency = _ewma(stats.ewma_latency, latency)
+        stats.ewma_error = _ewma(stats.ewma_error, 0.0)
+
+    def _record_failure(self, stats: AliasStats, exc: BaseException, reason: str,
+                        failed_over: bool = True) -> None:
+        stats.failures += 1
+        stats.ewma_error = _ewma(stats.ewma_error, 1.0)
+        stats.last_error = f"{type(exc).__name__}: {reason}"
+        if reason == "429":
+            stats.cooldown_until = time.monotonic() + (_retry_after_sec(exc) or COOLDOWN_SEC)
+        else:
+            stats.cooldown_until = time.monotonic() + FAILURE_COOLDOWN_SEC
+        if failed_over:
+            stats.failovers += 1
+
+    # ------------------------------------------------------------------
+    # Model interface (arguments are passed through untouched so the router
+    # keeps working across Agents SDK signature changes)
+    # ------------------------------------------------------------------
+    async def get_response(self, *args, **kwargs):
+        last_exc: Optional[BaseException] = None
+        for stats in self._plan():
+            started = self._begin(stats)
+            try:
+                response = await self._models[stats.alias].get_response(*args, **kwargs)
+            except Exception as e:
+                reason = _failover_reason(e)
+                if reason is None:
+                    raise  # the request's fault, not the alias's
+                self._record_failure(stats, e, reason)
+                last_exc = e
+                continue
+            finally:
+                stats.in_flight -= 1
+            self._record_success(stats, time.perf_counter() - started)
+            return response
+        raise last_exc  # every alias failed over
+
+    async def stream_response(self, *args, **kwargs):
+        last_exc: Optional[BaseException] = None
+        for stats in self._plan():
+            started = self._begin(stats)
+            stream = self._models[stats.alias].stream_response(*args, **kwargs)
+            try:
+                # Fail over only until the first event: after that the caller has seen output.
+                try:
+                    first = await stream.__anext__()
+                except StopAsyncIteration:
+                    self._record_success(stats, time.perf_counter() - started)
+                    return
+                except Exception as e:
+                    reason = _failover_reason(e)
+                    if reason is None:
+                        raise
+                    self._record_failure(stats, e, reason)
+                    last_exc = e
+                    continue
+
+                # time to response.created (upstream's first chunk), not to the first token
+                latency = time.perf_counter() - started
+                healthy = True
+                try:
+                    yield first
+                    async for event in stream:
+                        yield event
+                except Exception as e:
+                    reason = _failover_reason(e)
+                    if reason is not None:  # broke mid-way: too late to fail over, but it counts
+                        healthy = False
+                        self._record_failure(stats, e, reason, failed_over=False)
+                    raise
+                finally:
+                    if healthy:
+                        self._record_success(stats, latency)
+                return
+            finally:
+                stats.in_flight -= 1
+                await stream.aclose()
+        raise last_exc
+
+    # ------------------------------------------------------------------
+    # observability
+    # ------------------------------------------------------------------
+    def stats(self) -> List[Dict]:
+        """Snapshot of the routing table, best alias first."""
+        now = time.monotonic()
+        rows = []
+        for s in sorted(self._stats.values(), key=lambda s: s.score(now)):
+            row = asdict(s)
+            row["score"] = s.score(now)
+            row["cooling_down_sec"] = max(0.0, s.cooldown_until - now)
+            del row["cooldown_until"]
+            rows.append(row)
+        return rows
+
+    def format_stats(self) -> str:
+        lines = [f"{'alias':<16} {'ewma_ms':>8} {'err%':>6} {'req':>5} {'fail':>5} {'inflt':>5}  model"]
+        for row in self.stats():
+            lat = "-" if row["ewma_latency"] is None else f"{row['ewma_latency'] * 1000:.0f}"
+            note = f"  (cooling {row['cooling_down_sec']:.0f}s)" if row["cooling_down_sec"] else ""
+            lines.append(
+                f"{row['alias']:<16} {lat:>8} {row['ewma_error'] * 100:>5.1f}% {row['requests']:>5} "
+                f"{row['failures']:>5} {row['in_flight']:>5}  {row['model_id']}{note}"
+            )
+        return "\n".join(lines)
@@ -1,5 +1,7 @@
 import asyncio
 import os
+import sys
+from pathlib import Path
 import openai
 from dotenv import load_dotenv
 
@@ -10,70 +12,79 @@ from agents import (
     set_default_openai_client,
     set_tracing_disabled,
     OpenAIChatCompletionsModel,   # avoids provider-prefix parsing
-    function_tool,
 )
 
 # Stream token deltas
 from openai.types.responses import ResponseTextDeltaEvent
 
-# Web fetch tool deps
-import requests
-from bs4 import BeautifulSoup
+# Latency-aware routing across several aliases
+from model_router import LatencyRouterModel
+
+# Shared fetch-and-extract library (../webfetch): pooled HTTP, TTL cache, multi-URL fetch
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from webfetch.adapters import agents_sdk_tool
+from webfetch.keepalive import AsyncPoolWarmer, ping_url, pool_limits
 
 load_dotenv()
 
 PROXY_URL = os.environ["LITELLM_PROXY_URL"]
 PROXY_KEY = os.environ["LITELLM_PROXY_API_KEY"]
 
-# Map ACTIVE_MODEL alias -> actual model id from .env
-ACTIVE = os.getenv("OPENAI_AGENT_SDK_ACTIVE_MODEL", "GPT4O_MINI").upper()
-alias_env_key = f"OPENAI_AGENT_SDK_MODEL_ALIAS_{ACTIVE}"
-MODEL_ID = os.getenv(alias_env_key)
-if not MODEL_ID:
-    raise ValueError(
-        f"ACTIVE_MODEL='{ACTIVE}' not found. "
-        f"Set {alias_env_key} in .env or change OPENAI_AGENT_SDK_ACTIVE_MODEL."
-    )
+def _resolve_alias(alias: str) -> str:
+    """Map an alias (e.g. GPT5_CHAT) -> actual model id from .env."""
+    alias_env_key = f"OPENAI_AGENT_SDK_MODEL_ALIAS_{alias}"
+    model_id = os.getenv(alias_env_key)
+    if not model_id:
+        raise ValueError(
+            f"ACTIVE_MODEL='{alias}' not found. "
+            f"Set {alias_env_key} in .env or change OPENAI_AGENT_SDK_ACTIVE_MODEL."
+        )
+    return model_id
 
-# OpenAI client pointed at your LiteLLM proxy (no /v1 at the end)
-client = openai.AsyncOpenAI(base_url=PROXY_URL, api_key=PROXY_KEY)
+
+ACTIVE = os.getenv("OPENAI_AGENT_SDK_ACTIVE_MODEL", "GPT4O_MINI").upper()
+MODEL_ID = _resolve_alias(ACTIVE)
+
+# Optional: route across several aliases (comma-separated), e.g. "GPT5_CHAT,GPT4O_MINI,SONNET".
+# When set, the latency-aware router replaces the single ACTIVE model.
+ROUTER_ALIASES = [
+    a.strip().upper()
+    for a in os.getenv("OPENAI_AGENT_SDK_ROUTER_ALIASES", "").split(",")
+    if a.strip()
+]
+
+# OpenAI client pointed at your LiteLLM proxy (no /v1 at the end).
+# Idle connections are kept PROXY_KEEPALIVE_SEC; chat_loop() opens warm ones and pings them.
+http_client = openai.DefaultAsyncHttpxClient(limits=pool_limits())
+client = openai.AsyncOpenAI(base_url=PROXY_URL, api_key=PROXY_KEY, http_client=http_client)
 set_default_openai_client(client)
+warmer = AsyncPoolWarmer(lambda: http_client, ping_url(PROXY_URL), headers={"Authorization": f"Bearer {PROXY_KEY}"})
 
 # Disable tracing to OpenAI (prevents stray 401s with proxy keys)
 set_tracing_disabled(True)
 
 # ------------------------------------------------------------------
-# fetch_and_summarize tool (same behavior as your other stacks)
+# fetch_and_summarize tool (shared ../webfetch library, same behavior as your other stacks)
 # ------------------------------------------------------------------
-@function_tool(name_override="fetch_and_summarize")
-def fetch_and_summarize(url: str, timeout_sec: int = 10, max_chars: int = 6000) -> str:
-    """
-    Fetch a web page, strip HTML (scripts/styles/nav/headers/footers), and return cleaned text.
-    Args:
-        url: The URL to fetch.
-        timeout_sec: HTTP timeout in seconds.
-        max_chars: Truncate cleaned text to this length (for token safety).
-    """
-    headers = {"User-Agent": "openai-agents-demo/1.0 (+lite-llm-proxy)"}
-    r = requests.get(url, headers=headers, timeout=timeout_sec)
-    r.raise_for_status()
-
-    soup = BeautifulSoup(r.text, "html.parser")
-    for tag in soup(["script", "style", "noscript", "header", "footer", "nav", "aside"]):
-        tag.extract()
-
-    text = " ".join(soup.get_text(separator=" ").split())
-    if len(text) > max_chars:
-        text = text[:max_chars] + " ...[truncated]"
-    return text
+fetch_and_summarize = agents_sdk_tool("fetch_and_summarize", default_timeout_sec=10, default_max_chars=6000)
 
 
 async def chat_loop():
     """Interactive REPL with streaming + tool-use logs, preserving context via SQLiteSession."""
+    warmer.start()  # connects to the proxy while the first message is typed
+    router = None
+    if ROUTER_ALIASES:
+        router = LatencyRouterModel([(a, _resolve_alias(a)) for a in ROUTER_ALIASES], openai_client=client)
+        model = router
+        model_label = "router: " + ", ".join(ROUTER_ALIASES)
+    else:
+        model = OpenAIChatCompletionsModel(model=MODEL_ID, openai_client=client)
+        model_label = f"model '{MODEL_ID}'"
+
     agent = Agent(
         name="ProxyAgent",
         instructions="You are a helpful assistant.",
-        model=OpenAIChatCompletionsModel(model=MODEL_ID, openai_client=client),
+        model=model,
         tools=[fetch_and_summarize],
     )
 
@@ -81,8 +92,8 @@ async def chat_loop():
     session_id = os.getenv("OPENAI_AGENT_SDK_SESSION_ID", "cli_session")
     session = SQLiteSession(session_id)  # in-memory DB unless you pass a file path
 
-    print(f"--- Interactive mode (model '{MODEL_ID}', proxy {PROXY_URL}) ---")
-    print("Type your message. Commands: /reset  /exit\n")
+    print(f"--- Interactive mode ({model_label}, proxy {PROXY_URL}) ---")
+    print("Type your message. Commands: /reset  /stats  /exit\n")
 
     while True:
         # read input without blocking the event loop
@@ -97,6 +108,12 @@ async def chat_loop():
             await session.clear_session()
             print("↺ session reset.")
             continue
+        if msg == "/stats":
+            print(router.format_stats() if router else "(router disabled: set OPENAI_AGENT_SDK_ROUTER_ALIASES)")
+            pool = warmer.stats()
+            print(f"proxy pool: {pool['pool'] or 'n/a'}  pings {pool['pings']} ok / {pool['failures']} failed"
+                  + (f"  last error: {pool['last_error']}" if pool["last_error"] else ""))
+            continue
 
         # Start a streamed run
         print("assistant > ", end="", flush=True)
@@ -0,0 +1,50 @@
+"""
+webfetch — framework-agnostic fetch-and-extract library shared by every agent stack.
+
+One connection pool, one page cache and one parser for all five trials; the
+framework-specific tool wrappers live in `webfetch.adapters`.
+
+Each trial adds the repo root to sys.path before importing this package.
+"""
+from .core import (
+    DEFAULT_MAX_CHARS,
+    DEFAULT_TIMEOUT_SEC,
+    cached_document,
+    document_flight,
+    fetch,
+    fetch_document,
+    fetch_many,
+    fetch_text,
+    fit,
+    page_cache,
+    prefetch,
+    truncate,
+)
+from .crawl import crawl_and_extract
+from .extract import extract_text, normalize_url
+from .parsepool import parse_executor
+from .profiles import host_profiles
+from .scheduler import host_scheduler
+from .rank import select_relevant
+
+__all__ = [
+    "DEFAULT_MAX_CHARS",
+    "DEFAULT_TIMEOUT_SEC",
+    "cached_document",
+    "crawl_and_extract",
+    "document_flight",
+    "extract_text",
+    "fetch",
+    "fetch_document",
+    "fetch_many",
+    "fetch_text",
+    "fit",
+    "host_profiles",
+    "host_scheduler",
+    "normalize_url",
+    "page_cache",
+    "parse_executor",
+    "prefetch",
+    "select_relevant",
+    "truncate",
+]
@@ -0,0 +1,135 @@
+# webfetch/adapters.py
+"""
+Thin per-framework wrappers around webfetch.core.fetch.
+
+Every stack gets the same behavior (cache, pool, extraction, multi-URL); only the
+registration differs:
+
+    strands_tool()      -> Strands @tool            (aws_strands_trial)
+    langchain_tool()    -> LangChain @tool           (langgraph_agent_trial)
+    agents_sdk_tool()   -> Agents SDK @function_tool (openai-agent-sdk-trial)
+    adk_tool()          -> plain function for ADK    (google_adk_trial)
+    tool_spec() + run() -> OpenAI-style TOOL_SPEC    (ms_365_agent_trial)
+
+Framework packages are imported inside each adapter, so importing webfetch
+never pulls in an SDK.
+"""
+from typing import Any, Callable, Dict, List, Optional
+
+from .core import DEFAULT_MAX_CHARS, DEFAULT_TIMEOUT_SEC, fetch
+
+TOOL_NAME = "fetch_and_summarize"
+TOOL_DESCRIPTION = "Fetch a public web page and return cleaned/plain text for summarization."
+
+
+def make_tool_function(
+    name: str = TOOL_NAME,
+    default_timeout_sec: int = DEFAULT_TIMEOUT_SEC,
+    default_max_chars: int = DEFAULT_MAX_CHARS,
+    log: bool = False,
+) -> Callable[..., str]:
+    """
+    Plain, annotated function with a Google-style docstring: the frameworks build
+    the tool schema from its signature and docstring.
+    """
+
+    def fetch_and_summarize(
+        url: str = "",
+        urls: Optional[List[str]] = None,
+        timeout_sec: int = default_timeout_sec,
+        max_chars: int = default_max_chars,
+        query: str = "",
+    ) -> str:
+        """
+        Fetch a public web page and return cleaned/plain text for summarization.
+        To combine several sources, pass them all in `urls` in ONE call: they are
+        fetched concurrently and returned as one combined result.
+        Pass the user's question as `query` to get the most relevant passages
+        instead of just the top of the page.
+
+        Args:
+            url: The full URL to fetch (http/https).
+            urls: Several URLs to fetch concurrently in one call.
+            timeout_sec: HTTP timeout in seconds.
+            max_chars: Character budget for the returned text (split across URLs).
+            query: The user's question; selects the best-matching passages.
+        """
+        if log:
+            print(f"[tool] {name}: start url={url or urls}", flush=True)
+        out = fetch(url, urls, timeout_sec, max_chars, query)
+        if log:
+            status = "ERROR " + out[7:120] if out.startswith("ERROR:") else f"success chars={len(out)}"
+            print(f"[tool] {name}: {status}", flush=True)
+        return out
+
+    fetch_and_summarize.__name__ = fetch_and_summarize.__qualname__ = name
+    return fetch_and_summarize
+
+
+def strands_tool(name: str = "http_fetch_and_clean", **kwargs):
+    from strands import tool
+
+    return tool(make_tool_function(name, **kwargs))
+
+
+def langchain_tool(name: str = TOOL_NAME, **kwargs):
+    from langchain_core.tools import tool
+
+    return tool(name)(make_tool_function(name, **kwargs))
+
+
+def agents_sdk_tool(name: str = TOOL_NAME, **kwargs):
+    from agents import function_tool
+
+    return function_tool(make_tool_function(name, **kwargs), name_override=name)
+
+
+def adk_tool(name: str = "http_fetch_and_clean", **kwargs) -> Callable[..., str]:
+    # ADK wraps plain functions itself (FunctionTool uses __name__ and the docstring)
+    kwargs.setdefault("log", True)
+    return make_tool_function(name, **kwargs)
+
+
+def tool_spec(name: str = TOOL_NAME, default_max_chars: int = DEFAULT_MAX_CHARS) -> Dict[str, Any]:
+    """OpenAI Chat Completions function spec for hand-rolled engines (M365)."""
+    return {
+        "type": "function",
+        "function": {
+            "name": name,
+            "description": TOOL_DESCRIPTION,
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "url": {
+                        "type": "string",
+                        "description": "The full URL to fetch (http/https).",
+                    },
+                    "urls": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Several URLs to fetch concurrently in ONE call; results are combined.",
+                    },
+                    "timeout_sec": {
+                        "type": "integer",
+                        "description": f"HTTP timeout in seconds (default: {DEFAULT_TIMEOUT_SEC}).",
+                        "minimum": 1,
+                        "maximum": 60,
+                    },
+                    "max_chars": {
+                        "type": "integer",
+                        "description": f"Truncate cleaned text to this many characters (default: {default_max_chars}).",
+                        "minimum": 500,
+                        "maximum": 100_000,
+                    },
+                    "query": {
+                        "type": "string",
+                        "description": (
+                            "The user's question. When given, the passages most relevant to it are "
+                            "returned instead of just the top of the page."
+                        ),
+                    },
+                },
+                "additionalProperties": False,
+            },
+        },
+    }
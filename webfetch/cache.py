@@ -0,0 +1,140 @@
+# webfetch/cache.py
+"""
+Thread-safe, size-bounded TTL cache shared by every fetch adapter.
+
+`TTLCache` lives in process memory; `SqliteTTLCache` keeps the same interface in
+a sqlite file so several worker processes on one host share one cache.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Union
+
+
+class TTLCache:
+    """
+    Entries expire `ttl_sec` after insertion; when full, the least recently
+    used entry is evicted. All methods are safe to call from worker threads.
+    """
+
+    def __init__(self, ttl_sec: float, max_entries: int) -> None:
+        self.ttl_sec = ttl_sec
+        self.max_entries = max_entries
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is not None and hit[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return hit[1]
+            if hit is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.ttl_sec <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_sec, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+class SqliteTTLCache:
+    """
+    TTLCache semantics on a sqlite file (WAL mode), safe across threads and
+    processes. Values must be JSON-serializable; keys are stored as text.
+    hits/misses are counted per process. Caches sharing a file need their own
+    `table`: size bounds and stats are per table.
+    """
+
+    def __init__(self, path: str, ttl_sec: float, max_entries: int, table: str = "cache") -> None:
+        if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", table):
+            raise ValueError(f"Invalid cache table name: {table!r}")
+        self.path = path
+        self.table = table
+        self.ttl_sec = ttl_sec
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        with self._conn() as db:
+            db.execute(f"CREATE TABLE IF NOT EXISTS {table} ("
+                       "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL, used REAL NOT NULL)")
+            db.execute(f"CREATE INDEX IF NOT EXISTS {table}_used ON {table}(used)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)  # autocommit
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")  # it's a cache: losing the tail on power loss is fine
+            self._local.conn = conn
+        return conn
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        now = time.time()
+        db = self._conn()
+        row = db.execute(f"SELECT value, expires FROM {self.table} WHERE key = ?", (str(key),)).fetchone()
+        if row is not None and row[1] > now:
+            db.execute(f"UPDATE {self.table} SET used = ? WHERE key = ?", (now, str(key)))
+            self._count(True)
+            return json.loads(row[0])
+        if row is not None:
+            db.execute(f"DELETE FROM {self.table} WHERE key = ? AND expires <= ?", (str(key), now))
+        self._count(False)
+        return None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.ttl_sec <= 0 or self.max_entries <= 0:
+            return
+        now = time.time()
+        db = self._conn()
+        db.execute(f"INSERT OR REPLACE INTO {self.table} (key, value, expires, used) VALUES (?, ?, ?, ?)",
+                   (str(key), json.dumps(value, ensure_ascii=False), now + self.ttl_sec, now))
+        db.execute(f"DELETE FROM {self.table} WHERE key IN "
+                   f"(SELECT key FROM {self.table} ORDER BY used DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+
+    def clear(self) -> None:
+        self._conn().execute(f"DELETE FROM {self.table}")
+
+    def stats(self) -> Dict[str, int]:
+        size = self._conn().execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        with self._lock:
+            return {"size": size, "hits": self.hits, "misses": self.misses}
+
+
+def make_cache(ttl_sec: float, max_entries: int, path: str = "",
+               table: str = "cache") -> Union[TTLCache, SqliteTTLCache]:
+    """In-process cache, or a sqlite-backed one (in `table`) shared by every process using `path`."""
+    return SqliteTTLCache(path, ttl_sec, max_entries, table) if path else TTLCache(ttl_sec, max_entries)
@@ -0,0 +1,183 @@
+# webfetch/core.py
+"""
+Fetch -> extract -> cache -> trim. Every framework adapter calls into here.
+"""
+from __future__ import annotations
+
+import functools
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional
+
+from .cache import TTLCache, make_cache
+from .extract import HTML_CONTENT_TYPES, extract_links, normalize_url
+from .parsepool import parse_executor
+from .profiles import host_profiles
+from .rank import select_relevant
+from .singleflight import SingleFlight
+from .transport import download
+
+# How much text we aim for before truncation
+DEFAULT_MAX_CHARS = 10_000
+DEFAULT_TIMEOUT_SEC = 12
+
+FETCH_CACHE_TTL_SEC = float(os.getenv("FETCH_CACHE_TTL_SEC", "300"))
+FETCH_CACHE_MAX_ENTRIES = int(os.getenv("FETCH_CACHE_MAX_ENTRIES", "128"))
+FETCH_MAX_WORKERS = int(os.getenv("FETCH_MAX_WORKERS", "8"))  # concurrent fetches for several URLs
+# sqlite file shared by several worker processes (multi-worker M365 host); "" = in-process memory
+FETCH_CACHE_PATH = os.getenv("FETCH_CACHE_PATH", "")
+
+TRUNCATION_MARK = "…"
+
+# normalized url -> full cleaned text; trimming happens per call so any max_chars can reuse it
+page_cache = make_cache(FETCH_CACHE_TTL_SEC, FETCH_CACHE_MAX_ENTRIES, FETCH_CACHE_PATH)
+
+# normalized url -> {"type": content type, "links": [...]} of the last download: what the crawler needs besides
+# the text (kept in process memory; a page cached by another worker is downloaded again when its links are needed)
+page_meta = TTLCache(FETCH_CACHE_TTL_SEC, FETCH_CACHE_MAX_ENTRIES)
+
+# normalized url -> the one in-flight download+parse; concurrent fetches/prefetches/crawls of a page join it
+document_flight = SingleFlight()
+
+
+@functools.lru_cache(maxsize=None)
+def _executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=FETCH_MAX_WORKERS, thread_name_prefix="webfetch")
+
+
+@functools.lru_cache(maxsize=None)
+def _prefetch_executor() -> ThreadPoolExecutor:
+    # Separate pool: fetch_many workers may block on a prefetch, so prefetches must never queue behind them
+    return ThreadPoolExecutor(max_workers=FETCH_MAX_WORKERS, thread_name_prefix="webfetch-prefetch")
+
+
+def prefetch(url: str, timeout_sec: float = DEFAULT_TIMEOUT_SEC) -> Future:
+    """
+    Start fetching `url` in the background and return its Future (full cleaned text).
+    A later fetch_document() for the same page waits for this download instead of
+    starting another one. No-op (completed Future) when the page is already cached.
+    """
+    norm = normalize_url(url)
+    cached = page_cache.get(norm)
+    if cached is not None:
+        done: Future = Future()
+        done.set_result(cached)
+        return done
+
+    return document_flight.submit(_prefetch_executor(), norm, _download_document, norm, timeout_sec)
+
+
+def fetch_document(url: str, timeout_sec: float = DEFAULT_TIMEOUT_SEC, fresh: bool = False) -> str:
+    """
+    Full cleaned text of `url` (served from the TTL cache when fresh). Concurrent
+    calls for the same page -- other sessions, a prefetch, a crawl -- share one download.
+    `fresh` skips the cache (a crawl that needs the page's links). Raises requests
+    exceptions on network/HTTP errors.
+    """
+    norm = normalize_url(url)
+    cached = None if fresh else page_cache.get(norm)
+    if cached is not None:
+        return cached
+    return document_flight.do(norm, _download_document, norm, timeout_sec, fresh)
+
+
+def _download_document(norm: str, timeout_sec: float, fresh: bool = False) -> str:
+    cached = None if fresh else page_cache.get(norm)  # a flight that finished just before ours started
+    if cached is not None:
+        return cached
+    page = download(norm, timeout_sec)
+    kind = page.content_type.split(";")[0].strip().lower()
+    links = extract_links(page.content, page.url) if kind in HTML_CONTENT_TYPES or not kind else []
+    # big pages -> process pool; hosts seen before get a targeted pass without their boilerplate
+    hints = host_profiles.hints(page.url)
+    text, obs = parse_executor.parse_page(page.content, page.encoding, page.content_type, hints)
+    host_profiles.observe(page.url, obs)
+    page_cache.put(norm, text)
+    page_meta.put(norm, {"type": kind, "links": links})
+    return text
+
+
+def document_meta(url: str) -> Optional[Dict[str, Any]]:
+    """Content type and links of `url`'s last download in this process, if still cached."""
+    return page_meta.get(normalize_url(url)) if url else None
+
+
+def cached_document(url: str) -> Optional[str]:
+    """Full cleaned text of `url` if it is in the page cache, else None. Never touches the network."""
+    return page_cache.get(normalize_url(url)) if url else None
+
+
+def truncate(text: str, max_chars: Optional[int]) -> str:
+    cap = max_chars if max_chars and max_chars > 0 else DEFAULT_MAX_CHARS
+    if len(text) > cap:
+        text = text[:cap] + TRUNCATION_MARK
+    return text
+
+
+def fit(text: str, max_chars: Optional[int], query: str = "", ranked_chars: Optional[int] = None) -> str:
+    """
+    Fit `text` into the budget: BM25-ranked passages (within `ranked_chars` when given)
+    when a query is given and matches, else the head.
+    """
+    cap = max_chars if max_chars and max_chars > 0 else DEFAULT_MAX_CHARS
+    if query and query.strip():
+        return select_relevant(text, query, cap, ranked_chars)
+    return truncate(text, cap)
+
+
+def fetch_text(url: str, timeout_sec: float = DEFAULT_TIMEOUT_SEC, max_chars: int = DEFAULT_MAX_CHARS,
+               query: str = "", ranked_chars: Optional[int] = None,
+               documents: Optional[Dict[str, str]] = None) -> str:
+    """
+    Fetch the page at `url`, return cleaned plain text within max_chars: the passages
+    most relevant to `query` if given (within `ranked_chars`, when set), otherwise the
+    head of the page. Pass a dict as `documents` to get the page's full text by
+    normalized URL (normalize_url: the page cache key).
+    Never raises: failures come back as "ERROR: ..." text the model can read.
+    """
+    import requests
+
+    try:
+        document = fetch_document(url, timeout_sec)
+        if documents is not None and document:
+            documents[normalize_url(url)] = document
+        text = fit(document, max_chars, query, ranked_chars)
+        return text if text else "ERROR: No visible text found."
+    except requests.exceptions.RequestException as e:
+        return f"ERROR: HTTP request failed: {e}"
+    except Exception as e:
+        return f"ERROR: {e}"
+
+
+def fetch_many(urls: Iterable[str], timeout_sec: float = DEFAULT_TIMEOUT_SEC,
+               max_chars: int = DEFAULT_MAX_CHARS, query: str = "", ranked_chars: Optional[int] = None,
+               documents: Optional[Dict[str, str]] = None) -> str:
+    """
+    Fetch several URLs concurrently and return one combined result.
+    `max_chars` (and `ranked_chars`) is the budget for the whole result, split evenly across pages.
+    """
+    targets = _dedupe(urls)
+    if len(targets) <= 1:
+        return fetch_text(targets[0] if targets else "", timeout_sec, max_chars, query, ranked_chars, documents)
+
+    per_page = max(500, (max_chars or DEFAULT_MAX_CHARS) // len(targets))
+    ranked_per_page = max(500, ranked_chars // len(targets)) if ranked_chars else None
+    futures = [_executor().submit(fetch_text, u, timeout_sec, per_page, query, ranked_per_page, documents)
+               for u in targets]
+    return "\n\n".join(f"### {u}\n{fut.result()}" for u, fut in zip(targets, futures))
+
+
+def fetch(url: str = "", urls: Optional[Iterable[str]] = None,
+          timeout_sec: float = DEFAULT_TIMEOUT_SEC, max_chars: int = DEFAULT_MAX_CHARS, query: str = "",
+          ranked_chars: Optional[int] = None, documents: Optional[Dict[str, str]] = None) -> str:
+    """Single entry point used by the tool adapters: one `url`, several `urls`, or both."""
+    targets = _dedupe([url, *(urls or [])])
+    if not targets:
+        return "ERROR: Provide `url` or `urls`."
+    if len(targets) == 1:
+        return fetch_text(targets[0], timeout_sec, max_chars, query, ranked_chars, documents)
+    return fetch_many(targets, timeout_sec, max_chars, query, ranked_chars, documents)
+
+
+def _dedupe(urls: Iterable[str]) -> List[str]:
+    return list(dict.fromkeys(u.strip() for u in urls if u and u.strip()))
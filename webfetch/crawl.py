@@ -0,0 +1,245 @@
+# webfetch/crawl.py
+"""
+Bounded site crawl for questions that span several pages ("how do I configure X"
+on a docs site whose answer is split across install / config / FAQ pages).
+
+Breadth-first from a start URL, up to `max_depth` links away and `max_pages`
+pages, CRAWL_CONCURRENCY downloads in flight. The frontier dedupes on the URL
+without its #fragment, stays on the start page's origin (optionally under a
+path prefix), skips obvious non-HTML links and anything robots.txt disallows
+(the start URL itself was asked for by the user, so it is always fetched).
+
+Every page goes through core.fetch_document like a normal fetch: same page cache
+key, same single-flight (a prefetch or fetch of the page already in flight is
+joined), the per-host scheduler, the parse pool and host profiles; the links to
+follow come from the download's page_meta. So search_fetched and later fetches
+reuse crawled pages. The merged result is ranked across all pages at once: the
+best passages for the question win the budget wherever they are, grouped under
+each page's URL in crawl order.
+"""
+from __future__ import annotations
+
+import functools
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlparse
+
+from .core import DEFAULT_TIMEOUT_SEC, document_meta, fetch_document, truncate
+from .extract import HTML_CONTENT_TYPES, PLAIN_CONTENT_TYPES, normalize_url
+from .rank import GAP_MARK, bm25_scores, split_chunks
+from .scheduler import host_scheduler
+
+CRAWL_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", "4"))  # downloads in flight per crawl
+CRAWL_MAX_PAGES = int(os.getenv("CRAWL_MAX_PAGES", "30"))  # hard cap, whatever the tool call asks for
+CRAWL_MAX_DEPTH = 3
+CRAWL_TIMEOUT_SEC = float(os.getenv("CRAWL_TIMEOUT_SEC", "30"))  # whole crawl; pages still loading are dropped
+CRAWL_MAX_CHARS = 12_000
+
+# Links we never follow: downloads, media, feeds
+SKIP_EXTENSIONS = frozenset("""
+7z avi bmp css csv doc docx dmg exe gif gz ico jpeg jpg js json m4a mov mp3 mp4 msi ogg pdf png ppt
+pptx rar rss svg tar tgz tif tiff wav webm webp woff woff2 xls xlsx xml zip
+""".split())
+
+
+@dataclass
+class CrawledPage:
+    url: str  # as queued: canonical_url form, the frontier's dedup key (normalize_url leaves it as is)
+    depth: int
+    text: str = ""
+    links: List[str] = field(default_factory=list)
+    error: str = ""  # "" when the page was fetched; else why not ("disallowed by robots.txt", HTTP error...)
+
+
+@functools.lru_cache(maxsize=None)
+def _executor() -> ThreadPoolExecutor:
+    # Own pool: crawl threads block on downloads, and must not starve fetch_many / prefetch
+    return ThreadPoolExecutor(max_workers=max(CRAWL_CONCURRENCY, 1) * 2, thread_name_prefix="webfetch-crawl")
+
+
+def _followable(url: str, origin: str, same_origin: bool, path_prefix: str) -> bool:
+    parts = urlparse(url)
+    if same_origin and f"{parts.scheme}://{parts.netloc}" != origin:
+        return False
+    if path_prefix and not parts.path.startswith(path_prefix):
+        return False
+    ext = parts.path.rsplit("/", 1)[-1].rpartition(".")[2].lower()
+    return ext not in SKIP_EXTENSIONS
+
+
+def _fetch_page(url: str, depth: int, expand: bool, check_robots: bool, timeout_sec: float) -> CrawledPage:
+    """One crawl step (runs on a crawl thread). Never raises: failures are kept on the page."""
+    page = CrawledPage(url, depth)
+    try:
+        if check_robots and not host_scheduler.allowed(url):
+            page.error = "disallowed by robots.txt"
+            return page
+        text = fetch_document(url, timeout_sec)  # cached, joined if in flight, else downloaded
+        meta = document_meta(url)
+        if expand and meta is None:  # cached text but no links (another worker's download): fetch the HTML again
+            text = fetch_document(url, timeout_sec, fresh=True)
+            meta = document_meta(url)
+        kind = meta["type"] if meta else ""
+        if kind and kind not in HTML_CONTENT_TYPES and kind not in PLAIN_CONTENT_TYPES:
+            page.error = f"skipped {kind}"
+            return page
+        page.text = text
+        if expand and meta:
+            page.links = list(meta["links"])
+    except Exception as e:
+        page.error = f"{type(e).__name__}: {e}"
+    return page
+
+
+def crawl(start_url: str, max_depth: int = 1, max_pages: int = 10, same_origin: bool = True,
+          path_prefix: str = "", timeout_sec: float = DEFAULT_TIMEOUT_SEC,
+          deadline_sec: float = CRAWL_TIMEOUT_SEC) -> List[CrawledPage]:
+    """
+    Crawl breadth-first from `start_url`; returns every page attempted, in crawl order
+    (depth, then discovery). `timeout_sec` is per download, `deadline_sec` for the lot.
+    """
+    start = normalize_url(start_url)  # ends in canonical_url, like the links extract_links returns
+    parts = urlparse(start)
+    origin = f"{parts.scheme}://{parts.netloc}"
+    max_depth = max(0, min(max_depth, CRAWL_MAX_DEPTH))
+    max_pages = max(1, min(max_pages, CRAWL_MAX_PAGES))
+    deadline = time.monotonic() + deadline_sec
+
+    seen: Set[str] = {start}
+    queue: Deque[Tuple[str, int]] = deque([(start, 0)])  # FIFO of (url, depth) not yet submitted
+    order: Dict[str, int] = {}  # url -> position in crawl order
+    pages: Dict[str, CrawledPage] = {}
+    in_flight: Dict[Future, str] = {}
+
+    while queue or in_flight:
+        while queue and len(in_flight) < CRAWL_CONCURRENCY and len(order) < max_pages:
+            url, depth = queue.popleft()
+            order[url] = len(order)
+            fut = _executor().submit(_fetch_page, url, depth, depth < max_depth, url != start, timeout_sec)
+            in_flight[fut] = url
+        if len(order) >= max_pages:
+            queue.clear()
+        if not in_flight:
+            break
+        remaining = deadline - time.monotonic()
+        done, _pending = wait(in_flight, timeout=max(0.0, remaining), return_when=FIRST_COMPLETED)
+        if not done:  # out of time: keep what we have
+            for fut, url in in_flight.items():
+                fut.cancel()
+                pages[url] = CrawledPage(url, -1, error="crawl deadline")
+            break
+        for fut in done:
+            url = in_flight.pop(fut)
+            page = pages[url] = fut.result()
+            for link in page.links:
+                if link not in seen and _followable(link, origin, same_origin, path_prefix):
+                    seen.add(link)
+                    queue.append((link, page.depth + 1))
+    return sorted(pages.values(), key=lambda p: order[p.url])
+
+
+# ---- merge: one budget across every crawled page
+
+def _section(url: str) -> str:
+    return f"### {url}\n"
+
+
+def _even_split(pages: List[CrawledPage], max_chars: int) -> str:
+    """No question to rank by: share the budget, short pages giving their unused share to the rest."""
+    budget = max_chars - sum(len(_section(p.url)) + 2 for p in pages)
+    shares: Dict[str, int] = {}
+    left = len(pages)
+    for p in sorted(pages, key=lambda p: len(p.text)):
+        shares[p.url] = min(len(p.text), max(200, budget // left))
+        budget -= shares[p.url]
+        left -= 1
+    return "\n\n".join(_section(p.url) + truncate(p.text, shares[p.url]) for p in pages)
+
+
+def merge_pages(pages: List[CrawledPage], query: str, max_chars: int = CRAWL_MAX_CHARS) -> str:
+    """
+    Text of the crawled pages within `max_chars`: with a query, BM25 over the chunks
+    of all pages together picks the best passages wherever they are; each page's
+    picks stay in document order under its URL. Pages with nothing picked, and
+    repeats of an earlier page, are left out.
+    """
+    fetched: List[CrawledPage] = []
+    texts: Set[str] = set()
+    for p in pages:  # "/docs/" and "/docs/index.html" are often the same page
+        if p.text and p.text not in texts:
+            texts.add(p.text)
+            fetched.append(p)
+    if not fetched:
+        return ""
+    if sum(len(p.text) + len(_section(p.url)) + 2 for p in fetched) <= max_chars:
+        return "\n\n".join(_section(p.url) + p.text for p in fetched)
+
+    chunks: List[Tuple[int, str]] = [(i, c) for i, p in enumerate(fetched) for c in split_chunks(p.text)]
+    scores = bm25_scores([c for _i, c in chunks], query) if query and query.strip() else None
+    if scores is None or not scores.any():
+        return _even_split(fetched, max_chars)
+
+    picked: List[int] = []
+    pages_used: Set[int] = set()
+    used = 0
+    for idx in sorted(range(len(chunks)), key=lambda i: (-scores[i], i)):
+        if scores[idx] <= 0:
+            break
+        page_idx, text = chunks[idx]
+        cost = len(text) + len(GAP_MARK)
+        if page_idx not in pages_used:
+            cost += len(_section(fetched[page_idx].url)) + 2
+        if used + cost > max_chars:
+            continue
+        picked.append(idx)
+        pages_used.add(page_idx)
+        used += cost
+    if not picked:
+        best = int(scores.argmax())
+        page_idx, text = chunks[best]
+        return _section(fetched[page_idx].url) + text[:max_chars] + "…"
+
+    picked.sort()  # chunk ids run in crawl order, then document order within a page
+    sections: List[str] = []
+    for pos, idx in enumerate(picked):
+        page_idx, text = chunks[idx]
+        prev = picked[pos - 1] if pos else None
+        if prev is None or chunks[prev][0] != page_idx:
+            sections.append(_section(fetched[page_idx].url) + text)
+        else:
+            sections[-1] += ("\n" if idx == prev + 1 else GAP_MARK) + text
+    return "\n\n".join(sections)
+
+
+def crawl_and_extract(url: str, query: str = "", max_depth: int = 1, max_pages: int = 10,
+                      same_origin: bool = True, path_prefix: str = "", max_chars: int = CRAWL_MAX_CHARS,
+                      timeout_sec: float = DEFAULT_TIMEOUT_SEC,
+                      documents: Optional[Dict[str, str]] = None) -> str:
+    """
+    Crawl from `url` and return the merged, ranked text of the pages found, with a
+    footer counting what was skipped. Never raises: failures come back as "ERROR: ...".
+    Pass a dict as `documents` to get the full text of the pages that returned text, by
+    normalized URL (like fetch_text).
+    """
+    if not url or not url.strip():
+        return "ERROR: Provide `url`."
+    pages = crawl(url, max_depth, max_pages, same_origin, path_prefix, timeout_sec)
+    if not pages or not pages[0].text:
+        return f"ERROR: {pages[0].error if pages and pages[0].error else 'No visible text found.'}"
+    if documents is not None:
+        documents.update((normalize_url(p.url), p.text) for p in pages if p.text)
+
+    failed = [p for p in pages if p.error]
+    footer = ""
+    if failed:
+        reasons: Dict[str, int] = {}
+        for p in failed:
+            reason = p.error.split(":", 1)[0]
+            reasons[reason] = reasons.get(reason, 0) + 1
+        footer = "\n\n[crawled {} pages; skipped: {}]".format(
+            len(pages) - len(failed), ", ".join(f"{n} {r}" for r, n in reasons.items()))
+    return merge_pages(pages, query, max(500, max_chars - len(footer))) + footer
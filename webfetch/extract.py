@@ -0,0 +1,307 @@
+# webfetch/extract.py
+"""
+URL normalization, robust decoding and two-pass visible-text extraction
+(originally the M365 fetch tool's logic, now shared by every stack).
+"""
+from __future__ import annotations
+
+import hashlib
+import importlib.util
+import os
+import re
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, FrozenSet, List, Optional, Tuple
+from html import unescape
+from urllib.parse import urldefrag, urljoin, urlparse
+
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup, Tag
+
+MIN_REASONABLE_CHARS = 1_200  # if below, use aggressive fallback extraction
+
+# lxml is several times faster than html.parser; use it when installed (override with HTML_PARSER)
+HTML_PARSER = os.getenv("HTML_PARSER") or ("lxml" if importlib.util.find_spec("lxml") else "html.parser")
+
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+_SPACES_RE = re.compile(r"\s+")
+
+NON_CONTENT_TAGS = ["script", "style", "svg", "iframe", "canvas", "form"]
+CHROME_SELECTORS = ["header", "footer", "nav", "[role=navigation]", ".cookie", ".cookie-banner", ".consent"]
+BLOCK_SELECTOR = "h1,h2,h3,p,li"
+TARGETED_MIN_CHARS = 200  # a learned selector that yields less than this is treated as a miss
+BOILERPLATE_MAX_SHARE = 0.5  # never let boilerplate stripping remove more than half of a page
+
+# Payloads returned as-is (decoded) instead of being parsed as HTML
+PLAIN_CONTENT_TYPES = ("text/plain", "text/markdown", "text/csv", "application/json")
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+
+# A regex over the raw bytes is enough for hrefs, and saves a second parse of every page
+_HREF_RE = re.compile(rb"""<a\s[^>]*?href\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""", re.IGNORECASE)
+_BASE_RE = re.compile(rb"""<base\s[^>]*?href\s*=\s*["']?([^"'\s>]+)""", re.IGNORECASE)
+
+
+def normalize_url(u: str) -> str:
+    """
+    Correct common URL typos:
+      - https.www.example.com  -> https://www.example.com
+      - https//example.com     -> https://example.com
+      - https:/example.com     -> https://example.com
+      - www.example.com        -> https://www.example.com
+      - https://https.www.x    -> https://www.x
+    then canonicalizes it (the page cache key): no #fragment, lower-case
+    scheme and host, "/" for an empty path.
+    """
+    if not u:
+        return u
+    u = u.strip().strip('"\'')
+
+    # Remove spaces
+    u = u.replace(" ", "")
+
+    # Fix missing colon or slash variations
+    u = re.sub(r'^(https?)(//)(?!/)', r'\1://', u)        # https//x -> https://x
+    u = re.sub(r'^(https?):/([^/])', r'\1://\2', u)       # https:/x  -> https://x
+
+    # Fix "https.www..." or "http.www..."
+    u = re.sub(r'^(https?)\.(?=[^/])', r'\1://', u)       # https.www -> https://www
+
+    # If it starts with www., prepend https://
+    if u.startswith("www."):
+        u = "https://" + u
+
+    # If still missing a scheme, default to https://
+    if not re.match(r'^[a-zA-Z][a-zA-Z0-9+.-]*://', u):
+        u = "https://" + u
+
+    # Collapse accidental double scheme like "https://https.www..."
+    u = u.replace("https://https.", "https://").replace("http://http.", "http://")
+
+    # Final sanity via urlparse; if netloc is still empty, try treating path as host
+    p = urlparse(u)
+    if not p.netloc:
+        if p.path:
+            candidate = "https://" + p.path
+            p2 = urlparse(candidate)
+            if p2.netloc:
+                return canonical_url(candidate)
+        return u
+    return canonical_url(u)
+
+
+def canonical_url(u: str) -> str:
+    """Absolute URL without its #fragment, lower-case scheme/host, "/" for an empty path."""
+    u, _frag = urldefrag(u)
+    p = urlparse(u)
+    return p._replace(scheme=p.scheme.lower(), netloc=p.netloc.lower(), path=p.path or "/").geturl()
+
+
+def extract_links(content: bytes, base_url: str) -> List[str]:
+    """Absolute http(s) links of an HTML page (canonical_url form), in page order, deduplicated."""
+    base = _BASE_RE.search(content)
+    if base:
+        base_url = urljoin(base_url, unescape(base.group(1).decode("utf-8", errors="replace")))
+    links: Dict[str, None] = {}
+    for m in _HREF_RE.finditer(content):
+        href = unescape((m.group(1) or m.group(2) or m.group(3)).decode("utf-8", errors="replace")).strip()
+        if not href or href.startswith(("#", "mailto:", "javascript:", "tel:", "data:")):
+            continue
+        url = urljoin(base_url, href)
+        if url.startswith(("http://", "https://")):
+            links[canonical_url(url)] = None
+    return list(links)
+
+
+def decode_html(content: bytes, declared_encoding: Optional[str]) -> str:
+    """
+    Use UnicodeDammit to robustly decode HTML bytes (fixes stray Â, smart quotes, etc.).
+    """
+    from bs4 import UnicodeDammit
+
+    if declared_encoding:
+        try:
+            return content.decode(declared_encoding, errors="replace")
+        except Exception:
+            pass
+    dammit = UnicodeDammit(content, is_html=True)
+    return dammit.unicode_markup or content.decode("utf-8", errors="replace")
+
+
+def _first_pass_blocks(soup: "BeautifulSoup") -> List[Tuple["Tag", str]]:
+    # Remove obviously non-content tags (keep <noscript>)
+    for tag in soup(NON_CONTENT_TAGS):
+        tag.decompose()
+
+    # Remove site chrome if present
+    for sel in CHROME_SELECTORS:
+        for t in soup.select(sel):
+            t.decompose()
+
+    root = soup.find(["main", "article"]) or soup.body or soup
+    # Collect headings + paragraphs + list items
+    blocks = [(el, el.get_text(" ", strip=True)) for el in root.select(BLOCK_SELECTOR)]
+    return [(el, text) for el, text in blocks if text]
+
+
+def _join_blocks(chunks: List[str]) -> str:
+    # Collapse excessive blank lines
+    return _BLANK_LINES_RE.sub("\n\n", "\n".join(chunks)).strip()
+
+
+def visible_text_first_pass(soup: "BeautifulSoup") -> str:
+    """
+    Prefer textual content from main content selectors; keep <noscript>.
+    """
+    return _join_blocks([text for _el, text in _first_pass_blocks(soup)])
+
+
+def aggressive_fallback(soup: "BeautifulSoup") -> str:
+    """
+    Fallback: get as much visible text as possible from <body>.
+    """
+    body = soup.body or soup
+    text = body.get_text(separator="\n", strip=True)
+    text = _BLANK_LINES_RE.sub("\n\n", text)
+    return text.strip()
+
+
+def extract_text(content: bytes, encoding: Optional[str] = None, content_type: str = "") -> str:
+    """
+    Full cleaned text of a downloaded page (no truncation).
+    Robust decoding + two-pass extraction yields enough text in one shot.
+    """
+    return extract_page(content, encoding, content_type)[0]
+
+
+# ---- per-host hints (learned by webfetch.profiles from earlier pages of the same host)
+
+@dataclass(frozen=True)
+class HostHints:
+    selector: str = ""  # main-content container, e.g. "div#content"; parsed alone when set
+    boilerplate: FrozenSet[str] = frozenset()  # block_hash() of text repeated across the host's pages
+
+
+@dataclass
+class PageObservation:
+    block_hashes: List[str] = field(default_factory=list)  # every text block seen on this page
+    selector: str = ""  # container holding most of this page's content (a vote for the host's selector)
+    targeted: bool = False  # answered by the one targeted pass
+    selector_missed: bool = False  # hinted selector absent/too thin; fell back to the full parse
+    dropped_blocks: int = 0  # boilerplate blocks removed
+
+
+def block_hash(text: str) -> str:
+    return hashlib.blake2b(_SPACES_RE.sub(" ", text).strip().lower().encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _selector_for(tag: "Tag") -> str:
+    """A stable-looking CSS selector for `tag` (id, first class, or main/article), or ""."""
+    tag_id = tag.get("id")
+    if tag_id and not re.search(r"\d{3,}", tag_id):  # skip generated ids like "ember1234"
+        return f"{tag.name}#{tag_id}"
+    classes = [c for c in tag.get("class") or [] if not re.search(r"\d{3,}", c)]
+    if classes:
+        return f"{tag.name}.{classes[0]}"
+    return tag.name if tag.name in ("main", "article") else ""
+
+
+def _strainer_for(selector: str):
+    from bs4 import SoupStrainer
+
+    name, sep, value = (re.split(r"([#.])", selector, maxsplit=1) + ["", ""])[:3]
+    if sep == "#":
+        return SoupStrainer(name, attrs={"id": value})
+    if sep == ".":
+        return SoupStrainer(name, attrs={"class": value})
+    return SoupStrainer(name)
+
+
+def _content_selector(soup: "BeautifulSoup", blocks: List[Tuple["Tag", str]]) -> str:
+    """Deepest uniquely-selectable container holding >= 80% of the page's text."""
+    total = sum(len(text) for _el, text in blocks)
+    if total < TARGETED_MIN_CHARS:
+        return ""
+    weight: dict = {}
+    depth: dict = {}
+    for el, text in blocks:
+        for level, parent in enumerate(el.parents):
+            if level > 15 or parent.name in ("body", "html", "[document]", None):
+                break
+            sel = _selector_for(parent)
+            if sel:
+                weight[sel] = weight.get(sel, 0) + len(text)
+                if sel not in depth:
+                    depth[sel] = sum(1 for _ in parent.parents)
+    for sel in sorted((s for s in weight if weight[s] >= 0.8 * total), key=lambda s: -depth[s]):
+        if len(soup.select(sel)) == 1:
+            return sel
+    return ""
+
+
+def _targeted_pass(html: str, hints: HostHints) -> Optional[List[str]]:
+    """Parse only the learned container; None when it isn't there or is too thin to trust."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, HTML_PARSER, parse_only=_strainer_for(hints.selector))
+    root = soup.select_one(hints.selector)
+    if root is None:
+        return None
+    for tag in root(NON_CONTENT_TAGS):
+        tag.decompose()
+    chunks = [el.get_text(" ", strip=True) for el in root.select(BLOCK_SELECTOR)]
+    chunks = [c for c in chunks if c]
+    return chunks if sum(len(c) for c in chunks) >= TARGETED_MIN_CHARS else None
+
+
+def _strip_boilerplate(chunks: List[str], hints: Optional[HostHints], obs: PageObservation) -> List[str]:
+    hashes = [block_hash(c) for c in chunks]
+    obs.block_hashes = list(dict.fromkeys(hashes))
+    if not hints or not hints.boilerplate:
+        return chunks
+    kept = [c for c, h in zip(chunks, hashes) if h not in hints.boilerplate]
+    if sum(map(len, kept)) < BOILERPLATE_MAX_SHARE * sum(map(len, chunks)):
+        return chunks  # mostly "boilerplate": the same article under another URL, not chrome
+    obs.dropped_blocks = len(chunks) - len(kept)
+    return kept
+
+
+def extract_page(content: bytes, encoding: Optional[str] = None, content_type: str = "",
+                 hints: Optional[HostHints] = None) -> Tuple[str, Optional[PageObservation]]:
+    """
+    extract_text() plus per-host learning. With a learned selector only that
+    container is parsed (one targeted pass); blocks known to be boilerplate on
+    this host are dropped. Returns the text and what was observed on the page
+    (None for plain-text payloads) for webfetch.profiles to learn from.
+    """
+    if content_type.split(";")[0].strip().lower() in PLAIN_CONTENT_TYPES:
+        text = content.decode(encoding or "utf-8", errors="replace")
+        return _BLANK_LINES_RE.sub("\n\n", text).strip(), None
+
+    from bs4 import BeautifulSoup
+
+    # Robust decode (fixes mis-encoded chars like Â)
+    html = decode_html(content, encoding)
+    obs = PageObservation()
+
+    if hints and hints.selector:
+        chunks = _targeted_pass(html, hints)
+        if chunks is not None:
+            obs.targeted = True
+            obs.selector = hints.selector
+            return _join_blocks(_strip_boilerplate(chunks, hints, obs)), obs
+        obs.selector_missed = True
+
+    # Parse and extract
+    soup = BeautifulSoup(html, HTML_PARSER)
+    blocks = _first_pass_blocks(soup)
+    text = _join_blocks(_strip_boilerplate([t for _el, t in blocks], hints, obs))
+    obs.selector = _content_selector(soup, blocks)
+
+    if len(text) < MIN_REASONABLE_CHARS:
+        # Try aggressive fallback over full body text
+        text2 = aggressive_fallback(soup)
+        if hints and hints.boilerplate:
+            text2 = _join_blocks(_strip_boilerplate(text2.split("\n"), hints, PageObservation()))
+        # Choose the longer non-empty result
+        if len(text2) > len(text):
+            text = text2
+    return text, obs
@@ -0,0 +1,231 @@
+# webfetch/keepalive.py
+"""
+Warm, kept-alive connections to the LiteLLM proxy.
+
+The first completion after startup (or after the pool sat idle long enough for
+either side to drop its connections) pays DNS + TCP + TLS before the request
+even leaves, and that lands on one user's TTFT. A warmer owns nothing but a
+schedule around the stack's own pooled httpx client:
+
+  warm   at start, PROXY_WARM_CONNECTIONS cheap GETs (PROXY_PING_PATH, /models by
+         default) held open together, so each one opens its own connection;
+  ping   every PROXY_PING_SEC the same round again, which resets the idle timers
+         on both ends. Keep it under the proxy's keep-alive timeout (uvicorn,
+         which serves LiteLLM, closes idle connections after 5 s by default).
+
+A round holds every warm connection for one round trip, so a request arriving
+right then opens a new one; rounds are skipped while the pool has requests in
+flight (real traffic keeps the connections alive anyway).
+
+The client has to keep idle connections longer than httpx's 5 s default for any
+of this to stick: build it with `pool_limits()`. Any HTTP status counts as a
+live connection (a 401 from a key without /models access is fine); only
+transport errors are failures.
+
+`PoolWarmer` drives a sync httpx.Client from a daemon thread; `AsyncPoolWarmer`
+drives an httpx.AsyncClient as a task on the loop that uses the client (async
+connections can't be shared across event loops).
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+PROXY_WARM_CONNECTIONS = int(os.getenv("PROXY_WARM_CONNECTIONS", "2"))  # 0 disables warming and pings
+PROXY_PING_SEC = float(os.getenv("PROXY_PING_SEC", "4"))  # 0: warm once at start, never ping
+# Client-side idle expiry for pooled connections (httpx default: 5 s)
+PROXY_KEEPALIVE_SEC = float(os.getenv("PROXY_KEEPALIVE_SEC", "120"))
+PROXY_PING_PATH = os.getenv("PROXY_PING_PATH", "/models")
+PROXY_PING_TIMEOUT_SEC = 5.0
+
+
+def pool_limits():
+    """httpx.Limits for an LLM client: the openai SDK's pool sizes, idle connections kept PROXY_KEEPALIVE_SEC."""
+    import httpx
+
+    return httpx.Limits(max_connections=1000, max_keepalive_connections=100, keepalive_expiry=PROXY_KEEPALIVE_SEC)
+
+
+def ping_url(base_url: str) -> str:
+    return base_url.rstrip("/") + PROXY_PING_PATH
+
+
+def pool_state(client: Any) -> Dict[str, int]:
+    """Connections in an httpx client's pool (reads httpcore internals; {} when they aren't there)."""
+    try:
+        conns = list(client._transport._pool.connections)
+    except Exception:
+        return {}
+    idle = sum(1 for c in conns if c.is_idle())
+    return {"connections": len(conns), "idle": idle, "active": len(conns) - idle}
+
+
+class _WarmerBase:
+    def __init__(self, client_factory: Callable[[], Any], url: str, headers: Optional[Dict[str, str]] = None,
+                 connections: Optional[int] = None, interval_sec: Optional[float] = None) -> None:
+        self._client_factory = client_factory
+        self.url = url
+        self.headers = headers or {}
+        self.connections = PROXY_WARM_CONNECTIONS if connections is None else connections
+        self.interval_sec = PROXY_PING_SEC if interval_sec is None else interval_sec
+        self._client = None
+        self._lock = threading.Lock()
+        self.warmed = 0  # connections held open together by the first round
+        self.rounds = 0
+        self.skipped = 0  # rounds not needed: the pool was busy
+        self.pings = 0
+        self.failures = 0
+        self.last_ping_ms: Optional[float] = None
+        self.last_error = ""
+
+    @property
+    def enabled(self) -> bool:
+        return self.connections > 0
+
+    def _record(self, ok: int, failed: int, ms: float, error: str = "") -> None:
+        with self._lock:
+            if not self.rounds:
+                self.warmed = ok
+            self.rounds += 1
+            self.pings += ok
+            self.failures += failed
+            self.last_ping_ms = round(ms, 1)
+            if error:
+                self.last_error = error
+
+    def _busy(self) -> bool:
+        if pool_state(self._client).get("active"):
+            with self._lock:
+                self.skipped += 1
+            return True
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out = {"enabled": self.enabled, "url": self.url, "target": self.connections,
+                   "interval_sec": self.interval_sec, "warmed": self.warmed, "rounds": self.rounds,
+                   "skipped": self.skipped, "pings": self.pings, "failures": self.failures,
+                   "last_ping_ms": self.last_ping_ms, "last_error": self.last_error}
+        out["pool"] = pool_state(self._client) if self._client is not None else {}
+        return out
+
+
+class PoolWarmer(_WarmerBase):
+    """Warms and pings a sync httpx client's pool from a daemon thread."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._workers: Optional[ThreadPoolExecutor] = None
+
+    def start(self) -> "PoolWarmer":
+        """Warm in the background, then keep pinging. No-op when disabled or already started."""
+        with self._lock:
+            if not self.enabled or self._thread is not None:
+                return self
+            self._thread = threading.Thread(target=self._run, name="pool-warmer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        try:
+            self._client = self._client_factory()  # may import the SDK: keep it off the caller's thread
+        except Exception as e:
+            self._record(0, self.connections, 0.0, f"{type(e).__name__}: {e}")
+            return
+        self._workers = ThreadPoolExecutor(max_workers=self.connections, thread_name_prefix="pool-ping")
+        self.ping_round()
+        while self.interval_sec > 0 and not self._stop.wait(self.interval_sec):
+            if not self._busy():
+                self.ping_round()
+        self._workers.shutdown(wait=False)
+
+    def ping_round(self) -> int:
+        """One GET per target connection, all in flight at once; returns how many got a response."""
+        barrier = threading.Barrier(self.connections)
+        t0 = time.perf_counter()
+        results = list(self._workers.map(lambda _i: self._ping(barrier), range(self.connections)))
+        errors = [r for r in results if r]
+        ok = len(results) - len(errors)
+        self._record(ok, len(errors), (time.perf_counter() - t0) * 1000, errors[-1] if errors else "")
+        return ok
+
+    def _ping(self, barrier: threading.Barrier) -> str:
+        try:
+            with self._client.stream("GET", self.url, headers=self.headers, timeout=PROXY_PING_TIMEOUT_SEC) as resp:
+                # the connection stays checked out until the body is read: wait for the others first,
+                # otherwise a fast proxy lets every ping reuse the first connection
+                try:
+                    barrier.wait(PROXY_PING_TIMEOUT_SEC)
+                except threading.BrokenBarrierError:
+                    pass
+                resp.read()
+            return ""
+        except Exception as e:
+            barrier.abort()
+            return f"{type(e).__name__}: {e}"
+
+
+class AsyncPoolWarmer(_WarmerBase):
+    """Warms and pings an httpx.AsyncClient's pool from a task on the client's event loop."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> "AsyncPoolWarmer":
+        """Call from the loop that will use the client. No-op when disabled or already started."""
+        if self.enabled and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _run(self) -> None:
+        try:
+            self._client = self._client_factory()
+        except Exception as e:
+            self._record(0, self.connections, 0.0, f"{type(e).__name__}: {e}")
+            return
+        await self.ping_round()
+        while self.interval_sec > 0:
+            await asyncio.sleep(self.interval_sec)
+            if not self._busy():
+                await self.ping_round()
+
+    async def ping_round(self) -> int:
+        arrived = [0]
+        all_in = asyncio.Event()
+        t0 = time.perf_counter()
+        results = await asyncio.gather(*(self._ping(arrived, all_in) for _ in range(self.connections)))
+        errors = [r for r in results if r]
+        ok = len(results) - len(errors)
+        self._record(ok, len(errors), (time.perf_counter() - t0) * 1000, errors[-1] if errors else "")
+        return ok
+
+    async def _ping(self, arrived: list, all_in: asyncio.Event) -> str:
+        try:
+            async with self._client.stream("GET", self.url, headers=self.headers,
+                                           timeout=PROXY_PING_TIMEOUT_SEC) as resp:
+                arrived[0] += 1
+                if arrived[0] >= self.connections:
+                    all_in.set()
+                try:
+                    await asyncio.wait_for(all_in.wait(), PROXY_PING_TIMEOUT_SEC)
+                except asyncio.TimeoutError:
+                    pass
+                await resp.aread()
+            return ""
+        except Exception as e:
+            all_in.set()  # don't hold the others for a ping that won't arrive
+            return f"{type(e).__name__}: {e}"
@@ -0,0 +1,161 @@
+# webfetch/parsepool.py
+"""
+Where HTML gets parsed: inline for small pages, in a warm process pool for big ones.
+
+BeautifulSoup + the two-pass extraction is pure-Python work that holds the GIL,
+so a large page parsed on a fetch thread stalls the event loop (and every other
+stream) of the process it runs in. `ParseExecutor.parse()` keeps cheap parses
+inline and ships pages above a size threshold to worker processes (raw bytes
+in, text out).
+
+The threshold adapts: every parse reports its time, an EWMA of the cost per KB
+is kept, and the cut-off is the page size predicted to take PARSE_INLINE_BUDGET_MS.
+A slow parser (html.parser) or heavy pages lower it, lxml raises it.
+
+The pool is the web host's: app.py turns it on at startup (`use_pool()`). Other
+processes (the CLI REPLs) parse inline unless PARSE_POOL_WORKERS is set, since
+forkserver/spawn workers re-import `__main__`, which fails for code read from stdin.
+"""
+from __future__ import annotations
+
+import importlib
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional, Tuple
+
+from .extract import HTML_PARSER, PLAIN_CONTENT_TYPES, HostHints, PageObservation, extract_page
+
+# Unset: inline everywhere but the web host, which uses min(4, cores); 0 disables the pool.
+# serve.py workers default to 0 since they already use every core
+_POOL_WORKERS_ENV = os.getenv("PARSE_POOL_WORKERS", "")
+PARSE_POOL_WORKERS = int(_POOL_WORKERS_ENV or "0")
+WEB_PARSE_POOL_WORKERS = int(_POOL_WORKERS_ENV or str(min(4, os.cpu_count() or 1)))
+# Parses predicted to take longer than this go to the pool
+PARSE_INLINE_BUDGET_MS = float(os.getenv("PARSE_INLINE_BUDGET_MS", "15"))
+# Starting threshold until parse times have been measured, and the range it may adapt within
+PARSE_OFFLOAD_BYTES = int(os.getenv("PARSE_OFFLOAD_BYTES", str(256 * 1024)))
+PARSE_MIN_OFFLOAD_BYTES = 32 * 1024  # below this the IPC round trip costs more than it saves
+PARSE_MAX_OFFLOAD_BYTES = 4 * 1024 * 1024
+# forkserver: workers don't inherit the parent's threads/locks (fork would) and start faster than spawn
+PARSE_POOL_START_METHOD = os.getenv("PARSE_POOL_START_METHOD", "") or (
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+
+_EWMA_ALPHA = 0.2
+
+
+def _init_worker() -> None:
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl-C is the parent's to handle
+    # pay the imports once per worker, not on the first page
+    importlib.import_module("bs4")
+    if HTML_PARSER == "lxml":
+        importlib.import_module("lxml.etree")
+
+
+def _timed_extract(content: bytes, encoding: Optional[str], content_type: str,
+                   hints: Optional[HostHints]) -> Tuple[str, Optional[PageObservation], float]:
+    t0 = time.perf_counter()
+    text, obs = extract_page(content, encoding, content_type, hints)
+    return text, obs, time.perf_counter() - t0
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+class ParseExecutor:
+    def __init__(self, workers: int = PARSE_POOL_WORKERS, budget_ms: float = PARSE_INLINE_BUDGET_MS,
+                 initial_threshold: int = PARSE_OFFLOAD_BYTES) -> None:
+        self.workers = workers
+        self.budget_sec = budget_ms / 1000
+        self.threshold = initial_threshold
+        self._sec_per_kb: Optional[float] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.inline = 0
+        self.offloaded = 0
+        self.pool_failures = 0
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(PARSE_POOL_START_METHOD),
+                    initializer=_init_worker,
+                )
+            return self._pool
+
+    def use_pool(self, workers: int = WEB_PARSE_POOL_WORKERS) -> None:
+        """Offload big pages to `workers` processes from now on (0: parse inline). Call before the first parse."""
+        with self._lock:
+            self.workers = workers
+
+    def warm(self) -> None:
+        """Start every worker process now so the first big page doesn't pay for it."""
+        if self.workers > 0:
+            pool = self._executor()
+            for fut in [pool.submit(_ping) for _ in range(self.workers)]:
+                fut.result()
+
+    def parse(self, content: bytes, encoding: Optional[str] = None, content_type: str = "") -> str:
+        """extract_text(), run wherever it hurts least. Blocks until the text is ready."""
+        return self.parse_page(content, encoding, content_type)[0]
+
+    def parse_page(self, content: bytes, encoding: Optional[str] = None, content_type: str = "",
+                   hints: Optional[HostHints] = None) -> Tuple[str, Optional[PageObservation]]:
+        """extract_page() (text + what was observed, for host profiles), inline or in the pool."""
+        plain = content_type.split(";")[0].strip().lower() in PLAIN_CONTENT_TYPES
+        if self.workers > 0 and not plain and len(content) >= self.threshold:
+            try:
+                text, obs, sec = self._executor().submit(
+                    _timed_extract, content, encoding, content_type, hints).result()
+            except BrokenProcessPool:
+                # a worker died (OOM on a huge page?): drop the pool, parse this one inline, rebuild on next use
+                with self._lock:
+                    self.pool_failures += 1
+                    self._pool = None
+            else:
+                self.offloaded += 1
+                self._observe(len(content), sec)
+                return text, obs
+
+        text, obs, sec = _timed_extract(content, encoding, content_type, hints)
+        self.inline += 1
+        if not plain:
+            self._observe(len(content), sec)
+        return text, obs
+
+    def _observe(self, size: int, sec: float) -> None:
+        if size < 4096:
+            return  # tiny pages are dominated by fixed overhead, not size
+        cost = sec / (size / 1024)
+        with self._lock:
+            self._sec_per_kb = cost if self._sec_per_kb is None else \
+                (1 - _EWMA_ALPHA) * self._sec_per_kb + _EWMA_ALPHA * cost
+            predicted = int(self.budget_sec / self._sec_per_kb * 1024) if self._sec_per_kb > 0 else PARSE_MAX_OFFLOAD_BYTES
+            self.threshold = max(PARSE_MIN_OFFLOAD_BYTES, min(PARSE_MAX_OFFLOAD_BYTES, predicted))
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "inline": self.inline,
+                "offloaded": self.offloaded,
+                "pool_failures": self.pool_failures,
+                "threshold_kb": round(self.threshold / 1024, 1),
+                "ms_per_100kb": round(self._sec_per_kb * 100_000, 2) if self._sec_per_kb else None,
+            }
+
+
+parse_executor = ParseExecutor()
@@ -0,0 +1,140 @@
+# webfetch/profiles.py
+"""
+Per-host extraction profiles, learned from the pages we have already parsed.
+
+Users keep returning to the same few (intranet) hosts, whose pages share a
+layout. For each host we count how many distinct pages every text block
+(block_hash) appeared on, and vote for the container that held each page's
+content. Then:
+  - blocks repeated across most of the host's pages (menus, "Was this helpful?",
+    legal footers the chrome selectors missed) are dropped from later pages;
+  - once one container wins PROFILE_MIN_PAGES pages, later pages are parsed with
+    only that container (one targeted pass instead of a full parse plus fallback).
+A learned selector that keeps missing (site redesign) is forgotten.
+
+Learning happens in the calling process; the parse itself may run in the parse
+pool, which only gets the read-only HostHints.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+from .extract import HostHints, PageObservation
+
+FETCH_HOST_PROFILES = os.getenv("FETCH_HOST_PROFILES", "1") == "1"
+PROFILE_MIN_PAGES = int(os.getenv("PROFILE_MIN_PAGES", "3"))  # pages before boilerplate/selector are trusted
+PROFILE_MAX_HOSTS = 256
+PROFILE_MAX_BLOCKS = 5000  # tracked block hashes per host; one-off blocks are pruned past this
+SELECTOR_MAX_MISSES = 3
+BOILERPLATE_SHARE = 0.5  # on at least half of the host's pages
+
+
+class HostProfile:
+    def __init__(self) -> None:
+        self.pages = 0
+        self.full_pages = 0  # pages parsed whole (targeted pages never show the chrome around the container)
+        self.seen: "OrderedDict[str, None]" = OrderedDict()  # paths already counted (refetch after TTL)
+        self.blocks: Counter = Counter()  # block hash -> distinct pages it appeared on
+        self.votes: Counter = Counter()  # container selector -> pages it held the content of
+        self.selector = ""
+        self.misses = 0
+        self.targeted = 0
+        self.dropped_blocks = 0
+        self.hints = HostHints()
+
+    def observe(self, path: str, obs: PageObservation) -> None:
+        self.dropped_blocks += obs.dropped_blocks
+        if obs.targeted:
+            self.targeted += 1
+            self.misses = 0
+        elif obs.selector_missed:
+            self.misses += 1
+            if self.misses >= SELECTOR_MAX_MISSES:
+                self.selector, self.misses = "", 0
+                self.votes.clear()
+
+        if path in self.seen:
+            self.seen.move_to_end(path)
+        else:
+            self.seen[path] = None
+            if len(self.seen) > 1024:
+                self.seen.popitem(last=False)
+            self.pages += 1
+            self.full_pages += not obs.targeted
+            self.blocks.update(obs.block_hashes)
+            if obs.selector and not obs.targeted:
+                self.votes[obs.selector] += 1
+            if len(self.blocks) > PROFILE_MAX_BLOCKS:
+                self.blocks = Counter({h: n for h, n in self.blocks.items() if n > 1})
+        self._relearn()
+
+    def _relearn(self) -> None:
+        if self.pages < PROFILE_MIN_PAGES:
+            return
+        floor = max(PROFILE_MIN_PAGES, BOILERPLATE_SHARE * self.full_pages)
+        boilerplate = frozenset(h for h, n in self.blocks.items() if n >= floor)
+        if not self.selector and self.votes:
+            best, n = self.votes.most_common(1)[0]
+            if n >= PROFILE_MIN_PAGES and n >= 0.6 * sum(self.votes.values()):
+                self.selector = best
+        self.hints = HostHints(selector=self.selector, boilerplate=boilerplate)
+
+
+class HostProfiles:
+    """Thread-safe map host -> HostProfile (LRU-bounded)."""
+
+    def __init__(self, enabled: bool = FETCH_HOST_PROFILES, max_hosts: int = PROFILE_MAX_HOSTS) -> None:
+        self.enabled = enabled
+        self.max_hosts = max_hosts
+        self._hosts: "OrderedDict[str, HostProfile]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hints(self, url: str) -> Optional[HostHints]:
+        """What has been learned about `url`'s host so far (None when nothing, or disabled)."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            profile = self._hosts.get(urlparse(url).netloc.lower())
+            return profile.hints if profile is not None and profile.pages >= PROFILE_MIN_PAGES else None
+
+    def observe(self, url: str, obs: Optional[PageObservation]) -> None:
+        if not self.enabled or obs is None:
+            return
+        parts = urlparse(url)
+        host = parts.netloc.lower()
+        with self._lock:
+            profile = self._hosts.get(host)
+            if profile is None:
+                profile = self._hosts[host] = HostProfile()
+                if len(self._hosts) > self.max_hosts:
+                    self._hosts.popitem(last=False)
+            else:
+                self._hosts.move_to_end(host)
+            profile.observe(parts.path + ("?" + parts.query if parts.query else ""), obs)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._hosts.clear()
+
+    def stats(self, hosts: bool = False) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = {
+                "hosts": len(self._hosts),
+                "with_selector": sum(1 for p in self._hosts.values() if p.selector),
+                "targeted_pages": sum(p.targeted for p in self._hosts.values()),
+                "dropped_blocks": sum(p.dropped_blocks for p in self._hosts.values()),
+            }
+            if hosts:
+                out["by_host"] = {
+                    host: {"pages": p.pages, "selector": p.selector, "boilerplate_blocks": len(p.hints.boilerplate),
+                           "targeted": p.targeted, "misses": p.misses}
+                    for host, p in self._hosts.items()
+                }
+            return out
+
+
+host_profiles = HostProfiles()
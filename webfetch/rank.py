@@ -0,0 +1,122 @@
+# webfetch/rank.py
+"""
+Relevance-ranked passage selection: split a page into chunks, score them against
+the user's question with BM25 (vectorized with NumPy), and keep the best chunks
+that fit the character budget, in document order.
+"""
+from __future__ import annotations
+
+import os
+import re
+from typing import List, Optional, Sequence
+
+CHUNK_TARGET_CHARS = int(os.getenv("RANK_CHUNK_CHARS", "600"))
+BM25_K1 = 1.5
+BM25_B = 0.75
+GAP_MARK = "\n[…]\n"  # between non-adjacent selected chunks
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Function words plus instruction words that say nothing about *where* the answer is
+STOPWORDS = frozenset("""
+a an and are as at be by can could did do does for from had has have how i if in into is it its
+me my of on or our please should so than that the their them then there these they this to
+us was we were what when where which who why will with would you your
+about article content describe detail details explain give key list page point points show site
+summarise summarize summary tell text url web
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    # numbers stay: years, versions and error codes are often the most selective terms
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def split_chunks(text: str, target_chars: int = CHUNK_TARGET_CHARS) -> List[str]:
+    """Merge consecutive lines into ~target_chars chunks; split overly long lines at spaces."""
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    for line in text.split("\n"):
+        line = line.strip()
+        if not line:
+            continue
+        if len(line) > 2 * target_chars and current:
+            chunks.append("\n".join(current))  # keep document order: what came before goes first
+            current, size = [], 0
+        while len(line) > 2 * target_chars:
+            cut = line.rfind(" ", 0, target_chars) + 1 or target_chars
+            chunks.append(line[:cut].strip())
+            line = line[cut:]
+        current.append(line)
+        size += len(line) + 1
+        if size >= target_chars:
+            chunks.append("\n".join(current))
+            current, size = [], 0
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def bm25_scores(chunks: Sequence[str], query: str):
+    """BM25 score of every chunk for `query` (NumPy array, one float per chunk)."""
+    import numpy as np
+
+    q_terms = list(dict.fromkeys(tokenize(query)))
+    n = len(chunks)
+    if not q_terms or not n:
+        return np.zeros(n)
+    q_index = {t: i for i, t in enumerate(q_terms)}
+    n_terms = len(q_terms)
+
+    # Flattened (chunk, query-term) hits -> term-frequency matrix via one bincount
+    doc_len = np.empty(n)
+    hits: List[int] = []
+    for row, chunk in enumerate(chunks):
+        tokens = tokenize(chunk)
+        doc_len[row] = len(tokens)
+        base = row * n_terms
+        hits.extend(base + q_index[t] for t in tokens if t in q_index)
+    tf = np.bincount(np.asarray(hits, dtype=np.int64), minlength=n * n_terms).reshape(n, n_terms)
+
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log1p((n - df + 0.5) / (df + 0.5))
+    norm = BM25_K1 * (1.0 - BM25_B + BM25_B * doc_len / max(doc_len.mean(), 1.0))
+    return (idf * (tf * (BM25_K1 + 1.0)) / (tf + norm[:, None])).sum(axis=1)
+
+
+def select_relevant(text: str, query: str, max_chars: int, ranked_chars: Optional[int] = None) -> str:
+    """
+    Best-matching chunks of `text` for `query` within `ranked_chars` (default: max_chars),
+    in document order. Falls back to the head of the page, up to `max_chars`, when
+    nothing matches the question.
+    """
+    if len(text) <= max_chars:
+        return text
+    chunks = split_chunks(text)
+    scores = bm25_scores(chunks, query)
+    if not scores.any():
+        return text[:max_chars] + "…"
+    max_chars = min(max_chars, ranked_chars or max_chars)
+
+    picked: List[int] = []
+    used = 0
+    # Best first; earlier chunks win ties (they tend to carry the page's framing)
+    for idx in sorted(range(len(chunks)), key=lambda i: (-scores[i], i)):
+        if scores[idx] <= 0:
+            break
+        cost = len(chunks[idx]) + len(GAP_MARK)
+        if used + cost > max_chars:
+            continue
+        picked.append(idx)
+        used += cost
+
+    if not picked:  # even the best chunk is over budget: trim it
+        best = int(scores.argmax())
+        return chunks[best][:max_chars] + "…"
+
+    picked.sort()
+    parts = [chunks[picked[0]]]
+    for prev, idx in zip(picked, picked[1:]):
+        parts.append(("\n" if idx == prev + 1 else GAP_MARK) + chunks[idx])
+    return "".join(parts)
@@ -0,0 +1,331 @@
+# webfetch/scheduler.py
+"""
+Politeness + connection budget for every download: which request may hit which host, and when.
+
+  - at most FETCH_HOST_CONCURRENCY requests in flight per host, FETCH_MAX_CONNECTIONS overall;
+  - per-host pacing: requests to one host start at least max(1 / FETCH_HOST_RPS,
+    robots.txt Crawl-delay, current backoff) apart;
+  - fair: when a slot frees up, hosts with waiting requests take turns (round robin),
+    so twenty queued fetches for one intranet host don't starve a one-off fetch elsewhere;
+  - adaptive: a 429/503 (honouring Retry-After) doubles the host's backoff and halves
+    its concurrency; successes relax both again.
+
+robots.txt is fetched once per origin (FETCH_ROBOTS_TTL_SEC cache, single-flight). Only
+crawls wait for it (`allowed()`); a user's fetch to a new origin goes out at once while it
+loads in the background, and the Crawl-delay applies from the next request on. Queue
+waits are kept per host for /metrics. Blocking API for the fetch threads: `with host_scheduler.slot(url) as slot`;
+pass the fetch's `deadline` and a wait that can't end before it raises HostBusy instead of sleeping past it.
+"""
+from __future__ import annotations
+
+import contextlib
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Iterator, List, Optional
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+from .singleflight import SingleFlight
+
+FETCH_SCHEDULER = os.getenv("FETCH_SCHEDULER", "1") == "1"
+FETCH_HOST_CONCURRENCY = int(os.getenv("FETCH_HOST_CONCURRENCY", "4"))
+FETCH_MAX_CONNECTIONS = int(os.getenv("FETCH_MAX_CONNECTIONS", "32"))
+FETCH_HOST_RPS = float(os.getenv("FETCH_HOST_RPS", "8"))  # request starts per second per host; 0 = no pacing
+FETCH_ROBOTS_TTL_SEC = float(os.getenv("FETCH_ROBOTS_TTL_SEC", "3600"))
+FETCH_MAX_CRAWL_DELAY_SEC = float(os.getenv("FETCH_MAX_CRAWL_DELAY_SEC", "10"))  # cap for robots / Retry-After
+ROBOTS_TIMEOUT_SEC = 5
+ROBOTS_MAX_BYTES = 256 * 1024
+ROBOTS_AGENT = "*"  # our User-Agent is a browser string; follow the rules written for everyone
+MAX_BACKOFF_SEC = 60.0
+THROTTLE_STATUSES = (429, 503)
+
+
+class HostBusy(Exception):
+    """No slot for this host before the caller's deadline (throttled, paced or saturated)."""
+
+
+class _Ticket:
+    __slots__ = ("host", "granted", "queued_at")
+
+    def __init__(self, host: str) -> None:
+        self.host = host
+        self.granted = False
+        self.queued_at = time.monotonic()
+
+
+class _Host:
+    def __init__(self, limit: int) -> None:
+        self.queue: Deque[_Ticket] = deque()
+        self.active = 0
+        self.max_limit = limit
+        self.limit = limit
+        self.next_start = 0.0  # monotonic time the next request may start
+        self.crawl_delay = 0.0
+        self.backoff = 0.0
+        self.requests = 0
+        self.throttled = 0
+        self.waits: Deque[float] = deque(maxlen=512)
+
+    def interval(self, rps: float) -> float:
+        return max(1.0 / rps if rps > 0 else 0.0, self.crawl_delay, self.backoff)
+
+
+class Robots:
+    """RobotFileParser for Allow/Disallow, plus a Crawl-delay/Request-rate reading that accepts
+    fractions ("Crawl-delay: 0.5"), which the stdlib parser ignores."""
+
+    def __init__(self, lines: List[str]) -> None:
+        self.parser = RobotFileParser()
+        self.parser.parse(lines)
+        self.crawl_delay = self._delay_for_everyone(lines)
+
+    @staticmethod
+    def _delay_for_everyone(lines: List[str]) -> float:
+        delay, in_star_group, last_was_agent = 0.0, False, False
+        for raw in lines:
+            key, _, value = raw.split("#", 1)[0].partition(":")
+            key, value = key.strip().lower(), value.strip()
+            if key == "user-agent":
+                in_star_group = (in_star_group and last_was_agent) or value == "*"
+                last_was_agent = True
+                continue
+            last_was_agent = False
+            if not in_star_group:
+                continue
+            try:
+                if key == "crawl-delay":
+                    delay = max(delay, float(value))
+                elif key == "request-rate":  # "1/5" = one request per five seconds
+                    requests, _, seconds = value.partition("/")
+                    delay = max(delay, float(seconds.rstrip("s")) / float(requests))
+            except (ValueError, ZeroDivisionError):
+                pass
+        return delay
+
+
+class Slot:
+    """Handed to the caller inside `with slot(url)`; set `status`/`retry_after` so the scheduler can adapt."""
+
+    def __init__(self, host: str, waited: float) -> None:
+        self.host = host
+        self.waited = waited
+        self.status: Optional[int] = None
+        self.retry_after: Optional[str] = None
+
+
+class HostScheduler:
+    def __init__(self, enabled: bool = FETCH_SCHEDULER, per_host: int = FETCH_HOST_CONCURRENCY,
+                 total: int = FETCH_MAX_CONNECTIONS, rps: float = FETCH_HOST_RPS,
+                 robots_ttl_sec: float = FETCH_ROBOTS_TTL_SEC) -> None:
+        self.enabled = enabled
+        self.per_host = max(1, per_host)
+        self.total = max(1, total)
+        self.rps = rps
+        self.robots_ttl_sec = robots_ttl_sec
+        self._cond = threading.Condition()
+        self._hosts: "OrderedDict[str, _Host]" = OrderedDict()
+        self._ring: List[str] = []  # hosts with waiting tickets, in round-robin order
+        self._turn = 0
+        self._active = 0
+        self._robots: Dict[str, tuple] = {}  # origin -> (expires, Robots or None)
+        self._robots_flight = SingleFlight()
+        self._robots_loading: set = set()  # origins loading in the background
+        self._robots_lock = threading.Lock()
+
+    # --- robots.txt
+    def robots(self, url: str, wait: bool = True) -> Optional["Robots"]:
+        """
+        Parsed robots.txt for `url`'s origin (cached); None when there is none or it can't be read.
+        With wait=False a miss returns at once (the expired entry, else None) and loads it in the background.
+        """
+        parts = urlparse(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        hit = self._robots.get(origin)
+        if hit is not None and hit[0] > time.monotonic():
+            return hit[1]
+        if wait:
+            return self._refresh_robots(origin)
+        with self._robots_lock:
+            if origin not in self._robots_loading:
+                self._robots_loading.add(origin)
+                threading.Thread(target=self._refresh_robots, args=(origin,), name="robots-txt",
+                                 daemon=True).start()
+        return hit[1] if hit is not None else None
+
+    def _refresh_robots(self, origin: str) -> Optional["Robots"]:
+        try:
+            parser = self._robots_flight.do(origin, self._load_robots, origin)
+            if len(self._robots) > 4096:
+                self._robots.clear()
+            self._robots[origin] = (time.monotonic() + self.robots_ttl_sec, parser)
+            return parser
+        finally:
+            with self._robots_lock:
+                self._robots_loading.discard(origin)
+
+    @staticmethod
+    def _load_robots(origin: str) -> Optional["Robots"]:
+        from .transport import session
+
+        try:
+            with session().get(origin + "/robots.txt", timeout=ROBOTS_TIMEOUT_SEC, stream=True) as r:
+                if r.status_code != 200:
+                    return None
+                body = r.raw.read(ROBOTS_MAX_BYTES, decode_content=True)
+        except Exception:
+            return None
+        return Robots(body.decode("utf-8", errors="replace").splitlines())
+
+    def allowed(self, url: str) -> bool:
+        """robots.txt Allow/Disallow for `url` (crawlers check this; user-requested fetches don't)."""
+        robots = self.robots(url)
+        return robots is None or robots.parser.can_fetch(ROBOTS_AGENT, url)
+
+    # --- slots
+    @contextlib.contextmanager
+    def slot(self, url: str, deadline: Optional[float] = None) -> Iterator[Slot]:
+        """Wait for this host's turn. `deadline` (time.monotonic()): give up with HostBusy rather than wait past it."""
+        host = urlparse(url).netloc.lower()
+        if not self.enabled:
+            yield Slot(host, 0.0)
+            return
+        self._learn_crawl_delay(url, host)
+        waited = self._acquire(host, deadline)
+        slot = Slot(host, waited)
+        try:
+            yield slot
+        finally:
+            self._release(slot)
+
+    def _learn_crawl_delay(self, url: str, host: str) -> None:
+        robots = self.robots(url, wait=False)  # the user's fetch doesn't wait on robots.txt
+        delay = robots.crawl_delay if robots is not None else 0.0
+        with self._cond:
+            self._host(host).crawl_delay = min(delay, FETCH_MAX_CRAWL_DELAY_SEC)
+
+    def _host(self, host: str) -> _Host:
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _Host(self.per_host)
+            if len(self._hosts) > 1024:  # forget idle hosts
+                for name, old in list(self._hosts.items())[:256]:
+                    if not old.queue and not old.active:
+                        del self._hosts[name]
+        return state
+
+    def _acquire(self, host: str, deadline: Optional[float] = None) -> float:
+        ticket = _Ticket(host)
+        with self._cond:
+            state = self._host(host)
+            state.queue.append(ticket)
+            if host not in self._ring:
+                self._ring.append(host)
+            while True:
+                wake_in = self._dispatch()
+                if ticket.granted:
+                    break
+                if deadline is not None:
+                    now = time.monotonic()
+                    # backed off / paced past the deadline: say so now rather than after waiting it out
+                    if now >= deadline or state.next_start > deadline:
+                        self._withdraw(ticket, state)
+                        why = (f"backed off for another {state.next_start - now:.1f} s" if state.next_start > now
+                               else f"at its limit of {state.limit} requests in flight")
+                        raise HostBusy(f"{host} is {why}; no slot before this fetch's timeout")
+                    wake_in = deadline - now if wake_in is None else min(wake_in, deadline - now)
+                self._cond.wait(timeout=wake_in)
+            waited = time.monotonic() - ticket.queued_at
+            state.waits.append(waited)
+            return waited
+
+    def _withdraw(self, ticket: _Ticket, state: _Host) -> None:
+        state.queue.remove(ticket)
+        if not state.queue and ticket.host in self._ring:
+            self._ring.remove(ticket.host)
+
+    def _dispatch(self) -> Optional[float]:
+        """Grant every ticket that may start now, hosts in turn. Returns seconds until the next may (if paced)."""
+        now = time.monotonic()
+        next_wake: Optional[float] = None
+        granted = False
+        progress = True
+        while progress and self._active < self.total and self._ring:
+            progress = False
+            for _ in range(len(self._ring)):
+                self._turn %= len(self._ring)
+                host = self._ring[self._turn]
+                state = self._hosts[host]
+                if state.active < state.limit and state.next_start <= now:
+                    ticket = state.queue.popleft()
+                    ticket.granted = granted = progress = True
+                    state.active += 1
+                    state.requests += 1
+                    state.next_start = now + state.interval(self.rps)
+                    self._active += 1
+                    if not state.queue:
+                        self._ring.pop(self._turn)
+                    else:
+                        self._turn += 1
+                    break
+                if state.active < state.limit:  # only pacing holds this host back
+                    wait = state.next_start - now
+                    next_wake = wait if next_wake is None else min(next_wake, wait)
+                self._turn += 1
+        if granted:
+            self._cond.notify_all()
+        return next_wake
+
+    def _release(self, slot: Slot) -> None:
+        with self._cond:
+            state = self._host(slot.host)
+            state.active -= 1
+            self._active -= 1
+            if slot.status in THROTTLE_STATUSES:
+                state.throttled += 1
+                state.backoff = min(MAX_BACKOFF_SEC, max(1.0, state.backoff * 2, _retry_after(slot.retry_after)))
+                state.limit = max(1, state.limit // 2)
+                state.next_start = max(state.next_start, time.monotonic() + state.backoff)
+            elif slot.status is not None and slot.status < 400:
+                state.backoff = state.backoff / 2 if state.backoff > 0.1 else 0.0
+                state.limit = min(state.max_limit, state.limit + 1)
+            self._dispatch()
+            self._cond.notify_all()
+
+    # --- metrics
+    def stats(self, hosts: bool = False) -> Dict[str, Any]:
+        with self._cond:
+            waits = sorted(w for s in self._hosts.values() for w in s.waits)
+            out: Dict[str, Any] = {
+                "active": self._active,
+                "queued": sum(len(s.queue) for s in self._hosts.values()),
+                "throttled": sum(s.throttled for s in self._hosts.values()),
+                "wait_ms_p50": _pct_ms(waits, 0.5),
+                "wait_ms_p95": _pct_ms(waits, 0.95),
+                "wait_ms_max": _pct_ms(waits, 1.0),
+            }
+            if hosts:
+                out["by_host"] = {
+                    host: {"active": s.active, "queued": len(s.queue), "limit": s.limit, "requests": s.requests,
+                           "throttled": s.throttled, "backoff_sec": round(s.backoff, 2),
+                           "crawl_delay_sec": s.crawl_delay, "wait_ms_p95": _pct_ms(sorted(s.waits), 0.95)}
+                    for host, s in self._hosts.items()
+                }
+            return out
+
+
+def _retry_after(value: Optional[str]) -> float:
+    try:
+        return min(float(value), FETCH_MAX_CRAWL_DELAY_SEC) if value else 0.0
+    except ValueError:
+        return 0.0  # HTTP-date form; the doubling backoff covers it
+
+
+def _pct_ms(sorted_values: List[float], q: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    return round(sorted_values[int(q * (len(sorted_values) - 1))] * 1000, 1)
+
+
+host_scheduler = HostScheduler()
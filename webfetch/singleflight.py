@@ -0,0 +1,135 @@
+# webfetch/singleflight.py
+"""
+Single-flight request coalescing: concurrent calls with the same key share one
+in-flight execution instead of each doing the work.
+
+`SingleFlight` is for threads (page downloads), `AsyncSingleFlight` for asyncio
+(LLM completions). Followers get the leader's result, or its exception. Counters
+(`stats()`) show how many executions were started and how many calls were saved.
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+from concurrent.futures import CancelledError, Executor, Future
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Thread-safe: the first caller for a key runs `fn`, concurrent callers wait on its Future."""
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()  # re-entrant: a done-callback may fire inside add_done_callback
+        self._calls: Dict[Hashable, Future] = {}
+        self.leaders = 0  # executions actually started
+        self.shared = 0  # calls that joined an in-flight execution (work saved)
+        self.errors = 0  # executions that raised (every waiter got the same exception)
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run `fn(*args, **kwargs)` once per key at a time; blocks until the result is ready."""
+        with self._lock:
+            pending = self._calls.get(key)
+            if pending is not None:
+                self.shared += 1
+            else:
+                fut = self._calls[key] = Future()
+                self.leaders += 1
+        if pending is not None:
+            try:
+                return pending.result()
+            except CancelledError:
+                # the call we joined was a queued submit() that got cancelled: run it ourselves
+                return self.do(key, fn, *args, **kwargs)
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            with self._lock:
+                self.errors += 1
+            fut.set_exception(e)
+            raise
+        else:
+            fut.set_result(result)
+            return result
+        finally:
+            self._forget(key, fut)
+
+    def submit(self, executor: Executor, key: Hashable, fn: Callable[..., Any], *args: Any) -> Future:
+        """Non-blocking variant: start `fn` on `executor` (or join the in-flight call) and return its Future."""
+        with self._lock:
+            fut = self._calls.get(key)
+            if fut is not None:
+                self.shared += 1
+                return fut
+            fut = self._calls[key] = executor.submit(fn, *args)
+            self.leaders += 1
+            fut.add_done_callback(lambda f, k=key: self._done(k, f))
+            return fut
+
+    def _done(self, key: Hashable, fut: Future) -> None:
+        if not fut.cancelled() and fut.exception() is not None:
+            with self._lock:
+                self.errors += 1
+        self._forget(key, fut)
+
+    def _forget(self, key: Hashable, fut: Future) -> None:
+        with self._lock:
+            if self._calls.get(key) is fut:
+                del self._calls[key]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"leaders": self.leaders, "shared": self.shared, "errors": self.errors,
+                    "in_flight": len(self._calls)}
+
+
+class AsyncSingleFlight:
+    """
+    asyncio version. The shared work runs as its own task; each caller awaits it
+    through `asyncio.shield`, so one caller being cancelled (client went away)
+    doesn't cancel the others. Once every waiter is gone the task is cancelled:
+    a coroutine stops at its next await, but blocking work under
+    `asyncio.to_thread` keeps running in its thread and its result is dropped.
+    """
+
+    def __init__(self) -> None:
+        self._tasks: Dict[Hashable, "asyncio.Task[Any]"] = {}
+        self._waiters: Dict["asyncio.Task[Any]", int] = {}
+        self.leaders = 0
+        self.shared = 0
+        self.errors = 0
+        self.cancelled = 0  # executions nobody waits for any more (every waiter was cancelled)
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._tasks[key] = task
+            self._waiters[task] = 0
+            self.leaders += 1
+            task.add_done_callback(lambda t, k=key: self._done(k, t))
+        else:
+            self.shared += 1
+
+        self._waiters[task] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters.get(task) == 1 and not task.done():
+                task.cancel()
+                self.cancelled += 1
+            raise
+        finally:
+            if task in self._waiters:
+                self._waiters[task] -= 1
+
+    def _done(self, key: Hashable, task: "asyncio.Task[Any]") -> None:
+        if not task.cancelled() and task.exception() is not None:
+            self.errors += 1
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        self._waiters.pop(task, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {"leaders": self.leaders, "shared": self.shared, "errors": self.errors,
+                "cancelled": self.cancelled, "in_flight": len(self._tasks)}
@@ -0,0 +1,119 @@
+# webfetch/transport.py
+"""
+One pooled HTTP session for all fetches, with streaming downloads capped at a byte budget.
+"""
+from __future__ import annotations
+
+import functools
+import os
+import re
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+from .scheduler import THROTTLE_STATUSES, HostBusy, host_scheduler
+
+FETCH_MAX_BYTES = int(os.getenv("FETCH_MAX_BYTES", str(2_000_000)))  # stop downloading past this
+FETCH_POOL_SIZE = int(os.getenv("FETCH_POOL_SIZE", "16"))            # keep-alive connections per host
+FETCH_THROTTLE_RETRIES = int(os.getenv("FETCH_THROTTLE_RETRIES", "1"))  # re-queue after a 429/503 (with backoff)
+
+DEFAULT_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+    ),
+    "Accept-Language": "en-US,en;q=0.9",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+}
+
+
+_CHARSET_RE = re.compile(r"charset=[\"']?([\w.:-]+)", re.IGNORECASE)
+
+
+@dataclass
+class Download:
+    url: str                   # final URL after redirects
+    status: int
+    content: bytes
+    encoding: Optional[str]    # charset declared in Content-Type, if any
+    content_type: str
+    truncated: bool            # body was cut at the byte budget
+
+
+# Called after every successful download as fn(requested_url, download, elapsed_sec), e.g. a traffic
+# recorder. Runs on the fetching thread; exceptions are swallowed so an observer can't break a fetch.
+download_observers: List[Callable[[str, "Download", float], None]] = []
+
+
+@functools.lru_cache(maxsize=None)
+def session():
+    """Shared requests.Session (requests is imported on first use)."""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    s = requests.Session()
+    s.headers.update(DEFAULT_HEADERS)
+    adapter = HTTPAdapter(pool_connections=FETCH_POOL_SIZE, pool_maxsize=FETCH_POOL_SIZE)
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    return s
+
+
+def download(url: str, timeout_sec: float, max_bytes: int = FETCH_MAX_BYTES) -> Download:
+    """
+    GET `url`, streaming the body and stopping at `max_bytes`. Raises on HTTP errors.
+    Waits for a slot from the per-host scheduler first; a 429/503 is retried
+    (FETCH_THROTTLE_RETRIES) after the backoff the scheduler imposes on that host.
+    Queue waits stay within `timeout_sec`: when the host's backoff runs past it, the
+    429/503 is raised at once instead (HostBusy if the first attempt can't get a slot).
+    """
+    started = time.perf_counter()
+    deadline = time.monotonic() + timeout_sec
+    throttled: Optional[Exception] = None
+    for attempt in range(FETCH_THROTTLE_RETRIES + 1):
+        try:
+            page = _download_once(url, timeout_sec, max_bytes, deadline)
+            break
+        except HostBusy:
+            if throttled is not None:
+                raise throttled from None
+            raise
+        except Exception as e:
+            status = getattr(getattr(e, "response", None), "status_code", None)
+            if status not in THROTTLE_STATUSES or attempt == FETCH_THROTTLE_RETRIES:
+                raise
+            throttled = e
+    for observer in download_observers:
+        try:
+            observer(url, page, time.perf_counter() - started)
+        except Exception:
+            pass
+    return page
+
+
+def _download_once(url: str, timeout_sec: float, max_bytes: int, deadline: Optional[float] = None) -> Download:
+    with host_scheduler.slot(url, deadline) as slot, \
+            session().get(url, timeout=timeout_sec, allow_redirects=True, stream=True) as r:
+        slot.status = r.status_code
+        slot.retry_after = r.headers.get("Retry-After")
+        r.raise_for_status()
+        body = bytearray()
+        truncated = False
+        for chunk in r.iter_content(chunk_size=64 * 1024):
+            body += chunk
+            if len(body) >= max_bytes:
+                truncated = len(body) > max_bytes
+                del body[max_bytes:]
+                break
+        content_type = r.headers.get("Content-Type", "")
+        # Only trust an explicit charset: requests' ISO-8859-1 default for text/* is what
+        # produced stray "Â" characters; without one, extract.decode_html sniffs the bytes.
+        charset = _CHARSET_RE.search(content_type)
+        return Download(
+            url=r.url,
+            status=r.status_code,
+            content=bytes(body),
+            encoding=charset.group(1) if charset else None,
+            content_type=content_type,
+            truncated=truncated,
+        )